@@ -0,0 +1,273 @@
+# necessary libraries
+import base64
+
+import numpy as np
+import pandas as pd
+
+from route_index import route_ratings
+
+# key used for the rollup of all crags of a year
+OVERALL = 'Overall'
+
+# names of the ascent methods, by method_id (other ids of the dump are shown by their id)
+methods = {1: 'Redpoint', 2: 'Flash', 3: 'Onsight', 4: 'Top rope'}
+
+# columns shown in the route table
+table_columns = {'name': 'Route', 'sector': 'Sector', 'fra_routes': 'Grade', 'rating': 'Rating'}
+
+
+def _value_counts(values):
+    """ Counts of each value present in the slice, sorted by value (categories without ascents are left out) """
+    counts = values.value_counts(sort=False)
+    return counts[counts > 0].sort_index()
+
+
+def _route_table(means, routes, ordered=False):
+    """
+    Route table from the mean rating per route id, best rated first (then by route id), indexed by route id.
+    The name, sector and grade come from the table of the routes (route_index.build_routes). ordered when the means
+    already come in that order
+    """
+    table = routes.loc[means.index, ['name', 'sector', 'fra_routes']].astype(object)
+    table = table.where(table.notna(), None)  # routes without a sector
+    table['rating'] = means.values
+    if not ordered:
+        table.sort_values('rating', ascending=False, kind='stable', inplace=True)
+
+    return table.rename(columns=table_columns)
+
+
+def _route_orders(routes):
+    """ Positions of the routes sorted (ascending) by each column, so the table can be sorted without sorting """
+    positions = routes.reset_index(drop=True)
+    return {column: positions.sort_values(column, kind='stable').index.values for column in routes.columns}
+
+
+class Cell(dict):
+    """
+    Cube cell whose route table (and its sort orders) is built the first time it is read, from the route ids of the
+    cell, best rated first, and their mean ratings: most cells are never shown with their table
+    """
+
+    def __init__(self, aggregates, route_ids, ratings, routes):
+        super().__init__(aggregates)
+        self.route_ids, self.ratings, self.routes = route_ids, ratings, routes
+
+    def __missing__(self, key):
+        if key not in ('routes', 'orders'):
+            raise KeyError(key)
+        # two requests building it at once build the same table, either one is kept
+        table = _route_table(pd.Series(self.ratings, index=self.route_ids), self.routes, ordered=True) \
+            if len(self.route_ids) else empty_cell['routes']
+        self['orders'] = _route_orders(table)
+        self['routes'] = table
+        return self[key]
+
+
+def cell_routes(cell):
+    """ Route ids of the route table of a cell, in its order, without building the table """
+    return cell.route_ids if isinstance(cell, Cell) else cell['routes'].index.values
+
+
+def summarise(dff, routes):
+    """ Aggregates a slice of the ascents (with their route_id) into a cube cell """
+    rated = dff.rating[dff.rating != 0]
+
+    table = _route_table(dff[dff.rating != 0].groupby('route_id').rating.mean().round(1), routes)
+
+    return {'ascents': len(dff),
+            'grades': _value_counts(dff.fra_routes),
+            'months': _value_counts(dff.month),
+            'rating_sum': rated.sum(),
+            'rating_count': len(rated),
+            'methods': _value_counts(dff.method_id),
+            'sex': _value_counts(dff.sex).sort_index(ascending=False),  # Male first, it keeps the pie colors
+            'routes': table,
+            'orders': _route_orders(table)}
+
+
+# used for the (year, crag) pairs without any ascent
+empty_cell = summarise(pd.DataFrame({'fra_routes': pd.Series(dtype=object), 'month': pd.Series(dtype='int32'),
+                                     'rating': pd.Series(dtype='int64'), 'method_id': pd.Series(dtype='int64'),
+                                     'sex': pd.Series(dtype=object), 'route_id': pd.Series(dtype='int32')}),
+                       pd.DataFrame(columns=['name', 'sector', 'fra_routes'], index=pd.Index([], dtype='int32')))
+
+
+def _split(series):
+    """ Splits a series indexed by (year, crag, value) into {(year, crag): series indexed by value} """
+    return {key: group.droplevel([0, 1]) for key, group in series.groupby(level=[0, 1], sort=False, observed=True)}
+
+
+def build_cube(df_climb, routes):
+    """
+    Aggregates the ascents once per (year, crag) and per (year, OVERALL):
+    grade histogram, monthly ascents, rating sum/count (without zeros), method and sex counts and the route table.
+    The mean ratings of the routes of every cell are sorted at once, best rated first, and each cell builds its route
+    table from its slice of them when it is first read (Cell)
+    """
+    cube = {}
+
+    columns = ['year', 'crag', 'fra_routes', 'month', 'method_id', 'sex', 'rating', 'route_id']
+    df_crags = df_climb[columns]
+
+    # the rollup is the same aggregation with every ascent assigned to the OVERALL crag
+    for dff in [df_crags, df_crags.assign(crag=OVERALL)]:
+        keys = ['year', 'crag']
+        ascents = dff.groupby(keys, observed=True).size()
+        grades = _split(dff.groupby(keys + ['fra_routes'], observed=True).size())
+        months = _split(dff.groupby(keys + ['month'], observed=True).size())
+        methods_ = _split(dff.groupby(keys + ['method_id'], observed=True).size())
+        sex = _split(dff.groupby(keys + ['sex'], observed=True).size())
+
+        rated = dff[dff.rating != 0]
+        rating_sum = rated.groupby(keys, observed=True).rating.sum()
+        rating_count = rated.groupby(keys, observed=True).size()
+
+        # mean rating of every (year, crag, route), sorted by cell, then best rated first, then by route id: the
+        # routes of the cell of ascents.index[i] are rows offsets[i] to offsets[i + 1]
+        means = rated.groupby(keys + ['route_id'], observed=True).rating.mean().round(1)
+        cell = ascents.index.get_indexer(means.index.droplevel('route_id'))
+        ids = means.index.get_level_values('route_id').values
+        order = np.lexsort((ids, -means.values, cell))
+        offsets = np.searchsorted(cell[order], np.arange(len(ascents) + 1))
+        ids, ratings = ids[order], means.values[order]
+
+        for i, (key, count) in enumerate(ascents.items()):
+            cube[key] = Cell({'ascents': count,
+                              'grades': grades[key],
+                              'months': months[key],
+                              'rating_sum': rating_sum.get(key, 0),
+                              'rating_count': rating_count.get(key, 0),
+                              'methods': methods_[key],
+                              'sex': sex[key].sort_index(ascending=False)},
+                             ids[offsets[i]:offsets[i + 1]], ratings[offsets[i]:offsets[i + 1]], routes)
+
+    return cube
+
+
+def range_cell(year_index, route_index, first, last, crag, routes):
+    """
+    Cube cell of a crag (or OVERALL) over the years first to last (both included), from the running sums of
+    year_index.build_year_index: one difference per aggregate, and per route of the crag from the running sums of
+    its ratings in the route index, for the route table
+    """
+    column = year_index['columns'].get(crag)
+    lo = np.searchsorted(year_index['years'], first, 'left')
+    hi = max(np.searchsorted(year_index['years'], last, 'right'), lo)
+    if column is None or year_index['ascents'][hi, column] == year_index['ascents'][lo, column]:
+        return empty_cell
+
+    def total(name):
+        return year_index[name][hi, column] - year_index[name][lo, column]
+
+    def counts(name, labels):
+        """ The non zero counts, by label """
+        values = total(name)
+        return pd.Series(values[values > 0], index=year_index[labels][values > 0])
+
+    # mean rating of the routes of the crag rated in the range
+    ids = year_index['crag_routes'].get(crag, empty_cell['routes'].index.values)
+    rating, rated = route_ratings(route_index, ids, first, last)
+    means = pd.Series(rating[rated > 0] / rated[rated > 0], index=ids[rated > 0]).round(1)
+    table = _route_table(means, routes) if len(means) else empty_cell['routes']
+
+    return {'ascents': int(total('ascents')),
+            'grades': counts('grade_counts', 'grades'),
+            'months': counts('month_counts', 'months'),
+            'rating_sum': total('rating_sum'),
+            'rating_count': total('rating_count'),
+            'methods': counts('method_counts', 'methods'),
+            'sex': counts('sex_counts', 'sexes')[::-1],  # Male first, as in the cube
+            'routes': table,
+            'orders': _route_orders(table)}
+
+
+def average_rating(cell):
+    """ Average of the non zero ratings of a cell, nan when there are none """
+    if cell['rating_count'] == 0:
+        return np.nan
+    return cell['rating_sum'] / cell['rating_count']
+
+
+def _typed_array(values, dtype):
+    """ Numeric array as {dtype, shape, base64 of its little endian bytes}, decoded into a typed array in the browser """
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'shape': list(values.shape), 'data': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def _counts_array(values):
+    """ Counts in the smallest unsigned type that holds them """
+    values = np.asarray(values)
+    for dtype in ['uint8', 'uint16', 'uint32']:
+        if values.size == 0 or values.max() <= np.iinfo(dtype).max:
+            return _typed_array(values, dtype)
+    return _typed_array(values, 'float64')
+
+
+def client_bundle(df_climb, cube):
+    """
+    Everything the clientside callbacks (assets/clientside.js) need, as one compact json object:
+    per (year, crag) ascents, rating sum/count, grade/month/method/sex counts and the route ids of the route tables
+    (rows of a cell between route_offsets[cell] and route_offsets[cell + 1]), and per (route, year) the method/sex
+    counts of the route (rows of a route between stat_offsets[route] and stat_offsets[route + 1], by year).
+    The browser sums the years of a range itself
+    """
+    years = sorted(int(year) for year in df_climb.year.unique())
+    crags = [OVERALL] + sorted(str(crag) for crag in df_climb.crag.dropna().unique())
+    grades = [str(grade) for grade in df_climb.fra_routes.cat.categories if (df_climb.fra_routes == grade).any()]  # easiest first
+    method_ids = sorted(int(method) for method in df_climb.method_id.unique())
+    sexes = ['Male', 'Female']  # same order as the cells
+
+    shape = (len(years), len(crags))
+    ascents = np.zeros(shape, dtype='int32')
+    rating_sum = np.zeros(shape, dtype='int64')
+    rating_count = np.zeros(shape, dtype='int32')
+    grade_counts = np.zeros(shape + (len(grades),), dtype='int32')
+    month_counts = np.zeros(shape + (12,), dtype='int32')
+    method_counts = np.zeros(shape + (len(method_ids),), dtype='int32')
+    sex_counts = np.zeros(shape + (len(sexes),), dtype='int32')
+
+    route_offsets = [0]
+    route_ids = []
+    for y, year in enumerate(years):
+        for c, crag in enumerate(crags):
+            cell = cube.get((year, crag), empty_cell)
+            ascents[y, c] = cell['ascents']
+            rating_sum[y, c] = cell['rating_sum']
+            rating_count[y, c] = cell['rating_count']
+            grade_counts[y, c] = cell['grades'].reindex(grades, fill_value=0).values
+            month_counts[y, c] = cell['months'].reindex(range(1, 13), fill_value=0).values
+            method_counts[y, c] = cell['methods'].reindex(method_ids, fill_value=0).values
+            sex_counts[y, c] = cell['sex'].reindex(sexes, fill_value=0).values
+
+            route_ids.append(cell_routes(cell))
+            route_offsets.append(route_offsets[-1] + len(route_ids[-1]))
+
+    # method and sex counts of every route in every year it was climbed, the ascents resolve_selection counts for a
+    # selected route
+    ascents_by = df_climb[['route_id', 'year', 'method_id', 'sex']].astype({'sex': object})
+    stat_methods = ascents_by.groupby(['route_id', 'year', 'method_id']).size().unstack(fill_value=0).reindex(
+        columns=method_ids, fill_value=0)
+    stat_sex = ascents_by.groupby(['route_id', 'year', 'sex']).size().unstack(fill_value=0).reindex(
+        columns=sexes, fill_value=0).reindex(stat_methods.index, fill_value=0)
+    stat_routes = stat_methods.index.get_level_values('route_id').values
+    stat_offsets = np.searchsorted(stat_routes, np.arange(int(df_climb.route_id.max()) + 2))
+
+    return {'years': years,
+            'crags': crags,
+            'grades': grades,
+            'methods': [methods.get(x, str(x)) for x in method_ids],
+            'sexes': sexes,
+            'ascents': _counts_array(ascents),
+            'rating_sum': _counts_array(rating_sum),
+            'rating_count': _counts_array(rating_count),
+            'grade_counts': _counts_array(grade_counts),
+            'month_counts': _counts_array(month_counts),
+            'method_counts': _counts_array(method_counts),
+            'sex_counts': _counts_array(sex_counts),
+            'route_offsets': _counts_array(route_offsets),
+            'route_ids': _counts_array(np.concatenate(route_ids)),
+            'stat_offsets': _counts_array(stat_offsets),
+            'stat_years': _counts_array(stat_methods.index.get_level_values('year').values),
+            'stat_methods': _counts_array(stat_methods.values),
+            'stat_sex': _counts_array(stat_sex.values)}
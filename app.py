@@ -1,52 +1,233 @@
 # necessary libraries
 import dash
-from dash import dcc, html, dash_table
-import pandas as pd
-from dash.dependencies import Input, Output, State
+from dash import Patch, dcc, html, dash_table
+import numpy as np
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
-import datetime as dt
 import dash_bootstrap_components as dbc
 import base64
-
-# dataframes
-# dataframe with the information of each crag
-df_climb = pd.read_csv('sports_climb.csv')
-# coordenates of each crag
-df_locations = pd.read_csv('crags_coord.csv')
-
-# fixing datatypes
-df_locations['lat'] = df_locations['lat'].astype('float')
-df_locations['lon'] = df_locations['lon'].astype('float')
-
-# fixing dates
-df_climb['date'] = df_climb['date'].apply(lambda x: dt.datetime.fromtimestamp(x))
-df_climb['month'] = df_climb['date'].dt.month
-df_climb['birth'] = df_climb['birth'].astype('datetime64[ns]')
-df_climb['age'] = 2017 - df_climb.birth.dt.year
-
-# fixing sex
-df_climb['sex'] = df_climb.sex.apply(lambda x: 'Male' if x == 0 else 'Female')
-
-# fixing columns
-df_locations.rename(columns={'lat': 'lon', 'lon': 'lat'}, inplace=True)
+import math
+import os
+import tempfile
+import uuid
+from functools import lru_cache, wraps
+from urllib.parse import urlencode
+
+import coalesce
+import metrics
+import payload
+import regions
+import response_cache
+from crag_index import center_bounds, viewport_bounds, viewport_markers
+from climber_index import climber_summary
+from climbers import CHUNKS as CLIMBERS_STEPS, selection_climbers
+from aggregates import OVERALL, average_rating, cell_routes, client_bundle, empty_cell, methods, range_cell, summarise
+from route_index import route_ascents
+from route_search import search_routes
+from route_table import page_records, query_routes
+
+# the regions served (regions.py): the extract next to app.py (sports_climb.csv and crags_coord.csv) is the default
+# region, named CLIMB_DEFAULT_REGION, and every directory under CLIMB_REGIONS with an extract is a region of its name.
+# A region is loaded the first time a browser asks for it, and each worker keeps at most CLIMB_REGION_BUDGET MiB of
+# regions loaded, the least recently used are dropped past it
+DEFAULT_REGION = os.environ.get('CLIMB_DEFAULT_REGION', 'Portugal')
+REGIONS_DIR = os.environ.get('CLIMB_REGIONS')
+REGION_BUDGET = float(os.environ.get('CLIMB_REGION_BUDGET', '1024'))
+# an extract loaded from its csv (no snapshot, or an older one) is written as its snapshot for the next start,
+# CLIMB_WRITE_SNAPSHOT=0 leaves the snapshots alone
+WRITE_SNAPSHOT = os.environ.get('CLIMB_WRITE_SNAPSHOT', '1') == '1'
+regions.configure(DEFAULT_REGION, REGIONS_DIR, int(REGION_BUDGET * 2 ** 20), WRITE_SNAPSHOT)
+
+# the ascents (preprocessed snapshot when available, see snapshot.py) and everything derived from them, computed
+# when the region is loaded: routes numbered by (crag, sector, name) with the index of their ascents, the aggregates
+# per (year, crag) and the spatial index of the map. The callbacks read it through regions.current(), the version of
+# the region of the page, swapped as a whole when new ascents are merged (dataset.py). The default region is
+# loaded at start, by the gunicorn master before it forks the workers
+regions.get(DEFAULT_REGION)
+
+# with CLIMB_DELTA_DIR set, batches of new ascents (csv or parquet files) dropped in that directory are merged
+# every CLIMB_DELTA_INTERVAL seconds
+DELTA_DIR = os.environ.get('CLIMB_DELTA_DIR')
+DELTA_INTERVAL = float(os.environ.get('CLIMB_DELTA_INTERVAL', '5'))
+
+# number of selections (year, crag, route id) kept in the cache of resolve_selection
+SELECTION_CACHE_SIZE = 512
+
+# with CLIMB_CLIENTSIDE=1 the alert and the charts are drawn in the browser (assets/clientside.js) from an
+# aggregate bundle sent once with the layout, instead of by the server callbacks below
+CLIENTSIDE = os.environ.get('CLIMB_CLIENTSIDE', '0') == '1'
+
+# identical callback requests in flight share one computation and the requests superseded by a newer one of the
+# same page are dropped (coalesce.py), CLIMB_COALESCE=0 turns it off
+COALESCE = os.environ.get('CLIMB_COALESCE', '1') == '1'
+
+# with CLIMB_METRICS=1 every callback response gets a Server-Timing header with the time of its phases and the
+# totals are served as prometheus text on /metrics (metrics.py)
+METRICS = os.environ.get('CLIMB_METRICS', '0') == '1'
+
+# numeric trace data goes out as plotly typed arrays (base64 of the values) instead of json lists, and the json and
+# html responses are compressed with gzip or brotli (payload.py), CLIMB_TYPED_ARRAYS=0 and CLIMB_COMPRESS=0 turn
+# them off
+TYPED_ARRAYS = os.environ.get('CLIMB_TYPED_ARRAYS', '1') == '1'
+COMPRESS = os.environ.get('CLIMB_COMPRESS', '1') == '1'
+
+# with CLIMB_RESPONSE_CACHE set to a file, the rendered outputs of the chart callbacks are cached there, on disk,
+# for all the workers and across restarts (response_cache.py). `python response_cache.py` renders every single year
+# state into it before the workers start
+RESPONSE_CACHE = os.environ.get('CLIMB_RESPONSE_CACHE')
+
+# the whole logbook queries (the climbers of the selection) run as dash background callbacks: a job process per query,
+# with its progress shown, cancelled when the selection changes, and its result kept in a diskcache in
+# CLIMB_BACKGROUND_DIR shared by the workers for CLIMB_BACKGROUND_EXPIRE seconds. CLIMB_BACKGROUND=0, or the
+# diskcache, psutil and multiprocess packages missing (pip install "dash[diskcache]"), runs them in the request
+BACKGROUND = os.environ.get('CLIMB_BACKGROUND', '1') == '1'
+BACKGROUND_DIR = os.environ.get('CLIMB_BACKGROUND_DIR', os.path.join(tempfile.gettempdir(), 'climb-background'))
+BACKGROUND_EXPIRE = float(os.environ.get('CLIMB_BACKGROUND_EXPIRE', '3600'))
+
+# with CLIMB_MAP_SELECTION=click a crag is selected by clicking it on the map instead of hovering it,
+# so sweeping the mouse over the map doesn't fire the callbacks
+MAP_SELECTION = 'clickData' if os.environ.get('CLIMB_MAP_SELECTION', 'hover') == 'click' else 'hoverData'
 
 # map figure possible styles
 map_styles = {'1': 'open-street-map', '2': 'stamen-terrain', '3': 'carto-positron'}
 
-# creates map figure
-fig_map = go.Figure()
-
-# adds details
-fig_map.add_traces([go.Scattermapbox(lat=df_locations.lat,
-                                     lon=df_locations.lon,
-                                     text=df_locations.crag,
-                                     marker=go.scattermapbox.Marker(color='#EA6A47', size=15),
-                                     customdata=df_locations.crag)])
-# style
-fig_map.update_layout(mapbox_style=map_styles['2'],
-                      mapbox=dict(center=dict(lat=df_locations['lat'].iloc[0], lon=df_locations['lon'].iloc[0]),
-                                  zoom=8.5),
-                      margin={"r": 0, "t": 0, "l": 0, "b": 0})
+
+def map_markers(version, bounds):
+    """
+    Data of the crag trace and of the cluster trace of the map for a viewport (west, south, east, north, zoom):
+    the map only gets the crags inside its viewport, or clusters of them when there are too many (crag_index.py)
+    """
+    crag_index = version.crag_index
+    with metrics.phase('filter'):
+        positions, clusters = viewport_markers(crag_index, *bounds)
+
+    with metrics.phase('figure'):
+        crags = {'lat': crag_index['lat'][positions], 'lon': crag_index['lon'][positions],
+                 'text': crag_index['crags'][positions], 'customdata': crag_index['crags'][positions]}
+        groups = {'lat': clusters['lat'], 'lon': clusters['lon'],
+                  'text': ['{} crags // {} ascents'.format(n, a)
+                           for n, a in zip(clusters['crags'], clusters['ascents'])],
+                  'size': np.clip(15 + 5 * np.log2(np.maximum(clusters['crags'], 1)), 15, 45)}
+    return crags, groups
+
+
+def map_figure(version):
+    """ Map of the crags of a version, centred on its first crag """
+    center = dict(lat=version.locations['lat'].iloc[0], lon=version.locations['lon'].iloc[0])
+    crags, clusters = map_markers(version, center_bounds(center['lat'], center['lon'], 8.5))
+
+    # creates map figure
+    fig_map = go.Figure()
+
+    # adds details
+    fig_map.add_traces([go.Scattermapbox(lat=crags['lat'],
+                                         lon=crags['lon'],
+                                         text=crags['text'],
+                                         marker=go.scattermapbox.Marker(color='#EA6A47', size=15),
+                                         customdata=crags['customdata']),
+                        # clusters, they have no customdata so hovering them selects no crag
+                        go.Scattermapbox(lat=clusters['lat'],
+                                         lon=clusters['lon'],
+                                         text=clusters['text'],
+                                         hoverinfo='text',
+                                         marker=go.scattermapbox.Marker(color='#1C4E80', size=clusters['size'],
+                                                                        opacity=0.8))])
+    # style
+    fig_map.update_layout(mapbox_style=map_styles['2'],
+                          mapbox=dict(center=center, zoom=8.5),
+                          margin={"r": 0, "t": 0, "l": 0, "b": 0},
+                          showlegend=False,
+                          uirevision='map')  # keeps the viewport of the user when the markers are updated
+    return fig_map
+
+
+# chart templates: the styling is built once here and used as the initial figures of the layout,
+# the callbacks only send the data of the traces (see the Patch objects in the callbacks)
+# Bar Chart - ascents by grade
+fig_bar = go.Figure()
+fig_bar.add_traces([go.Bar(x=[], y=[])])
+fig_bar.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_bar.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_bar.update_traces(marker_color='#1C4E80')  # dark blue
+fig_bar.update_xaxes(type='category')
+fig_bar.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                      xaxis=dict(showgrid=False, title='Grade'),
+                      yaxis=dict(showgrid=False, title='Number of Ascents'))
+
+# Line Plot - ascents by month
+fig_util = go.Figure()
+fig_util.add_traces([go.Scatter(x=[], y=[])])
+fig_util.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_util.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_util.update_traces(marker_color='#1C4E80')  # ligth blue
+fig_util.update_xaxes(type='category')
+fig_util.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                       xaxis=dict(showgrid=False, title='Months'),
+                       yaxis=dict(showgrid=False, title='Number of Ascents'))
+
+# Bar Chart - ascents by method
+fig_method = go.Figure()
+fig_method.add_traces([go.Bar(x=[], y=[])])
+fig_method.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_method.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_method.update_traces(marker_color='#EA6A47')
+fig_method.update_xaxes(type='category')
+fig_method.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                         xaxis=dict(showgrid=False, title='Method'),
+                         yaxis=dict(showgrid=False, title='Number of Ascents'))
+
+# Pie Chart - ascents by sex
+fig_sex = go.Figure()
+fig_sex.add_traces([go.Pie(labels=[], values=[])])
+fig_sex.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_sex.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_sex.update_traces(marker=dict(colors=['#1C4E80', '#EA6A47']))
+fig_sex.update_layout(margin={"r": 35, "t": 35, "l": 35, "b": 35}, title='Sex')
+
+# Bar Chart - ascents of the most active climbers
+fig_climbers = go.Figure()
+fig_climbers.add_traces([go.Bar(x=[], y=[])])
+fig_climbers.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_climbers.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_climbers.update_traces(marker_color='#1C4E80')
+fig_climbers.update_xaxes(type='category')
+fig_climbers.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                           xaxis=dict(showgrid=False, title='Climber'),
+                           yaxis=dict(showgrid=False, title='Number of Ascents'))
+
+# Bar Chart - grade pyramid of a climber, the hardest grade on top
+fig_pyramid = go.Figure()
+fig_pyramid.add_traces([go.Bar(x=[], y=[], orientation='h')])
+fig_pyramid.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_pyramid.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_pyramid.update_traces(marker_color='#1C4E80')
+fig_pyramid.update_yaxes(type='category')
+fig_pyramid.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                          xaxis=dict(showgrid=False, title='Number of Ascents'),
+                          yaxis=dict(showgrid=False, title='Grade'))
+
+# Line Plot - hardest grade climbed by a climber over time
+fig_progression = go.Figure()
+fig_progression.add_traces([go.Scatter(x=[], y=[], line_shape='hv', mode='lines+markers')])
+fig_progression.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_progression.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_progression.update_traces(marker_color='#EA6A47')
+fig_progression.update_yaxes(type='category')  # the grades go up, so they show up in order
+fig_progression.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                              xaxis=dict(showgrid=False, title='Date'),
+                              yaxis=dict(showgrid=False, title='Hardest Grade'))
+
+# Bar Chart - favourite crags of a climber
+fig_favourites = go.Figure()
+fig_favourites.add_traces([go.Bar(x=[], y=[])])
+fig_favourites.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
+fig_favourites.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
+fig_favourites.update_traces(marker_color='#EA6A47')
+fig_favourites.update_xaxes(type='category')
+fig_favourites.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
+                             xaxis=dict(showgrid=False, title='Crag'),
+                             yaxis=dict(showgrid=False, title='Number of Ascents'))
 
 # text used to construct the information hub
 text_head = html.P('Before using the rest of the visualization take a little time exploring about different concepts and '
@@ -61,7 +242,8 @@ text_intro =html.Div([html.P(['Welcome! This dashboard was created for the cours
                              ' list of routes of the selected crag, the grade, the sector and the average rate '
                              'given by the climbers. On the right find more details about the ascent type and the'
                              ' proportion of ascents between male and female climbers.'], style={'text-align': 'justify'}),
-                      html.P(['Feel free to inspect the details for a specific year using the dropdown menu.'],
+                      html.P(['Feel free to inspect the details for a specific year, or for a range of years, using'
+                              ' the year slider.'],
                              style={'text-align': 'justify'}),
                       html.P(['Thanks Cohen for making the data available. Thank you for using the dashboard!'],
                              style={'text-align': 'justify'}),
@@ -81,19 +263,22 @@ text_concepts = html.Div([html.H6('Crag'),
                                  style={'text-align': 'justify'})
                           ])
 
-text_visualzation =html.Div([html.P('The visualization shown on the right is divided into nine parts:',
+text_visualzation =html.Div([html.P('The visualization shown on the right is divided into thirteen parts:',
+                                    style={'text-align': 'justify'}),
+                             html.H6('Dropdown - Region'),
+                             html.P('When the dashboard serves several regions, this component selects the one shown.',
                                     style={'text-align': 'justify'}),
                              html.H6('Dropdown - Overall and Map Option'),
                              html.P('This component allows the user to select between seeing all of the information or '
                                     'the information relative to a specific crag. The crag selection is made on the map.',
                                     style={'text-align': 'justify'}),
-                             html.H6('Dropdown - Year selection'),
+                             html.H6('Slider - Year selection'),
                              html.P('Using this component you can filter the information shown in the graphics and the '
-                                    'table by year.',
+                                    'table by year, or by a range of years by moving its two handles apart.',
                                     style={'text-align': 'justify'}),
                              html.H6('Summary'),
                              html.P('In here you can find the name of the crag you selected on the map, average rating '
-                                    'and number of ascents on the selected year.',
+                                    'and number of ascents on the selected years.',
                                     style={'text-align': 'justify'}),
                              html.H6('Map'),
                              html.P('In this part you can select the crag you want to see by hovering through'
@@ -105,6 +290,11 @@ text_visualzation =html.Div([html.P('The visualization shown on the right is div
                              html.H6('Season'),
                              html.P('Using this graphic you can see the number of ascents in each of the months.',
                                     style={'text-align': 'justify'}),
+                             html.H6('Route search'),
+                             html.P('Type part of the name of a route, of its sector or of its crag, even misspelled, '
+                                    'and pick one of the routes found to see its ascents of the selected years on the '
+                                    'Method and Gender Distribution charts.',
+                                    style={'text-align': 'justify'}),
                              html.H6('Table'),
                              html.P('This part shows the differents routes a specific crag has, their dificulty and the '
                                     'grade given by previous ascensionists.'
@@ -118,6 +308,14 @@ text_visualzation =html.Div([html.P('The visualization shown on the right is div
                              html.H6('Gender Distribution'),
                              html.P('In this part you can see the proportion of males and female ascents.',
                                     style={'text-align': 'justify'}),
+                             html.H6('Climbers'),
+                             html.P('How many climbers logged ascents on the selection, and the ascents of the most '
+                                    'active ones. It reads every ascent of the selection, so it can take a moment.',
+                                    style={'text-align': 'justify'}),
+                             html.H6('Climber'),
+                             html.P('Click a climber on the climbers chart, or type the id of a climber, to see their '
+                                    'grade pyramid, how their hardest grade progressed and their favourite crags.',
+                                    style={'text-align': 'justify'}),
                             ])
 
 authors = html.Div([html.H6('Developers'),
@@ -153,178 +351,513 @@ links = html.Div([html.H6('Data'),
                         href='https://github.com/miguelince/8anu-climbing-logbook',
                         target="_blank"),
                   ])
-# saving the last year selected
-list_year = [2017] #next year selected
-
 # image_filename = 'plotly_logo_v2.png'
 # encoded_image = base64.b64encode(open(image_filename, 'rb').read())
 
 # app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
-
-app.layout = html.Div(style={'backgroundColor': 'white'},
-                      children=[
-                          # This component alerts the user if the information he is selecting doesn't exist on the dataframe
-                          dbc.Alert(id='Alert',
-                                    children=[
-                                        'The information relative to the selected crag is not available for this year!'
-                                        ' Please try another year! Thank you!'],
-                                    dismissable=True,
-                                    is_open=False),  # linked to the alert callback
-
-                          # 1st row - Button + Title
-                          dbc.Row(children=[
-                              # Information Hub
-                              dbc.Col(children=[
-                                  dbc.Button("Read Me!",
-                                             id='Information-Button',
-                                             size='lg'),
-                                  dbc.Offcanvas(children=[text_head,
-                                                          html.Br(),
-                                                          accordion, # constructed above
-                                                          html.Br(),
-                                                          links, #constructed above
-                                                          html.Br(),
-                                                          authors, #constructed above
-                                                          html.H6('Developed using Dash with Plotly'),
-                                                          html.Img(src='assets/plotly_logo_v2.png', style={'width': '50%'})],
-                                               id="Information-Display",
-                                               title="Some Helpful Information",
-                                               is_open=False,
-                                  ),
-                              ], width=2),
-                              # title
-                              dbc.Col(html.H1(style={'textAlign': 'center', 'color': '#1C4E80'},
-                                              children="Sportclimbing Interactive Dashboard")
-                                      , width=10)
-                          ]),
-                          html.Br(),
-                          #2nd Row - Dropdown menus
-                          dbc.Row(children=[
-                              #allows the user to view the overall information of a certain year
-                              dbc.Col(dcc.Dropdown(id='Total',
-                                                   options=['Overall', 'Map - Crag'],
-                                                   value='Overall',
-                                                   clearable=False,
-                                                   style={'backgroundColor': '#F1F1F1'})),
-                              #allows the user to change the year
-                              dbc.Col(dcc.Dropdown(id='year',
-                                                   options=[{'label': str(i), 'value': i} for i in
-                                                            df_climb.query("year != 0").sort_values(
-                                                                'year', ascending= False).year.unique()],
-                                                   value=2017,
-                                                   multi=False,  # disables the option of selecting multiple options
-                                                   clearable=False,
-                                                   style={'backgroundColor': '#F1F1F1'}
-                                                   ))
-                          ]),
-
-                          html.Br(),
-
-                          # 2nd Row - Header(summary of crag)
-                          dbc.Row(children=[
-                              # Header(summary of crag)
-                              dbc.Col(
-                                  html.H2(style={'textAlign': 'left', 'color': '#1C4E80', 'backgroundColor': '#F1F1F1'},
-                                          id='summary',
-                                          children=[],  # linked to 2nd callback
-                                          className="border rounded-end"
-                                          ))
-
-                          ], className= "gx-1"),
-
-                          html.Br(),
-
-                          # 3rd Row - Map Figure + Bar Chart + Line Plot
-                          dbc.Row(children=[
-                              # Map Figure
-                              dbc.Col(dcc.Graph(id='map_chart',
-                                                figure=fig_map,  # map figure defined above
-                                                hoverData=None,
-                                                config={
-                                                    'doubleClick': 'reset',
-                                                    'scrollZoom': False},
-                                                className="border rounded-3")
-                                      , width=4),
-                              # Bar Chart
-                              dbc.Col(dcc.Graph(id='bar_chart_seasons',
-                                                figure={},  # linked to 2nd Callback
-                                                config={
-                                                    'doubleClick': 'reset'
-                                                },
-                                                className="border rounded-3")
-
-                                      , width=4),
-                              # Line Plot
-                              dbc.Col(dcc.Graph(id='line_util',
-                                                figure={},  # linked to 2nd Callback
-                                                config={
-                                                    'doubleClick': 'reset'
-                                                },
-                                                className="border rounded-3")
-                                      , width=4)
-                          ]),
-
-                          html.Br(),
-
-                          # 4th Row - Table + Bar Chart + Pie Chart
-                          dbc.Row(children=[
-                              # Table
-                              dbc.Col(dash_table.DataTable(id='data_table',
-                                                           columns=[],  # linked to 3rd Callback
-                                                           data=[],  # linked to 3rd Callback
-                                                           row_selectable='single',
-                                                           selected_rows=[],  # linked to 4th Callback
-                                                           # page_size=12,
-                                                           page_action='none',
-                                                           # changing the alignment of the first two columns
-                                                           style_cell_conditional=[{'if': {'column_id': c},
-                                                                                    'textAlign': 'left',
-                                                                                    } for c in ['Route', 'Sector']],
-                                                           style_data={'whiteSpace': 'normal',
-                                                                       'height': 'auto',
-                                                                       'backgroundColor':'#F1F1F1'},
-                                                           # style_data_conditional=[{'if':{'row_index':'odd'},
-                                                           #                         'backgroundColor': '#DADADA'}],
-                                                           # styling the name of the columns
-                                                           style_header={'backgroundColor': '#1C4E80',
-                                                                         'fontWeight': 'bold',
-                                                                         'textAlign': 'center',
-                                                                         'color': 'white'},
-                                                           # to be scroll
-                                                           style_table={'height': '450px', 'overflowY': 'auto'})
-                                      , width=4),
-                              # Bar Chart
-                              dbc.Col(dcc.Graph(id='method_dist',
-                                                figure={},  # linked to the 3rd callback
-                                                className="border rounded-3")
-                                      , width=4),
-                              # Pie Chart
-                              dbc.Col(dcc.Graph(id='sex_dist',
-                                                figure={},  # linked to the 3rd callback
-                                                className="border rounded-3")
-                                      , width=4)
-                          ])
-                      ])
+coalesce.install(server)
+regions.install(server)
+if METRICS:
+    metrics.install(server)
+if COMPRESS:
+    # after the metrics in the source, so it runs before them and /metrics counts the compressed bytes
+    payload.install(server)
+if RESPONSE_CACHE:
+    response_cache.configure(RESPONSE_CACHE)
+
+
+def coalesced(function):
+    """ coalesce.coalesce, unless it is turned off """
+    return coalesce.coalesce(function, scope=regions.active_name) if COALESCE else function
+
+
+def instrumented(function):
+    """ metrics.instrument, when the metrics are turned on """
+    return metrics.instrument(function) if METRICS else function
+
+
+def response_generation(region=None, version=None):
+    """
+    Generation of the cached responses: the region, its dataset version and the options that change the outputs.
+    Of the region of the request and its current version by default
+    """
+    region = regions.active_name() if region is None else region
+    version = regions.get(region).current() if version is None else version
+    return response_cache.generation(region, version.fingerprint, TYPED_ARRAYS)
+
+
+def cached_response(key):
+    """ response_cache.cached, when the response cache is turned on """
+    def decorate(function):
+        return response_cache.cached(key, response_generation)(function) if RESPONSE_CACHE else function
+    return decorate
+
+
+def background_manager():
+    """ Manager of the background callbacks, None when they run in the request """
+    if not BACKGROUND:
+        return None
+    try:
+        import diskcache
+        # the results are cached per inputs and dataset version
+        return dash.DiskcacheManager(diskcache.Cache(BACKGROUND_DIR),
+                                     cache_by=[lambda: regions.current().fingerprint], expire=BACKGROUND_EXPIRE)
+    except ImportError:  # dash[diskcache] not installed
+        return None
+
+
+background = background_manager()
+
+# the region of the page and its id, the last states of the callbacks that read the dataset: regions.py reads the
+# region and coalesce.py the id from the callback context
+PAGE_STATES = [State(component_id=regions.REGION_STORE, component_property='data'),
+               State(component_id=coalesce.PAGE_STORE, component_property='data')]
+
+
+def page_callback(*dependencies, page_states=PAGE_STATES, **kwargs):
+    """ app.callback with the page states added after the dependencies, the function doesn't get them """
+    def register(function):
+        @wraps(function)
+        def without_page(*args):
+            return function(*args[:len(args) - len(page_states)])
+        app.callback(*dependencies, *page_states, **kwargs)(without_page)
+        return function
+    return register
+
+
+def background_callback(*dependencies, progress=None, running=None, cancel=None):
+    """
+    page_callback run as a background job when there is a manager. The function gets a set_progress function first,
+    which does nothing when it runs in the request. Only the region of the page is added, the results are shared by
+    the pages
+    """
+    def register(function):
+        if background is not None:
+            page_callback(*dependencies, page_states=PAGE_STATES[:1], background=True, manager=background,
+                          progress=progress, running=running, cancel=cancel)(function)
+        else:
+            @wraps(function)
+            def in_request(*args):
+                return function(lambda *_: None, *args)
+            page_callback(*dependencies, page_states=PAGE_STATES[:1], running=running)(in_request)
+        return function
+    return register
+
+
+def trace_data(values):
+    """ Numeric data of a trace, as a typed array unless they are turned off """
+    return payload.trace_array(values) if TYPED_ARRAYS else values
+
+
+def server_callback(*dependencies):
+    """ page_callback for the callbacks that are replaced by their clientside version in CLIENTSIDE mode """
+    def register(function):
+        if not CLIENTSIDE:
+            page_callback(*dependencies)(function)
+        return function
+    return register
+
+
+def year_marks(version):
+    """ Bounds and marks of the year slider: every year, labelled every 5 years and at both ends """
+    first, last = min(version.years), max(version.years)
+    marks = {year: str(year) if year in (first, last) or year % 5 == 0 else '' for year in range(first, last + 1)}
+    return first, last, marks
+
+
+def year_span(value):
+    """ (first, last) year of the year slider, a single year (sent by older pages) is (year, year) """
+    if isinstance(value, (list, tuple)):
+        return min(value), max(value)
+    return value, value
+
+
+def climb_bundle(version):
+    """ Aggregates used by the clientside callbacks, only in CLIENTSIDE mode """
+    return client_bundle(version.df_climb, version.cube) if CLIENTSIDE else None
+
+
+@lru_cache(maxsize=8)
+def page_layout(region, version):
+    """ The page of a version of a region: its years on the slider, its crags on the map """
+    first, last, marks = year_marks(version)
+    return html.Div(style={'backgroundColor': 'white'},
+                    children=[
+                        # This component alerts the user if the information he is selecting doesn't exist on the dataframe
+                        # aggregates used by the clientside callbacks (only filled in CLIENTSIDE mode)
+                        dcc.Store(id='climb_bundle', data=climb_bundle(version)),
+                        # version of the dataset shown, checked for newer ones when new ascents are watched for
+                        dcc.Store(id='dataset_version', data=version.number),
+                        # region of the page, a state of the callbacks (PAGE_STATES)
+                        dcc.Store(id=regions.REGION_STORE, data=region),
+                        # the page is loaded again (with ?region=) when another region is selected
+                        dcc.Location(id='page', refresh=True),
+                        dcc.Interval(id='dataset_check', interval=DELTA_INTERVAL * 1000, disabled=DELTA_DIR is None),
+
+                        dbc.Alert(id='Alert',
+                                  children=[
+                                      'The information relative to the selected crag is not available for these'
+                                      ' years! Please try other years! Thank you!'],
+                                  dismissable=True,
+                                  is_open=False),  # linked to the alert callback
+
+                        # 1st row - Button + Title
+                        dbc.Row(children=[
+                            # Information Hub
+                            dbc.Col(children=[
+                                dbc.Button("Read Me!",
+                                           id='Information-Button',
+                                           size='lg'),
+                                dbc.Offcanvas(children=[text_head,
+                                                        html.Br(),
+                                                        accordion, # constructed above
+                                                        html.Br(),
+                                                        links, #constructed above
+                                                        html.Br(),
+                                                        authors, #constructed above
+                                                        html.H6('Developed using Dash with Plotly'),
+                                                        html.Img(src='assets/plotly_logo_v2.png', style={'width': '50%'})],
+                                             id="Information-Display",
+                                             title="Some Helpful Information",
+                                             is_open=False,
+                                ),
+                            ], width=2),
+                            # title
+                            dbc.Col(html.H1(style={'textAlign': 'center', 'color': '#1C4E80'},
+                                            children="Sportclimbing Interactive Dashboard")
+                                    , width=10)
+                        ]),
+                        html.Br(),
+                        #2nd Row - Dropdown menu and year slider
+                        dbc.Row(children=[
+                            #region shown, only when there are several
+                            dbc.Col(dcc.Dropdown(id='region',
+                                                 options=regions.names(),
+                                                 value=region,
+                                                 clearable=False,
+                                                 style={'backgroundColor': '#F1F1F1'}),
+                                    width=2, style={} if len(regions.names()) > 1 else {'display': 'none'}),
+                            #allows the user to view the overall information of a certain year
+                            dbc.Col(dcc.Dropdown(id='Total',
+                                                 options=['Overall', 'Map - Crag'],
+                                                 value='Overall',
+                                                 clearable=False,
+                                                 style={'backgroundColor': '#F1F1F1'})),
+                            #allows the user to change the year, or to select a range of years
+                            dbc.Col(dcc.RangeSlider(id='year',
+                                                    min=first,
+                                                    max=last,
+                                                    marks=marks,
+                                                    step=1,
+                                                    value=[last, last],
+                                                    allowCross=False,
+                                                    tooltip={'placement': 'bottom'}
+                                                    ))
+                        ]),
+
+                        html.Br(),
+
+                        # 2nd Row - Header(summary of crag)
+                        dbc.Row(children=[
+                            # Header(summary of crag)
+                            dbc.Col(
+                                html.H2(style={'textAlign': 'left', 'color': '#1C4E80', 'backgroundColor': '#F1F1F1'},
+                                        id='summary',
+                                        children=[],  # linked to 2nd callback
+                                        className="border rounded-end"
+                                        ))
+
+                        ], className= "gx-1"),
+
+                        html.Br(),
+
+                        # 3rd Row - Map Figure + Bar Chart + Line Plot
+                        dbc.Row(children=[
+                            # Map Figure
+                            dbc.Col(dcc.Graph(id='map_chart',
+                                              figure=map_figure(version),  # map of the region
+                                              hoverData=None,
+                                              clickData=None,
+                                              config={
+                                                  'doubleClick': 'reset',
+                                                  'scrollZoom': False},
+                                              className="border rounded-3")
+                                    , width=4),
+                            # Bar Chart
+                            dbc.Col(dcc.Graph(id='bar_chart_seasons',
+                                              figure=fig_bar,  # template defined above, linked to 2nd Callback
+                                              config={
+                                                  'doubleClick': 'reset'
+                                              },
+                                              className="border rounded-3")
+
+                                    , width=4),
+                            # Line Plot
+                            dbc.Col(dcc.Graph(id='line_util',
+                                              figure=fig_util,  # template defined above, linked to 2nd Callback
+                                              config={
+                                                  'doubleClick': 'reset'
+                                              },
+                                              className="border rounded-3")
+                                    , width=4)
+                        ]),
+
+                        html.Br(),
+
+                        # Route search - the routes matching what is typed, across the region (11th callback), the
+                        # one picked drives the bar and pie charts below (4th callback) until the next selection on
+                        # the map or the table clears it (12th callback)
+                        dbc.Row(children=[
+                            dbc.Col(dcc.Dropdown(id='route_search',
+                                                 options=[],  # linked to 11th Callback
+                                                 placeholder='Search a route, sector or crag',
+                                                 style={'backgroundColor': '#F1F1F1'})
+                                    , width=4)
+                        ]),
+
+                        html.Br(),
+
+                        # 4th Row - Table + Bar Chart + Pie Chart
+                        dbc.Row(children=[
+                            # Table
+                            dbc.Col(dash_table.DataTable(id='data_table',
+                                                         columns=[],  # linked to 3rd Callback
+                                                         data=[],  # linked to 3rd Callback
+                                                         row_selectable='single',
+                                                         selected_rows=[],  # linked to 4th Callback
+                                                         # only the visible page is sent by the server,
+                                                         # sorted and filtered there (linked to 3rd Callback)
+                                                         page_size=12,
+                                                         page_current=0,
+                                                         page_action='custom',
+                                                         sort_action='custom',
+                                                         sort_mode='single',
+                                                         sort_by=[],
+                                                         filter_action='custom',
+                                                         filter_query='',
+                                                         # changing the alignment of the first two columns
+                                                         style_cell_conditional=[{'if': {'column_id': c},
+                                                                                  'textAlign': 'left',
+                                                                                  } for c in ['Route', 'Sector']],
+                                                         style_data={'whiteSpace': 'normal',
+                                                                     'height': 'auto',
+                                                                     'backgroundColor':'#F1F1F1'},
+                                                         # style_data_conditional=[{'if':{'row_index':'odd'},
+                                                         #                         'backgroundColor': '#DADADA'}],
+                                                         # styling the name of the columns
+                                                         style_header={'backgroundColor': '#1C4E80',
+                                                                       'fontWeight': 'bold',
+                                                                       'textAlign': 'center',
+                                                                       'color': 'white'},
+                                                         # to be scroll
+                                                         style_table={'height': '450px', 'overflowY': 'auto'})
+                                    , width=4),
+                            # Bar Chart
+                            dbc.Col(dcc.Graph(id='method_dist',
+                                              figure=fig_method,  # template defined above, linked to the 3rd callback
+                                              className="border rounded-3")
+                                    , width=4),
+                            # Pie Chart
+                            dbc.Col(dcc.Graph(id='sex_dist',
+                                              figure=fig_sex,  # template defined above, linked to the 3rd callback
+                                              className="border rounded-3")
+                                    , width=4)
+                        ]),
+
+                        html.Br(),
+
+                        # 5th Row - Climbers of the selection (background job, 7th callback)
+                        dbc.Row(children=[
+                            dbc.Col([html.H4('Climbers', style={'color': '#1C4E80'}),
+                                     html.P(id='climbers_summary', children=[]),
+                                     # progress of the job, only shown while it runs
+                                     html.Progress(id='climbers_progress', value='0', max=str(CLIMBERS_STEPS),
+                                                   style={'display': 'none'})]
+                                    , width=4),
+                            # Bar Chart
+                            dbc.Col(dcc.Graph(id='climbers_chart',
+                                              figure=fig_climbers,  # template defined above, 7th callback
+                                              className="border rounded-3")
+                                    , width=8)
+                        ]),
+
+                        html.Br(),
+
+                        # 6th Row - Climber picked on the climbers chart (or typed) + their charts (9th callback)
+                        dbc.Row(children=[
+                            dbc.Col(dcc.Input(id='climber_id',
+                                              type='number',
+                                              placeholder='Climber id',
+                                              debounce=True,  # on enter or when leaving the box
+                                              style={'backgroundColor': '#F1F1F1'})
+                                    , width=2),
+                            dbc.Col(html.H4(id='climber_summary',
+                                            style={'color': '#1C4E80'},
+                                            children=[]))
+                        ]),
+                        dbc.Row(children=[
+                            # Bar Chart
+                            dbc.Col(dcc.Graph(id='climber_pyramid',
+                                              figure=fig_pyramid,  # template defined above, 9th callback
+                                              className="border rounded-3")
+                                    , width=4),
+                            # Line Plot
+                            dbc.Col(dcc.Graph(id='climber_progression',
+                                              figure=fig_progression,  # template defined above, 9th callback
+                                              className="border rounded-3")
+                                    , width=4),
+                            # Bar Chart
+                            dbc.Col(dcc.Graph(id='climber_crags',
+                                              figure=fig_favourites,  # template defined above, 9th callback
+                                              className="border rounded-3")
+                                    , width=4)
+                        ])
+                    ])
+
+
+def serve_layout():
+    """ The page, of the region of the browser (regions.py), with an id of its own for coalesce.py """
+    return html.Div(children=[dcc.Store(id=coalesce.PAGE_STORE, data=uuid.uuid4().hex),
+                              page_layout(regions.active_name(), regions.current())])
+
+
+app.layout = serve_layout
+
+
+def selected_crag(hoverdata, total_value):
+    """ Returns the crag selected on the map, or OVERALL when the whole year is shown """
+    if hoverdata is None or total_value == 'Overall':  # when no point is selected on the map (no crag selected)
+        return OVERALL
+    return hoverdata['points'][0].get('customdata', OVERALL)  # name of the crag selected, clusters have none
+
+
+@lru_cache(maxsize=SELECTION_CACHE_SIZE)
+def resolve_selection(version, years, crag, route):
+    """
+    Aggregates of a selection in a version of the dataset: the (first, last) years, the crag (or OVERALL) and the
+    route id selected on the table (or None). Every callback reads its selection from here, so each one is only
+    computed once and then served from the cache (resolve_selection.cache_info() has the hits and misses)
+    """
+    metrics.count('cache_misses')
+    first, last = years
+    if route is None and first == last:
+        with metrics.phase('filter'):
+            return version.cube.get((first, crag), empty_cell)
+    if route is None:
+        # a range of years, from the running sums over the years
+        with metrics.phase('aggregate'):
+            return range_cell(version.year_index, version.route_index, first, last, crag, version.routes)
+
+    # ascents of the selected route in the selected years, straight from the route index
+    with metrics.phase('filter'):
+        ascents = version.df_climb.iloc[route_ascents(version.route_index, route, first, last)]
+    with metrics.phase('aggregate'):
+        return summarise(ascents, version.routes)
+
+
+def chart_key(selected_year, hoverdata, total_value):
+    """ Selection shown by bar_chart_seasons, only the ranges of years are evicted from the response cache """
+    years = year_span(selected_year)
+    return [years, selected_crag(hoverdata, total_value)], years[0] != years[1]
+
+
+def pie_key(selected_year, slctd_row_ids, hoverdata, total_value, searched_route):
+    """ Selection shown by style_pie_charts, the route selections and the ranges of years are evicted """
+    years = year_span(selected_year)
+    if searched_route is not None:  # the crag and the table don't matter
+        return [years, None, searched_route], True
+    route = slctd_row_ids[0] if slctd_row_ids else None
+    return [years, selected_crag(hoverdata, total_value), route], years[0] != years[1] or route is not None
+
+
+def warm_response_cache(processes=None):
+    """
+    Renders the charts of every single year state, and of every row of its route table, of every region into the
+    response cache. Returns the number of responses rendered (the ones already cached are skipped)
+    """
+    rendered = 0
+    for region in regions.names():
+        with regions.using(region):
+            rendered += warm_region(processes)
+    return rendered
+
+
+def warm_region(processes=None):
+    """ warm_response_cache for the region of regions.using """
+    version = regions.current()
+    generation = response_generation()
+    response_cache.prune(generation)
+
+    calls = []
+    hovers = [(None, 'Overall')] + [({'points': [{'customdata': crag}]}, 'Map - Crag')
+                                    for crag in version.locations.crag]
+    for year in version.years:
+        for hoverdata, total_value in hovers:
+            calls.append(('bar_chart_seasons', (year, hoverdata, total_value)))
+            cell = resolve_selection(version, (year, year), selected_crag(hoverdata, total_value), None)
+            for route in [None] + cell_routes(cell).tolist():
+                calls.append(('style_pie_charts', (year, [] if route is None else [route], hoverdata, total_value,
+                                                   None)))
+
+    return response_cache.warm(calls, generation, processes)
+
+
+@metrics.gauge
+def response_cache_metrics():
+    """ Hits, misses, stores and evictions of the response cache on /metrics """
+    return ('climb_response_cache_responses', 'Responses found, not found, stored and evicted in the response cache.',
+            [({'outcome': outcome}, n) for outcome, n in response_cache.stats.items()])
+
+
+@metrics.gauge
+def selection_cache_metrics():
+    """ Hits and misses of the selection cache on /metrics """
+    info = resolve_selection.cache_info()
+    return ('climb_selection_cache_lookups', 'Lookups of the selection cache since the last dataset swap.',
+            [({'result': 'hit'}, info.hits), ({'result': 'miss'}, info.misses)])
+
+
+@metrics.gauge
+def region_metrics():
+    """ Bytes of the regions loaded in the process on /metrics """
+    return ('climb_region_bytes', 'Bytes of the regions loaded, the least recently used are dropped past the budget.',
+            [({'region': region}, n) for region, n in regions.resident().items()])
+
+
+@metrics.gauge
+def region_load_metrics():
+    """ Regions loaded and dropped on /metrics """
+    return ('climb_region_loads', 'Regions loaded and dropped by the process.',
+            [({'outcome': outcome}, n) for outcome, n in regions.stats.items()])
+
+
+@metrics.gauge
+def coalesce_metrics():
+    """ Outcomes of the requests seen by coalesce.py on /metrics """
+    return ('climb_coalesced_requests', 'Callback requests computed, shared with an identical one, or superseded.',
+            [({'outcome': outcome}, n) for outcome, n in coalesce.stats.items()])
 
 
 # Alert Callback
-@app.callback(
+@server_callback(
     Output(component_id='Alert', component_property='is_open'),
-    Input(component_id='year', component_property='value'),  # year selected on the dropdown
-    Input(component_id='map_chart', component_property='hoverData'),  # point(crag) selected on the map
+    Input(component_id='year', component_property='value'),  # year (or range of years) selected on the slider
+    Input(component_id='map_chart', component_property=MAP_SELECTION),  # point(crag) selected on the map
     Input(component_id='Total', component_property='value'),  # option selected between map and total of year
     State(component_id='Alert', component_property='is_open')  # default value: is_open = False
 )
+@instrumented
+@coalesced
 def alert_creator(selected_year, hoverdata,total_value, is_open):
     alert_state = is_open  # default == False
 
     # this alert is only activated when a point in the map figure is selected
     if hoverdata is not None and total_value != 'Overall':
-        crag = hoverdata['points'][0]['customdata']  # extrating the name of the crag selected
-        dff = df_climb[(df_climb.year == selected_year)]
-        if crag not in dff.crag.unique():  # checks if the crag exists in the selected year
+        crag = selected_crag(hoverdata, total_value)  # extrating the name of the crag selected
+        cell = resolve_selection(regions.current(), year_span(selected_year), crag, None)
+        if cell['ascents'] == 0:  # checks if the crag exists in the selected years
             alert_state = True  # turns the alert on
         else:
             alert_state = False  # turns the alert off
@@ -338,6 +871,7 @@ def alert_creator(selected_year, hoverdata,total_value, is_open):
     Input(component_id='Information-Button', component_property='n_clicks'),
     State(component_id='Information-Display', component_property='is_open')
 )
+@instrumented
 def toggle_popover(n_clicks, is_open):
     """" This function changes the state to open """
     if n_clicks:  # if the button is clicked
@@ -346,247 +880,386 @@ def toggle_popover(n_clicks, is_open):
 
 
 # 2nd Callback - Header(summary of crag) + Bar Chart + Line Plot: gets this from the map
-@app.callback(
+@server_callback(
     Output(component_id='bar_chart_seasons', component_property='figure'),  # Bar chart
     Output(component_id='line_util', component_property='figure'),  # Line Plot
     Output(component_id='summary', component_property='children'),  # Header(summary of crag)
-    Input(component_id='year', component_property='value'),  # year selected on the dropdown
-    Input(component_id='map_chart', component_property='hoverData'),  # point(crag) selected on the map
+    Input(component_id='year', component_property='value'),  # year (or range of years) selected on the slider
+    Input(component_id='map_chart', component_property=MAP_SELECTION),  # point(crag) selected on the map
     Input(component_id='Total', component_property='value'), # option selected between map and total of year
 )
+@instrumented
+@coalesced
+@cached_response(chart_key)
 def bar_chart_seasons(selected_year, hoverdata, total_value):
     # the months are presented as integers in the dataframe
     # this dict will be used to transform those values into strings
     months = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Apr', 5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct',
               11: 'Nov', 12: 'Dec'}
 
-    if hoverdata is None or total_value == 'Overall':  # when no point is selected on the map (no crag selected)
-        # filtering by the year selected
-        # sorting by month so that the months appear in order on the line plot
-        dff = df_climb[df_climb.year == selected_year].sort_values('month')
-
-        # transforming the integers into strings
-        dff['month'] = dff.month.apply(lambda x: months[x])
-
-        # Creating the Bar Chart
-        fig_bar = go.Figure()
-        fig_bar.add_traces([go.Bar(x=sorted(dff['fra_routes'].unique()),  # sorting by grade
-                                   y=dff.fra_routes.value_counts().sort_index()
-                                   )])
-        fig_bar.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_bar.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_bar.update_traces(marker_color='#1C4E80')  # dark blue
-        fig_bar.update_xaxes(type='category')
-        fig_bar.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                              xaxis=dict(showgrid=False, title='Grade'),
-                              yaxis=dict(showgrid=False, title='Number of Ascents'))
+    # aggregates of the selected years and crag (or of the whole years)
+    crag = selected_crag(hoverdata, total_value)
+    cell = resolve_selection(regions.current(), year_span(selected_year), crag, None)
+
+    with metrics.phase('figure'):
+        # Bar Chart - only the data of the template's trace is sent
+        patch_bar = Patch()
+        patch_bar['data'][0]['x'] = cell['grades'].index.tolist()  # sorted by grade
+        patch_bar['data'][0]['y'] = trace_data(cell['grades'].values)
 
         # Line Plot
-        fig_util = go.Figure()
-        fig_util.add_traces([go.Scatter(x=dff['month'].unique(),
-                                        y=dff.month.value_counts().sort_index()
-                                        )])
-        fig_util.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_util.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_util.update_traces(marker_color='#1C4E80')  # ligth blue
-        fig_util.update_xaxes(type='category')
-        fig_util.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                               xaxis=dict(showgrid=False, title='Months'),
-                               yaxis=dict(showgrid=False, title='Number of Ascents'))
+        patch_util = Patch()
+        patch_util['data'][0]['x'] = [months[x] for x in cell['months'].index]  # sorted by month
+        patch_util['data'][0]['y'] = trace_data(cell['months'].values)
 
         # Header(summary of crag)
-        header = "Overall // " + "Average Rating: {} // ".format(
-            round(dff.query("rating != 0").rating.mean(), 1)) + " Ascents: {}".format(dff.month.value_counts().sum())
-
-        return fig_bar, fig_util, header
-
-    elif hoverdata is not None and total_value != 'Overall':  # when a point is selected on the map (no crag selected)
-        crag = hoverdata['points'][0]['customdata']  # extrating the name of the crag selected
-
-        # creating a dataframe with the input from dropdown and crag selected
-        dff = df_climb[(df_climb.crag == crag) & (df_climb.year == selected_year)].sort_values('month')
-        dff['month'] = dff.month.apply(lambda x: months[x])
-
-        fig_bar = go.Figure()
-        fig_bar.add_traces([go.Bar(x=sorted(dff['fra_routes'].unique()), y=dff.fra_routes.value_counts().sort_index()
-                                   )])
-        fig_bar.layout.plot_bgcolor = '#F1F1F1'
-        fig_bar.layout.paper_bgcolor = '#F1F1F1'
-        fig_bar.update_traces(marker_color='#1C4E80')
-        fig_bar.update_xaxes(type='category')
-        fig_bar.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                              xaxis=dict(showgrid=False, title='Grade'),
-                              yaxis=dict(showgrid=False, title='Number of Ascents'))
-
-        fig_util = go.Figure()
-        fig_util.add_traces([go.Scatter(x=dff['month'].unique(), y=dff.month.value_counts().sort_index()
-                                        )])
-        fig_util.layout.plot_bgcolor = '#F1F1F1'
-        fig_util.layout.paper_bgcolor = '#F1F1F1'
-        fig_util.update_traces(marker_color='#1C4E80')
-        fig_util.update_xaxes(type='category')
-        fig_util.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                               xaxis=dict(showgrid=False, title='Months'),
-                               yaxis=dict(showgrid=False, title='Number of Ascents'))
-
-        header = " {} //".format(crag) + " Average Rating: {} // ".format(
-            round(dff.query("rating != 0").rating.mean(), 1)) + " Ascents: {}".format(dff.month.value_counts().sum())
-
-        return fig_bar, fig_util, header
+        title = "Overall //" if crag == OVERALL else " {} //".format(crag)
+        header = title + " Average Rating: {} // ".format(
+            round(average_rating(cell), 1)) + " Ascents: {}".format(cell['ascents'])
+
+    return patch_bar, patch_util, header
 
 
 # 3rd Callback - Table
-@app.callback(
+@page_callback(
     Output(component_id='data_table', component_property='columns'),  # columns names
-    Output(component_id='data_table', component_property='data'),  # column data
-    Input(component_id='year', component_property='value'),  # year selected on the dropdown
-    Input(component_id='map_chart', component_property='hoverData'),  # point(crag) selected on the map
+    Output(component_id='data_table', component_property='data'),  # column data (visible page)
+    Output(component_id='data_table', component_property='page_count'),  # number of pages
+    Output(component_id='data_table', component_property='page_current'),  # page shown
+    Output(component_id='data_table', component_property='selected_rows'),  # clears the selection of the old page
+    Input(component_id='year', component_property='value'),  # year (or range of years) selected on the slider
+    Input(component_id='map_chart', component_property=MAP_SELECTION),  # point(crag) selected on the map
     Input(component_id='Total', component_property='value'),  # option selected between map and total of year
+    Input(component_id='data_table', component_property='page_current'),  # page selected on the table
+    Input(component_id='data_table', component_property='page_size'),
+    Input(component_id='data_table', component_property='sort_by'),  # column sorted on the table
+    Input(component_id='data_table', component_property='filter_query'),  # filters written on the table
 )
-def data_table(selected_year, hoverdata, total_value):
-    if hoverdata is None or total_value == 'Overall':  # when no point is selected on the map (no crag selected)
-        # filtering by the year selected
-        df_table = df_climb[df_climb.year == selected_year]
-
-        # removing the vias with rating  == 0
-        df_table = df_table.query("rating != 0").groupby(['name', 'sector', 'fra_routes']).rating.mean().round(
-            1).reset_index()
-        df_table.sort_values('rating', ascending=False, inplace=True)
-        df_table.rename(columns={'name': 'Route', 'sector': 'Sector', 'fra_routes': 'Grade', 'rating': 'Rating'},
-                        inplace=True)
-
-        columns = [{'name': i, 'id': i} for i in df_table.columns]  # name of the columns in the table
-        table_data = df_table.to_dict('records')  # data of the table
-
-        return columns, table_data
+@instrumented
+@coalesced
+def data_table(selected_year, hoverdata, total_value, page_current, page_size, sort_by, filter_query):
+    # rated routes of the selected years and crag, already sorted by rating
+    cell = resolve_selection(regions.current(), year_span(selected_year), selected_crag(hoverdata, total_value),
+                              None)
 
-    elif hoverdata is not None and total_value != 'Overall':  # when a point is selected on the map (no crag selected)
-        crag = hoverdata['points'][0]['customdata']  # extrating the name of the crag selected
-        # creating a dataframe with the input from dropdown and crag selected
-        df_table = df_climb[(df_climb.crag == crag) & (df_climb.year == selected_year)]
-        df_table = df_table.query("rating != 0").groupby(['name', 'sector', 'fra_routes']).rating.mean().round(
-            1).reset_index()
+    # a new selection, sort or filter starts again from the first page
+    if set(dash.ctx.triggered_prop_ids) != {'data_table.page_current'}:
+        page_current = 0
 
-        df_table.sort_values('rating', ascending=False, inplace=True)
-        df_table.rename(columns={'name': 'Route', 'sector': 'Sector', 'fra_routes': 'Grade', 'rating': 'Rating'},
-                        inplace=True)
+    with metrics.phase('filter'):
+        positions = query_routes(cell, sort_by, filter_query)
+    page_count = max(1, math.ceil(len(positions) / page_size))
 
-        columns = [{'name': i, 'id': i} for i in df_table.columns]
-        table_data = df_table.to_dict('records')
+    with metrics.phase('figure'):
+        # name of the columns in the table
+        columns = [{'name': i, 'id': i, 'type': 'numeric' if i == 'Rating' else 'text'}
+                   for i in cell['routes'].columns]
+        table_data = page_records(cell, positions, page_current, page_size)  # data of the page
 
-        return columns, table_data
+    return columns, table_data, page_count, page_current, []
 
 
 # 4th Callback - Bar chart + Pie Chart
-@app.callback(
+@server_callback(
     Output(component_id='method_dist', component_property='figure'),  # Bar Chart
     Output(component_id='sex_dist', component_property='figure'),  # Pie Chart
-    Input(component_id='year', component_property='value'),  # year selected on the dropdown
-    Input(component_id='data_table', component_property='derived_virtual_data'),  # data from the table creeated
-    Input(component_id='data_table', component_property='derived_virtual_selected_rows'),  # indices of selected rows
-    Input(component_id='map_chart', component_property='hoverData'),  # point(crag) selected on the map
+    Input(component_id='year', component_property='value'),  # year (or range of years) selected on the slider
+    Input(component_id='data_table', component_property='selected_row_ids'),  # key of the selected route
+    Input(component_id='map_chart', component_property=MAP_SELECTION),  # point(crag) selected on the map
     Input(component_id='Total', component_property='value'),  # option selected between map and total of year
+    Input(component_id='route_search', component_property='value'),  # route id of the route picked on the search
 )
-def style_pie_charts(selected_year, all_rows_data, slctd_rows_indices, hoverdata, total_value):
-    dff_table = pd.DataFrame(all_rows_data)  # tranforming the data into a dataframe
+@instrumented
+@coalesced
+@cached_response(pie_key)
+def style_pie_charts(selected_year, slctd_row_ids, hoverdata, total_value, searched_route):
+    version = regions.current()  # the same version for both selections
+    if searched_route is not None:
+        # the ascents of the route picked on the search in the selected years, wherever it is
+        return pie_figures(resolve_selection(version, year_span(selected_year), OVERALL, searched_route))
+    return pie_figures(table_selection(version, selected_year, slctd_row_ids, hoverdata, total_value))
+
+
+def table_selection(version, selected_year, slctd_row_ids, hoverdata, total_value):
+    """ Aggregates of the route selected on the table, or of the selected years and crag without one """
+    # the aggregates of the selected years and crag (or of the whole years)
+    crag = selected_crag(hoverdata, total_value)
+    cell = resolve_selection(version, year_span(selected_year), crag, None)
+
+    # if a row of the table of the selection was selected, its id is the route id of the route
+    if slctd_row_ids and slctd_row_ids[0] in cell['routes'].index:
+        cell = resolve_selection(version, year_span(selected_year), crag, slctd_row_ids[0])
+    return cell
+
+
+def pie_figures(cell):
+    """ Bar chart of the methods and pie chart of the sexes of a selection """
+    with metrics.phase('figure'):
+        # Bar Chart - only the data of the template's trace is sent
+        patch_method = Patch()
+        patch_method['data'][0]['x'] = [methods.get(x, str(x)) for x in cell['methods'].index]  # sorted by method, unknown ids by id
+        patch_method['data'][0]['y'] = trace_data(cell['methods'].values)
 
-    # if no point on the map was selected or no row was selected on the table
-    if (hoverdata is None or total_value == 'Overall') and (slctd_rows_indices is None or len(slctd_rows_indices) == 0) :
-        # filtering by the selected year
-        dff = df_climb[df_climb.year == selected_year]
+        # Pie Chart
+        patch_sex = Patch()
+        patch_sex['data'][0]['labels'] = cell['sex'].index.tolist()
+        patch_sex['data'][0]['values'] = trace_data(cell['sex'].values)
 
-        # Bar Chart
-        fig_method = go.Figure()
-        # fig_method.add_traces([go.Bar(x=sorted(dff.method_id.unique()), #sorting by method
-        fig_method.add_traces([go.Bar(x=['Redpoint', 'Flash', 'Onsight', 'Top rope', 'Onsight'],  # sorted by method
-                                      y=dff.method_id.value_counts()
-                                      )])
-        fig_method.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_method.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_method.update_traces(marker_color='#EA6A47')
-        fig_method.update_xaxes(type='category')
-        fig_method.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                                 xaxis=dict(showgrid=False, title='Method'),
-                                 yaxis=dict(showgrid=False, title='Number of Ascents'))
+    return patch_method, patch_sex
 
-        # Pie Chart
-        fig_sex = go.Figure()
-        fig_sex.add_traces([go.Pie(labels=dff.sex.unique(),
-                                   values=dff.sex.value_counts()
-                                   )])
-        fig_sex.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_sex.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_sex.update_traces(marker=dict(colors=['#1C4E80', '#EA6A47']))
-        fig_sex.update_layout(margin={"r": 35, "t": 35, "l": 35, "b": 35}, title='Sex')
 
-        return fig_method, fig_sex
+# 11th Callback - routes matching the text typed in the route search, from the name index of the version
+@page_callback(
+    Output(component_id='route_search', component_property='options'),
+    Input(component_id='route_search', component_property='search_value'),  # text typed
+    State(component_id='route_search', component_property='value'),  # route picked, kept in the options
+)
+@instrumented
+@coalesced
+def route_matches(search_value, route):
+    if not search_value:  # a route was picked, or the text cleared: the options stay
+        raise PreventUpdate
+
+    version = regions.current()
+    with metrics.phase('filter'):
+        matches = search_routes(version.search_index, search_value).tolist()
+    if route is not None and route not in matches and route in version.routes.index:
+        matches.append(route)
+
+    routes = version.routes.loc[matches]
+    # the dropdown filters the options by the text typed too, search has it so the approximate matches stay
+    return [{'label': ' // '.join(value for value in row if isinstance(value, str)), 'value': route_id,
+             'search': search_value}
+            for route_id, row in zip(matches, routes[['name', 'sector', 'crag', 'fra_routes']].values)]
+
+
+# 12th Callback - a new selection on the map, or a row selected on the table, clears the route picked on the route
+# search, so the bar and pie charts show that selection again (assets/clientside.js, in both modes)
+app.clientside_callback(
+    ClientsideFunction(namespace='climb', function_name='clear_route_search'),
+    Output(component_id='route_search', component_property='value'),
+    Input(component_id='map_chart', component_property=MAP_SELECTION),
+    Input(component_id='data_table', component_property='selected_row_ids'),
+    State(component_id='route_search', component_property='value'),
+    prevent_initial_call=True
+)
 
-    # if a point on the map was selected but no row was selected on the table
-    elif hoverdata is not None and total_value != 'Overall' and (slctd_rows_indices is None or len(slctd_rows_indices) == 0):
-        crag = hoverdata['points'][0]['customdata']  # extrating the name of the crag selected
 
-        # filtering by the selected year and selected point on the map
-        dff = df_climb[(df_climb.crag == crag) & (df_climb.year == selected_year)]
+# 7th Callback - climbers of the selection, a background job (see BACKGROUND): it reads every ascent of the
+# selection, the whole logbook for Overall over all the years
+@background_callback(
+    Output(component_id='climbers_chart', component_property='figure'),
+    Output(component_id='climbers_summary', component_property='children'),
+    Input(component_id='year', component_property='value'),  # year (or range of years) selected on the slider
+    Input(component_id='map_chart', component_property=MAP_SELECTION),  # point(crag) selected on the map
+    Input(component_id='Total', component_property='value'),  # option selected between map and total of year
+    progress=[Output(component_id='climbers_progress', component_property='value'),
+              Output(component_id='climbers_progress', component_property='max')],
+    running=[(Output(component_id='climbers_progress', component_property='style'), {'width': '100%'},
+              {'display': 'none'})],
+    # a new selection cancels the job of the old one
+    cancel=[Input(component_id='year', component_property='value'),
+            Input(component_id='map_chart', component_property=MAP_SELECTION),
+            Input(component_id='Total', component_property='value')]
+)
+@instrumented
+def climbers_panel(set_progress, selected_year, hoverdata, total_value):
+    first, last = year_span(selected_year)
+    with metrics.phase('aggregate'):
+        climbers = selection_climbers(regions.current(), first, last, selected_crag(hoverdata, total_value),
+                                      progress=lambda done, total: set_progress((str(done), str(total))))
 
-        # Bar Chart
-        fig_method = go.Figure()
-        # fig_method.add_traces([go.Bar(x=sorted(dff.method_id.unique()),  # sorting by method
-        fig_method.add_traces([go.Bar(x=['Redpoint', 'Flash', 'Onsight', 'Top rope', 'Onsight'],  # sorted by method
-                                      y=dff.method_id.value_counts()
-                                      )])
-        fig_method.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_method.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_method.update_traces(marker_color='#EA6A47')
-        fig_method.update_xaxes(type='category')
-        fig_method.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                                 xaxis=dict(showgrid=False, title='Method'),
-                                 yaxis=dict(showgrid=False, title='Number of Ascents'))
+    with metrics.phase('figure'):
+        # Bar Chart - only the data of the template's trace is sent
+        patch_climbers = Patch()
+        patch_climbers['data'][0]['x'] = ['Climber {}'.format(user) for user in climbers['top'].index]
+        patch_climbers['data'][0]['y'] = trace_data(climbers['top'].values)
+        patch_climbers['data'][0]['customdata'] = climbers['top'].index.tolist()  # user ids, for the climber view
 
-        # Pie Chart
-        fig_sex = go.Figure()
-        fig_sex.add_traces([go.Pie(labels=dff.sex.unique(),
-                                   values=dff.sex.value_counts()
-                                   )])
-        fig_sex.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_sex.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_sex.update_traces(marker=dict(colors=['#1C4E80', '#EA6A47']))
-        fig_sex.update_layout(margin={"r": 35, "t": 35, "l": 35, "b": 35}, title='Sex')
+        summary = '{} climbers // {} ascents'.format(climbers['climbers'], climbers['ascents'])
+        if climbers['climbers']:
+            summary += ' // {:.1f} ascents per climber'.format(climbers['ascents'] / climbers['climbers'])
 
-        return fig_method, fig_sex
+    return patch_climbers, summary
 
-    # if a point on the map was selected or not and a  row was selected on the table
-    elif (slctd_rows_indices is not None and total_value != 'Overall') or (slctd_rows_indices is not None and total_value == 'Overall') :
-        selected_via = dff_table.iloc[slctd_rows_indices[0], 0]  # via selection
 
-        # filtering by the selected year and selected via
-        dff = df_climb[(df_climb.name == selected_via) & (df_climb.year == selected_year)]
+# 8th Callback - the climber clicked on the climbers chart goes to the climber id box
+@app.callback(
+    Output(component_id='climber_id', component_property='value'),
+    Input(component_id='climbers_chart', component_property='clickData'),
+    prevent_initial_call=True
+)
+@instrumented
+def pick_climber(clickdata):
+    if clickdata is None or 'customdata' not in clickdata['points'][0]:
+        raise PreventUpdate
+    return clickdata['points'][0]['customdata']
+
+
+# 9th Callback - climber view: grade pyramid, progression of the hardest grade and favourite crags of a climber,
+# one slice of the ascents sorted by climber (climber_index.py)
+@page_callback(
+    Output(component_id='climber_pyramid', component_property='figure'),
+    Output(component_id='climber_progression', component_property='figure'),
+    Output(component_id='climber_crags', component_property='figure'),
+    Output(component_id='climber_summary', component_property='children'),
+    Input(component_id='climber_id', component_property='value')  # user id of the climber
+)
+@instrumented
+@coalesced
+def climber_view(user_id):
+    with metrics.phase('filter'):
+        climber = climber_summary(regions.current().climber_index, -1 if user_id is None else int(user_id))
+
+    with metrics.phase('figure'):
+        # Bar Chart - only the data of the template's trace is sent
+        patch_pyramid = Patch()
+        patch_pyramid['data'][0]['x'] = trace_data(climber['pyramid'].values)
+        patch_pyramid['data'][0]['y'] = climber['pyramid'].index.tolist()
+
+        # Line Plot
+        patch_progression = Patch()
+        patch_progression['data'][0]['x'] = [str(date)[:10] for date in climber['progression'].index.values]
+        patch_progression['data'][0]['y'] = climber['progression'].values.tolist()
 
         # Bar Chart
-        fig_method = go.Figure()
-        # fig_method.add_traces([go.Bar(x=sorted(dff.method_id.unique()),
-        fig_method.add_traces([go.Bar(x=['Redpoint', 'Flash', 'Onsight', 'Top rope', 'Onsight'],
-                                      y=dff.method_id.value_counts()
-                                      )])
-        fig_method.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_method.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_method.update_traces(marker_color='#EA6A47')
-        fig_method.update_xaxes(type='category')
-        fig_method.update_layout(margin={"r": 10, "t": 10, "l": 10, "b": 10},
-                                 xaxis=dict(showgrid=False, title='Method'),
-                                 yaxis=dict(showgrid=False, title='Number of Ascents'))
-
-        # Pie Graph
-        fig_sex = go.Figure()
-        fig_sex.add_traces([go.Pie(labels=dff.sex.unique(),
-                                   values=dff.sex.value_counts()
-                                   )])
-        fig_sex.layout.plot_bgcolor = '#F1F1F1'  # changing the plot background color
-        fig_sex.layout.paper_bgcolor = '#F1F1F1'  # changing the figure background color
-        fig_sex.update_traces(marker=dict(colors=['#1C4E80', '#EA6A47']))
-        fig_sex.update_layout(margin={"r": 35, "t": 35, "l": 35, "b": 35}, title='Sex')
-
-        return fig_method, fig_sex
+        patch_crags = Patch()
+        patch_crags['data'][0]['x'] = climber['crags'].index.tolist()
+        patch_crags['data'][0]['y'] = trace_data(climber['crags'].values)
+
+        if user_id is None:
+            summary = 'Pick a climber on the climbers chart, or type a climber id'
+        elif climber['ascents'] == 0:
+            summary = 'Climber {} // no ascents'.format(user_id)
+        else:
+            summary = 'Climber {} // {} ascents from {} to {} // Hardest: {}'.format(
+                user_id, climber['ascents'], str(climber['first'])[:4], str(climber['last'])[:4],
+                climber['progression'].iloc[-1] if len(climber['progression']) else '-')
+
+    return patch_pyramid, patch_progression, patch_crags, summary
+
+
+# 5th Callback - Map: crags (or clusters of crags) inside the viewport, sent again when the map is moved
+@page_callback(
+    Output(component_id='map_chart', component_property='figure'),
+    Input(component_id='map_chart', component_property='relayoutData'),  # zoom and corners of the map
+)
+@instrumented
+@coalesced
+def map_viewport(relayout):
+    bounds = viewport_bounds(relayout)
+    if bounds is None:  # the first render or a change that doesn't move the map
+        raise PreventUpdate
+
+    crags, clusters = map_markers(regions.current(), bounds)
+
+    # only the data of the two traces is sent, the layout (and the viewport of the user) is kept
+    patch_map = Patch()
+    with metrics.phase('figure'):
+        for key in ['lat', 'lon']:
+            patch_map['data'][0][key] = trace_data(crags[key])
+            patch_map['data'][1][key] = trace_data(clusters[key])
+        for key in ['text', 'customdata']:
+            patch_map['data'][0][key] = crags[key]
+        patch_map['data'][1]['text'] = clusters['text']
+        patch_map['data'][1]['marker']['size'] = trace_data(clusters['size'])
+
+    return patch_map
+
+
+# 6th Callback - years (and clientside aggregates) of a newer version of the dataset, see DELTA_DIR
+@page_callback(
+    Output(component_id='year', component_property='min'),
+    Output(component_id='year', component_property='max'),
+    Output(component_id='year', component_property='marks'),
+    Output(component_id='dataset_version', component_property='data'),
+    *([Output(component_id='climb_bundle', component_property='data')] if CLIENTSIDE else []),
+    Input(component_id='dataset_check', component_property='n_intervals'),
+    State(component_id='dataset_version', component_property='data'),  # version the page shows
+)
+@instrumented
+def dataset_update(n_intervals, shown_version):
+    version = regions.current()
+    if version.number == shown_version:
+        raise PreventUpdate
+
+    return [*year_marks(version), version.number] + ([climb_bundle(version)] if CLIENTSIDE else [])
+
+
+# 10th Callback - another region selected: the page is loaded again with it (regions.install sets the cookie)
+@page_callback(
+    Output(component_id='page', component_property='href'),
+    Input(component_id='region', component_property='value'),  # region selected on the region dropdown
+    prevent_initial_call=True
+)
+def choose_region(region):
+    if region == regions.active_name():
+        raise PreventUpdate
+    return '?' + urlencode({'region': region})
+
+
+def dataset_swapped(region, version):
+    """ The cached selections, pages and responses of older versions are dropped, nothing asks for them anymore """
+    resolve_selection.cache_clear()
+    page_layout.cache_clear()
+    if RESPONSE_CACHE:
+        response_cache.prune(response_generation(region, version))
+
+
+@regions.on_evict
+def region_dropped(region):
+    """ The cached selections and pages hold versions of the region, they would keep it in memory """
+    resolve_selection.cache_clear()
+    page_layout.cache_clear()
+
+
+def watch_deltas():
+    """
+    Starts merging the batches of new ascents dropped in DELTA_DIR (in DELTA_DIR/<region> for the regions but the
+    default one), in the process serving the requests
+    """
+    if DELTA_DIR:
+        regions.watch(DELTA_DIR, DELTA_INTERVAL, on_swap=dataset_swapped)
+
+
+# clientside versions of the alert, 2nd and 4th callbacks, drawn from the bundle
+if CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace='climb', function_name='alert_creator'),
+        Output(component_id='Alert', component_property='is_open'),
+        Input(component_id='year', component_property='value'),
+        Input(component_id='map_chart', component_property=MAP_SELECTION),
+        Input(component_id='Total', component_property='value'),
+        State(component_id='Alert', component_property='is_open'),
+        State(component_id='climb_bundle', component_property='data')
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='climb', function_name='bar_chart_seasons'),
+        Output(component_id='bar_chart_seasons', component_property='figure'),
+        Output(component_id='line_util', component_property='figure'),
+        Output(component_id='summary', component_property='children'),
+        Input(component_id='year', component_property='value'),
+        Input(component_id='map_chart', component_property=MAP_SELECTION),
+        Input(component_id='Total', component_property='value'),
+        State(component_id='bar_chart_seasons', component_property='figure'),  # the templates, to keep their style
+        State(component_id='line_util', component_property='figure'),
+        State(component_id='climb_bundle', component_property='data')
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='climb', function_name='style_pie_charts'),
+        Output(component_id='method_dist', component_property='figure'),
+        Output(component_id='sex_dist', component_property='figure'),
+        Input(component_id='year', component_property='value'),
+        Input(component_id='data_table', component_property='selected_row_ids'),
+        Input(component_id='map_chart', component_property=MAP_SELECTION),
+        Input(component_id='Total', component_property='value'),
+        Input(component_id='route_search', component_property='value'),
+        State(component_id='method_dist', component_property='figure'),
+        State(component_id='sex_dist', component_property='figure'),
+        State(component_id='climb_bundle', component_property='data')
+    )
 
 
 if __name__ == '__main__':
+    watch_deltas()
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,256 @@
+// clientside versions of alert_creator, bar_chart_seasons and style_pie_charts, used when app.py runs with
+// CLIMB_CLIENTSIDE=1, and clear_route_search, used in both modes. They read the aggregates from the bundle built by aggregates.client_bundle, so a hover on
+// the map doesn't need the server to redraw the charts. The year is a single year or a [first, last] range of
+// years, the counts of a range are the difference of two running sums over the years.
+(function () {
+    var typedArrays = {
+        uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array, int32: Int32Array, float64: Float64Array
+    };
+
+    // per (year, crag) arrays of the bundle, summed over the years of a range
+    var perCell = ['ascents', 'rating_sum', 'rating_count', 'grade_counts', 'month_counts', 'method_counts',
+                   'sex_counts'];
+
+    // the bundle is decoded once and kept for the following calls
+    var decoded = null;
+    var decodedFrom = null;
+
+    function decodeArray(array) {
+        var binary = atob(array.data);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new typedArrays[array.dtype](bytes.buffer);
+    }
+
+    // running sums over the years (first axis) of a (years, ...) array, after a row of zeros
+    function running(array, years) {
+        var row = array.length / years;
+        var sums = new Float64Array(array.length + row);
+        for (var i = 0; i < array.length; i++) {
+            sums[row + i] = sums[i] + array[i];
+        }
+        return sums;
+    }
+
+    function decode(bundle) {
+        if (decodedFrom !== bundle) {
+            decoded = {bundle: bundle, crags: {}, running: {}};
+            bundle.crags.forEach(function (crag, i) { decoded.crags[crag] = i; });
+            Object.keys(bundle).forEach(function (key) {
+                if (bundle[key] && bundle[key].dtype) {
+                    decoded[key] = decodeArray(bundle[key]);
+                }
+            });
+            perCell.forEach(function (key) {
+                decoded.running[key] = running(decoded[key], bundle.years.length);
+            });
+            decodedFrom = bundle;
+        }
+        return decoded;
+    }
+
+    // same as selected_crag in app.py
+    function selectedCrag(hoverdata, total) {
+        if (hoverdata === null || hoverdata === undefined || total === 'Overall') {
+            return 'Overall';
+        }
+        var crag = hoverdata.points[0].customdata;  // the clusters have none
+        return crag === undefined ? 'Overall' : crag;
+    }
+
+    // first and last year of the year slider, a single year is a range of one year
+    function yearSpan(year) {
+        return Array.isArray(year) ? [Math.min.apply(null, year), Math.max.apply(null, year)] : [year, year];
+    }
+
+    // number of years of the bundle before a year (after it, too, when after is true)
+    function yearPosition(years, year, after) {
+        var lo = 0;
+        var hi = years.length;
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (years[mid] < year || (after && years[mid] === year)) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    // a crag (or Overall) over a range of years: the years [lo, hi) of the bundle and the column of the crag,
+    // null for the crags without ascents
+    function selection(data, year, crag) {
+        var span = yearSpan(year);
+        var c = data.crags[crag];
+        if (c === undefined) {
+            return null;
+        }
+        var lo = yearPosition(data.bundle.years, span[0], false);
+        var hi = Math.max(yearPosition(data.bundle.years, span[1], true), lo);
+        return {first: span[0], last: span[1], lo: lo, hi: hi, crag: c};
+    }
+
+    // sums over the years of the selection of the labels (one for the totals) of a per (year, crag) array
+    function sumOver(data, key, selected, labels) {
+        var sums = [];
+        for (var i = 0; i < labels; i++) {
+            if (selected === null) {
+                sums.push(0);
+            } else {
+                var cells = data.bundle.crags.length * labels;
+                var column = selected.crag * labels + i;
+                var running = data.running[key];
+                sums.push(running[selected.hi * cells + column] - running[selected.lo * cells + column]);
+            }
+        }
+        return sums;
+    }
+
+    // labels and values of the non zero values
+    function nonZero(values, labels) {
+        var x = [];
+        var y = [];
+        for (var i = 0; i < labels.length; i++) {
+            if (values[i] > 0) {
+                x.push(labels[i]);
+                y.push(values[i]);
+            }
+        }
+        return [x, y];
+    }
+
+    // labels and counts of the non zero counts of a per (year, crag, label) array over the selection
+    function counts(data, key, selected, labels) {
+        return nonZero(sumOver(data, key, selected, labels.length), labels);
+    }
+
+    // true when the route is in the route table of one of the years of the selection
+    function inTables(data, selected, routeId) {
+        for (var y = selected.lo; y < selected.hi; y++) {
+            var cell = y * data.bundle.crags.length + selected.crag;
+            for (var row = data.route_offsets[cell]; row < data.route_offsets[cell + 1]; row++) {
+                if (data.route_ids[row] === routeId) {
+                    return true;
+                }
+            }
+        }
+        return false;
+    }
+
+    // method and sex counts of the ascents of a route in the years of the selection
+    function routeStats(data, selected, routeId) {
+        var methods = data.bundle.methods.length;
+        var sexes = data.bundle.sexes.length;
+        var methodSums = new Array(methods).fill(0);
+        var sexSums = new Array(sexes).fill(0);
+        for (var row = data.stat_offsets[routeId]; row < data.stat_offsets[routeId + 1]; row++) {
+            if (data.stat_years[row] >= selected.first && data.stat_years[row] <= selected.last) {
+                for (var i = 0; i < methods; i++) {
+                    methodSums[i] += data.stat_methods[row * methods + i];
+                }
+                for (var j = 0; j < sexes; j++) {
+                    sexSums[j] += data.stat_sex[row * sexes + j];
+                }
+            }
+        }
+        return [nonZero(methodSums, data.bundle.methods), nonZero(sexSums, data.bundle.sexes)];
+    }
+
+    // copy of a figure with new data on its single trace
+    function withTrace(figure, trace) {
+        return Object.assign({}, figure, {data: [Object.assign({}, figure.data[0], trace)]});
+    }
+
+    // python's round(x, 1): toFixed breaks the exact ties (x * 4 an odd integer, the only ones a double can hold)
+    // upwards, python to the even digit
+    function round1(x) {
+        if (Number.isInteger(x * 4) && !Number.isInteger(x * 2)) {
+            var down = Math.floor(x * 10) / 10;
+            return Math.round(down * 10) % 2 === 0 ? down : Math.ceil(x * 10) / 10;
+        }
+        return Number(x.toFixed(1));
+    }
+
+    // python's formatting of the rounded average rating
+    function formatRating(ratingSum, ratingCount) {
+        if (ratingCount === 0) {
+            return 'nan';
+        }
+        var rating = round1(ratingSum / ratingCount);
+        return Number.isInteger(rating) ? rating.toFixed(1) : String(rating);
+    }
+
+    var months = ['Jan', 'Fev', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dec'];
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        climb: {
+            alert_creator: function (year, hoverdata, total, isOpen, bundle) {
+                if (hoverdata === null || hoverdata === undefined || total === 'Overall') {
+                    return isOpen;
+                }
+                var data = decode(bundle);
+                return sumOver(data, 'ascents', selection(data, year, selectedCrag(hoverdata, total)), 1)[0] === 0;
+            },
+
+            bar_chart_seasons: function (year, hoverdata, total, figBar, figUtil, bundle) {
+                var data = decode(bundle);
+                var crag = selectedCrag(hoverdata, total);
+                var selected = selection(data, year, crag);
+
+                var grades = counts(data, 'grade_counts', selected, bundle.grades);
+                var perMonth = counts(data, 'month_counts', selected, months);
+
+                var title = crag === 'Overall' ? 'Overall //' : ' ' + crag + ' //';
+                var rating = formatRating(sumOver(data, 'rating_sum', selected, 1)[0],
+                                          sumOver(data, 'rating_count', selected, 1)[0]);
+                var header = title + ' Average Rating: ' + rating + ' //  Ascents: ' +
+                    sumOver(data, 'ascents', selected, 1)[0];
+
+                return [withTrace(figBar, {x: grades[0], y: grades[1]}),
+                        withTrace(figUtil, {x: perMonth[0], y: perMonth[1]}),
+                        header];
+            },
+
+            style_pie_charts: function (year, rowIds, hoverdata, total, searchedRoute, figMethod, figSex, bundle) {
+                var data = decode(bundle);
+                var selected = selection(data, year, selectedCrag(hoverdata, total));
+
+                var methodCounts = counts(data, 'method_counts', selected, bundle.methods);
+                var sexCounts = counts(data, 'sex_counts', selected, bundle.sexes);
+
+                // the route picked on the route search, wherever it is
+                if (searchedRoute !== null && searchedRoute !== undefined) {
+                    var span = yearSpan(year);
+                    var searched = routeStats(data, {first: span[0], last: span[1]}, searchedRoute);
+                    methodCounts = searched[0];
+                    sexCounts = searched[1];
+                } else if (selected !== null && rowIds && rowIds.length > 0 && inTables(data, selected, rowIds[0])) {
+                    // the id of a row is the route id of its route, looked up in the route tables of the years
+                    var routeCounts = routeStats(data, selected, rowIds[0]);
+                    methodCounts = routeCounts[0];
+                    sexCounts = routeCounts[1];
+                }
+
+                return [withTrace(figMethod, {x: methodCounts[0], y: methodCounts[1]}),
+                        withTrace(figSex, {labels: sexCounts[0], values: sexCounts[1]})];
+            },
+
+            // a new selection on the map, or a row selected on the table, clears the route picked on the search.
+            // The table clearing its own selection (a new page of routes) doesn't
+            clear_route_search: function (mapSelection, rowIds, route) {
+                var triggered = window.dash_clientside.callback_context.triggered.map(function (trigger) {
+                    return trigger.prop_id;
+                });
+                var rowCleared = triggered.length === 1 && triggered[0] === 'data_table.selected_row_ids' &&
+                    !(rowIds && rowIds.length > 0);
+                if (route === null || route === undefined || rowCleared) {
+                    return window.dash_clientside.no_update;
+                }
+                return null;
+            }
+        }
+    });
+})();
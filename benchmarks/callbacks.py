@@ -0,0 +1,188 @@
+# micro benchmark of the server callbacks of the dashboard (alert_creator, bar_chart_seasons, data_table,
+# climbers_panel and style_pie_charts) called directly, without dash and the http server in front of them, for every year x every crag
+# (and no crag) x Overall/Map, with and without a route selected on the table, on the extract and on copies of it
+# 10x, 100x, 1000x bigger.
+#
+# Each call is measured twice: cold, with the cache of resolve_selection emptied first (what the first callback of a
+# new selection pays), and warm (what the other callbacks of the same selection pay). The time includes the json
+# encoding of the outputs, as dash does it. Allocations are measured in a separate pass with tracemalloc, which
+# slows everything down.
+#
+# The results are written as json (benchmarks/results/callbacks-<commit>.json by default) and --compare prints the
+# ratios against the results of another commit.
+#
+# usage: python benchmarks/callbacks.py [--scale 1 10 100] [--repeat 3] [--out results.json] [--compare old.json]
+import argparse
+import contextvars
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import dash  # noqa: E402
+from dash._callback_context import context_value  # noqa: E402
+from dash._utils import AttributeDict  # noqa: E402
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+import app  # noqa: E402
+import dataset  # noqa: E402
+import regions  # noqa: E402
+from dash_requests import hover_data, states  # noqa: E402
+
+PERCENTILES = [50, 95, 99]
+
+
+def scaled(df_climb, scale):
+    """
+    The extract copied scale times, each copy with climbers of its own (same routes, more ascents and climbers).
+    Built from the prepared ascents, so the categoricals and the schema are kept
+    """
+    if scale == 1:
+        return df_climb.copy()
+    offsets = np.repeat(np.arange(scale, dtype=np.int64) * (int(df_climb.user_id.max()) + 1), len(df_climb))
+    df = pd.concat([df_climb] * scale, ignore_index=True)
+    df['user_id'] = (df.user_id.values + offsets).astype(df_climb.user_id.dtype)
+    return df
+
+
+def raw(callback):
+    """ The callback itself, without coalesce.py, metrics.py and response_cache.py around it """
+    return inspect.unwrap(callback)
+
+
+def no_progress(progress):
+    """ set_progress of the background callbacks, called directly """
+
+
+def calls(version):
+    """ (callback name, args, triggered input) of every combination measured """
+    for year, crag, total in states(version.years, version.df_climb.crag.cat.categories):
+        hover = hover_data(crag)
+        yield 'alert_creator', (year, hover, total, False), 'map_chart.hoverData'
+        yield 'bar_chart_seasons', (year, hover, total), 'map_chart.hoverData'
+        yield 'data_table', (year, hover, total, 0, 12, [], ''), 'map_chart.hoverData'
+        yield 'climbers_panel', (no_progress, year, hover, total), 'map_chart.hoverData'
+
+        # without a selected route, with the first route of the table of the selection selected, and with it picked on
+        # the route search
+        yield 'style_pie_charts', (year, [], hover, total, None), 'map_chart.hoverData'
+        cell = app.resolve_selection(version, app.year_span(year), app.selected_crag(hover, total), None)
+        if len(cell['routes']):
+            yield 'style_pie_charts (row)', (year, [int(cell['routes'].index[0])], hover, total, None), \
+                'data_table.selected_row_ids'
+            yield 'style_pie_charts (search)', (year, [], hover, total, int(cell['routes'].index[0])), \
+                'route_search.value'
+
+
+def call(name, args, triggered):
+    """ Calls a callback as dash would, returns the list of its outputs """
+    function = raw(getattr(app, name.split()[0]))
+    # dash.ctx reads the inputs that triggered the callback from this context variable
+    context = contextvars.copy_context()
+    context.run(context_value.set, AttributeDict(triggered_inputs=[{'prop_id': triggered, 'value': None}]))
+    outputs = context.run(function, *args)
+    return list(outputs) if isinstance(outputs, (list, tuple)) else [outputs]
+
+
+def run(name, args, triggered):
+    """ Calls a callback, returns the json of its outputs """
+    return to_json_plotly(call(name, args, triggered))
+
+
+def measure(version, repeat):
+    """ Latencies (cold and warm, in ms), allocation peaks (KiB) and json sizes (bytes) per callback """
+    results = {}
+    for name, args, triggered in list(calls(version)):
+        result = results.setdefault(name, {'cold': [], 'warm': [], 'allocated': [], 'bytes': []})
+        for _ in range(repeat):
+            app.resolve_selection.cache_clear()
+            start = time.perf_counter()
+            run(name, args, triggered)
+            result['cold'].append(1000 * (time.perf_counter() - start))
+
+            start = time.perf_counter()
+            payload = run(name, args, triggered)
+            result['warm'].append(1000 * (time.perf_counter() - start))
+        result['bytes'].append(len(payload))
+
+        # peak of the memory allocated during a cold call
+        app.resolve_selection.cache_clear()
+        tracemalloc.start()
+        run(name, args, triggered)
+        result['allocated'].append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+    return {name: {'calls': len(result['bytes']),
+                   **{'{}_p{}_ms'.format(cache, p): float(np.percentile(result[cache], p))
+                      for cache in ['cold', 'warm'] for p in PERCENTILES},
+                   **{'allocated_p{}_kib'.format(p): float(np.percentile(result['allocated'], p)) for p in PERCENTILES},
+                   'bytes_mean': float(np.mean(result['bytes'])), 'bytes_max': int(np.max(result['bytes']))}
+            for name, result in results.items()}
+
+
+def commit():
+    """ Commit of the tree measured, with a + when it has uncommitted changes """
+    try:
+        head = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT).returncode != 0
+        return head + ('+' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results, previous=None):
+    columns = ['cold_p50_ms', 'cold_p99_ms', 'warm_p50_ms', 'warm_p99_ms', 'allocated_p99_kib', 'bytes_mean']
+    print('{:>6}  {:<24}{:>7}'.format('scale', 'callback', 'calls') + ''.join('{:>19}'.format(c) for c in columns))
+    for scale, callbacks in results['scales'].items():
+        for name, metrics in callbacks.items():
+            line = '{:>6}  {:<24}{:>7}'.format(scale, name, metrics['calls'])
+            for column in columns:
+                before = ((previous or {}).get('scales', {}).get(scale, {}).get(name) or {}).get(column)
+                ratio = ' ({:.2f}x)'.format(metrics[column] / before) if before else ''
+                line += '{:>19}'.format('{:.2f}{}'.format(metrics[column], ratio))
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latency, allocations and payload of the server callbacks.')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100], help='copies of the extract')
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls of each combination')
+    parser.add_argument('--out', help='json file of the results (default benchmarks/results/callbacks-<commit>.json)')
+    parser.add_argument('--compare', help='json file of earlier results, the ratios new/old are printed')
+    args = parser.parse_args()
+
+    base = regions.current()
+    results = {'commit': commit(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': args.repeat,
+               'python': platform.python_version(), 'pandas': pd.__version__, 'dash': dash.__version__, 'scales': {}}
+
+    for scale in args.scale:
+        start = time.perf_counter()
+        version = regions.publish(dataset.first_version(scaled(base.df_climb, scale), base.locations))
+        app.resolve_selection.cache_clear()
+        print('{}x: {} ascents, ready in {:.1f} s'.format(scale, len(version.df_climb), time.perf_counter() - start),
+              file=sys.stderr)
+        results['scales'][str(scale)] = measure(version, args.repeat)
+
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results', 'callbacks-{}.json'.format(results['commit']))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as file:
+        json.dump(results, file, indent=1)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+        print('ratios against {}'.format(previous.get('commit')))
+    print_results(results, previous)
+    print('results written to {}'.format(out), file=sys.stderr)
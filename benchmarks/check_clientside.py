@@ -0,0 +1,127 @@
+# checks that the clientside callbacks (assets/clientside.js, CLIMB_CLIENTSIDE=1) draw exactly the same alert,
+# figures and header as the server callbacks, for every dashboard state (single years and ranges of years) and every
+# row of the route tables.
+# Some ascents get a method id without a name, as in the full dump.
+# needs node to run the javascript
+#
+# usage: python benchmarks/check_clientside.py
+import copy
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.pop('CLIMB_CLIENTSIDE', None)
+
+import plotly.io as pio  # noqa: E402
+
+import app  # noqa: E402
+import dataset  # noqa: E402
+import regions  # noqa: E402
+from aggregates import client_bundle  # noqa: E402
+from dash_requests import alert, charts, hover_data, seasons, states, year_ranges  # noqa: E402
+from payload import decode_trace_array  # noqa: E402
+
+# rows of the route table checked at each end of the table of a range of years
+RANGE_ROWS = 20
+
+# method id outside of aggregates.methods, given to every UNKNOWN_EVERY-th ascent
+UNKNOWN_METHOD = 9
+UNKNOWN_EVERY = 7
+
+# runs the clientside functions on the calls read from stdin
+node_driver = '''
+const fs = require('fs');
+global.window = {};
+eval(fs.readFileSync('assets/clientside.js', 'utf8'));
+const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+const climb = window.dash_clientside.climb;
+const args = call => call.args.map(arg => (arg !== null && arg.template) ? input.templates[arg.template] : arg);
+const output = input.calls.map(call => climb[call.function].apply(null, args(call).concat([input.bundle])));
+process.stdout.write(JSON.stringify(output));
+'''
+
+
+def apply_patch(figure, patch):
+    """ The figure the browser ends up with after a Patch of assignments """
+    figure = dict(figure, data=copy.deepcopy(figure['data']))  # the patches only assign data
+    for operation in patch['operations']:
+        target = figure
+        for location in operation['location'][:-1]:
+            target = target[location]
+        # typed arrays compared as the lists plotly.js decodes them to
+        target[operation['location'][-1]] = decode_trace_array(operation['params']['value'])
+    return figure
+
+
+if __name__ == '__main__':
+    client = app.server.test_client()
+    df_climb = regions.current().df_climb.copy()
+    df_climb.iloc[::UNKNOWN_EVERY, df_climb.columns.get_loc('method_id')] = UNKNOWN_METHOD
+    version = regions.publish(dataset.first_version(df_climb, regions.current().locations))
+    app.resolve_selection.cache_clear()
+    years = sorted(int(year) for year in version.df_climb.year.unique())
+    crags = list(version.locations.crag)
+    templates = {name: json.loads(pio.to_json(figure)) for name, figure in
+                 [('bar_chart_seasons', app.fig_bar), ('line_util', app.fig_util), ('method_dist', app.fig_method),
+                  ('sex_dist', app.fig_sex)]}
+
+    def server(body):
+        response = client.post('/_dash-update-component', json=body).get_json()['response']
+        return {component: {prop: apply_patch(templates[component], value)
+                            if isinstance(value, dict) and '__dash_patch_update' in value else value
+                            for prop, value in props.items()}
+                for component, props in response.items()}
+
+    calls, expected = [], []
+    route_ids = [int(route) for route in version.routes.index]
+    for year, crag, total in states(years + year_ranges(years), crags):
+        calls.append({'function': 'alert_creator', 'args': [year, hover_data(crag), total, False]})
+        expected.append(server(alert(year, crag, total))['Alert']['is_open'])
+
+        calls.append({'function': 'bar_chart_seasons', 'args': [year, hover_data(crag), total,
+                                                                 {'template': 'bar_chart_seasons'},
+                                                                 {'template': 'line_util'}]})
+        response = server(seasons(year, crag, total))
+        expected.append([response['bar_chart_seasons']['figure'], response['line_util']['figure'],
+                         response['summary']['children']])
+
+        cell = app.resolve_selection(version, app.year_span(year), app.selected_crag(hover_data(crag), total), None)
+        row_ids = cell['routes'].index.tolist()
+        if isinstance(year, list):  # the tables of the ranges are long, only their first and last rows are checked
+            row_ids = row_ids[:RANGE_ROWS] + row_ids[RANGE_ROWS:][-RANGE_ROWS:]
+        for row_id in [None] + row_ids:
+            calls.append({'function': 'style_pie_charts', 'args': [year, [] if row_id is None else [row_id],
+                                                                    hover_data(crag), total, None,
+                                                                    {'template': 'method_dist'},
+                                                                    {'template': 'sex_dist'}]})
+            response = server(charts(year, crag, total, row_id))
+            expected.append([response['method_dist']['figure'], response['sex_dist']['figure']])
+
+        # a route picked on the route search, any route of the region whatever the crag and the table
+        searched = route_ids[len(calls) % len(route_ids)]
+        calls.append({'function': 'style_pie_charts', 'args': [year, row_ids[:1], hover_data(crag), total, searched,
+                                                                {'template': 'method_dist'},
+                                                                {'template': 'sex_dist'}]})
+        response = server(charts(year, crag, total, row_ids[0] if row_ids else None, searched))
+        expected.append([response['method_dist']['figure'], response['sex_dist']['figure']])
+
+    bundle = client_bundle(version.df_climb, version.cube)
+    result = subprocess.run(['node', '-e', node_driver],
+                            input=json.dumps({'bundle': bundle, 'templates': templates, 'calls': calls}),
+                            capture_output=True, text=True, check=True)
+    clientside = json.loads(result.stdout)
+
+    mismatches = [(call, server_output, client_output)
+                  for call, server_output, client_output in zip(calls, expected, clientside)
+                  if server_output != client_output]
+    for call, server_output, client_output in mismatches[:5]:
+        print('{} {}\n  server:     {}\n  clientside: {}'.format(call['function'], call['args'][:3],
+                                                               json.dumps(server_output)[:500],
+                                                               json.dumps(client_output)[:500]))
+
+    print('{} of {} calls differ (bundle: {} bytes)'.format(len(mismatches), len(calls), len(json.dumps(bundle))))
+    sys.exit(1 if mismatches else 0)
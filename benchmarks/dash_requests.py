@@ -0,0 +1,91 @@
+# bodies of the _dash-update-component requests the dashboard sends, shared by the benchmarks
+
+# the states app.page_callback adds, of a page without a region or an id of its own: the server falls back to the
+# region cookie and to the session cookie of the browser
+PAGE = [('page_region', 'data', None), ('page_id', 'data', None)]
+
+
+def body(outputs, inputs, state=(), changed=None, page=PAGE):
+    """ Request body for a callback, outputs/inputs/state as (component id, property[, value]) """
+    if len(outputs) == 1:
+        output = '{}.{}'.format(*outputs[0])
+        outputs_ = {'id': outputs[0][0], 'property': outputs[0][1]}
+    else:
+        output = '..' + '...'.join('{}.{}'.format(*o) for o in outputs) + '..'
+        outputs_ = [{'id': i, 'property': p} for i, p in outputs]
+
+    return {'output': output,
+            'outputs': outputs_,
+            'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+            'state': [{'id': i, 'property': p, 'value': v} for i, p, v in list(state) + list(page)],
+            'changedPropIds': changed if changed is not None else ['{}.{}'.format(*inputs[0][:2])]}
+
+
+def hover_data(crag):
+    """ hoverData of the map when the crag is hovered, None for no crag """
+    return None if crag is None else {'points': [{'customdata': crag}]}
+
+
+def selection(year, crag, total):
+    return [('year', 'value', year), ('map_chart', 'hoverData', hover_data(crag)), ('Total', 'value', total)]
+
+
+def alert(year, crag, total):
+    return body([('Alert', 'is_open')], selection(year, crag, total), [('Alert', 'is_open', False)])
+
+
+def seasons(year, crag, total):
+    return body([('bar_chart_seasons', 'figure'), ('line_util', 'figure'), ('summary', 'children')],
+                selection(year, crag, total), changed=['map_chart.hoverData'])
+
+
+def table(year, crag, total, page_current=0, page_size=12, sort_by=(), filter_query='', changed=None):
+    return body([('data_table', 'columns'), ('data_table', 'data'), ('data_table', 'page_count'),
+                 ('data_table', 'page_current'), ('data_table', 'selected_rows')],
+                selection(year, crag, total) + [('data_table', 'page_current', page_current),
+                                                 ('data_table', 'page_size', page_size),
+                                                 ('data_table', 'sort_by', list(sort_by)),
+                                                 ('data_table', 'filter_query', filter_query)],
+                changed=changed or ['map_chart.hoverData'])
+
+
+def charts(year, crag, total, row_id=None, searched_route=None):
+    if searched_route is not None:
+        changed = 'route_search.value'
+    else:
+        changed = 'map_chart.hoverData' if row_id is None else 'data_table.selected_row_ids'
+    return body([('method_dist', 'figure'), ('sex_dist', 'figure')],
+                [('year', 'value', year),
+                 ('data_table', 'selected_row_ids', [] if row_id is None else [row_id]),
+                 ('map_chart', 'hoverData', hover_data(crag)),
+                 ('Total', 'value', total),
+                 ('route_search', 'value', searched_route)],
+                changed=[changed])
+
+
+def climbers(year, crag, total):
+    """ Starts the climbers background job, the answer is the job to poll (see load_test.background) """
+    return body([('climbers_chart', 'figure'), ('climbers_summary', 'children')], selection(year, crag, total),
+                changed=['map_chart.hoverData'], page=PAGE[:1])
+
+
+# every callback fired by a hover on the map
+hover_callbacks = {'alert_creator': alert, 'bar_chart_seasons': seasons, 'data_table': table,
+                   'style_pie_charts': charts}
+
+
+def year_ranges(years, step=4):
+    """ Ranges of years of the year slider: from every step-th year to the last one, and the last step years """
+    return [[first, years[-1]] for first in years[:-1:step]] + [[years[-step], years[-1]]]
+
+
+def states(years, crags):
+    """ Every (year, crag, Overall/Map) combination of the dashboard, crag None is no hover, a year can be a range """
+    for year in years:
+        for crag in [None] + list(crags):
+            for total in ['Overall', 'Map - Crag']:
+                yield year, crag, total
+
+
+def viewport(relayout):
+    return body([('map_chart', 'figure')], [('map_chart', 'relayoutData', relayout)])
@@ -0,0 +1,32 @@
+# response size and server cpu time of each callback fired by a hover, over every dashboard state
+#
+# usage: python benchmarks/figure_payload.py
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app  # noqa: E402
+import regions  # noqa: E402
+from dash_requests import hover_callbacks, states  # noqa: E402
+
+if __name__ == '__main__':
+    client = app.server.test_client()
+    version = regions.current()
+    years = sorted(int(year) for year in version.df_climb.year.unique())
+    crags = list(version.locations.crag)
+
+    print('{:<20}{:>10}{:>16}{:>14}'.format('callback', 'requests', 'bytes/response', 'cpu ms/call'))
+    for name, request in hover_callbacks.items():
+        sizes, cpu = [], 0
+        for state in states(years, crags):
+            start = time.process_time()
+            response = client.post('/_dash-update-component', json=request(*state))
+            cpu += time.process_time() - start
+            sizes.append(len(response.data))
+
+        print('{:<20}{:>10}{:>16.0f}{:>14.2f}'.format(name, len(sizes), sum(sizes) / len(sizes),
+                                                        1000 * cpu / len(sizes)))
@@ -0,0 +1,121 @@
+# replays mouse sweeps over the map (a hover trace) from several browsers at once against a gunicorn gthread
+# worker, with and without coalesce.py, and reports the cpu seconds the worker spent per session
+#
+# every hover fires the four callbacks of the map without waiting for the answers of the previous hover,
+# like the browser does. A trace is a json list of {"t": seconds since the start, "crag": crag hovered}
+#
+# usage: python benchmarks/hover_storm.py [--sessions 8] [--trace trace.json] [--save-trace trace.json]
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+from dash_requests import hover_callbacks
+from worker_memory import ROOT, children, free_port
+
+
+def synthetic_trace(crags, hovers=60, seconds=1.0, seed=0):
+    """ Random walk of the mouse along the crags, hovering the same crag several times in a row """
+    generator = random.Random(seed)
+    position = 0
+    trace = []
+    for i in range(hovers):
+        position = max(0, min(len(crags) - 1, position + generator.choice([-1, 0, 0, 1])))
+        trace.append({'t': round(i * seconds / hovers, 3), 'crag': crags[position]})
+    return trace
+
+
+def cpu_seconds(pid):
+    """ user + system cpu time of a process """
+    with open('/proc/{}/stat'.format(pid)) as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def replay(url, trace, year, connections, outcomes):
+    """ One browser session: hovers the crags of the trace at their times """
+    cookies = requests.get(url).cookies
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=connections) as browser:
+        futures = []
+        for hover in trace:
+            time.sleep(max(0.0, hover['t'] - (time.perf_counter() - start)))
+            for request in hover_callbacks.values():
+                futures.append(browser.submit(requests.post, url + '/_dash-update-component',
+                                              json=request(year, hover['crag'], 'Map - Crag'), cookies=cookies))
+        for future in futures:
+            outcomes.append(future.result().status_code)
+
+
+def run(trace, sessions, connections, coalesce, threads):
+    port = free_port()
+    url = 'http://127.0.0.1:{}'.format(port)
+    env = dict(os.environ, CLIMB_COALESCE='1' if coalesce else '0')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:server', '-w', '1', '-k', 'gthread',
+                                '--threads', str(threads), '-b', '127.0.0.1:{}'.format(port)],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(600):
+            try:
+                requests.get(url, timeout=10)
+                break
+            except requests.RequestException:
+                time.sleep(0.5)
+        worker = children(process.pid)[0]
+        cpu_before = cpu_seconds(worker)
+
+        outcomes = []
+        users = [threading.Thread(target=replay, args=(url, trace, 2005 + i % 12, connections, outcomes))
+                 for i in range(sessions)]
+        start = time.perf_counter()
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - start
+
+        cpu = cpu_seconds(worker) - cpu_before
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+    return cpu, elapsed, outcomes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=8, help='browsers replaying the trace at the same time')
+    parser.add_argument('--connections', type=int, default=6,
+                        help='requests a session has in flight at most, 6 for http/1.1 browsers')
+    parser.add_argument('--threads', type=int, default=4, help='threads of the gthread worker')
+    parser.add_argument('--trace', help='json hover trace to replay instead of a synthetic one')
+    parser.add_argument('--save-trace', help='writes the replayed trace to this file')
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace) as file:
+            trace = json.load(file)
+    else:
+        crags = list(pd.read_csv(os.path.join(ROOT, 'crags_coord.csv')).crag)
+        trace = synthetic_trace(crags)
+    if args.save_trace:
+        with open(args.save_trace, 'w') as file:
+            json.dump(trace, file)
+
+    print('{} sessions x {} hovers x {} callbacks'.format(args.sessions, len(trace), len(hover_callbacks)))
+    print('{:<12}{:>10}{:>10}{:>12}{:>16}{:>12}'.format('coalescing', '200', '204', 'cpu s', 'cpu s/session',
+                                                      'wall s'))
+    for coalesce in (False, True):
+        cpu, elapsed, outcomes = run(trace, args.sessions, args.connections, coalesce, args.threads)
+        print('{:<12}{:>10}{:>10}{:>12.2f}{:>16.3f}{:>12.2f}'.format('on' if coalesce else 'off',
+                                                                     outcomes.count(200), outcomes.count(204), cpu,
+                                                                     cpu / args.sessions, elapsed))
@@ -0,0 +1,318 @@
+# load test of the gunicorn deployment: virtual users replay dashboard sessions against `gunicorn app:server`
+# (gunicorn.conf.py included) for each worker class and number of workers, with more and more users at once, and it
+# reports the throughput, the latency percentiles and the errors of the requests and the memory of the workers.
+# The users at which the throughput stops growing (and the latency starts to) is the capacity of the deployment
+#
+# a virtual user loads the page (html, layout, dependencies and the callbacks fired on load), switches to the map,
+# then does one action after the other, with a pause (--think seconds on average) between them:
+# - sweeps the mouse over the map: the 4 callbacks of each hover, sent without waiting for the answers of the previous
+#   hover, and the climbers job of the crag the mouse stops on
+# - moves the year slider to another year or range of years: the 4 callbacks and the climbers job
+# - selects a route in the route table: the charts of the route
+# and loads the page again every SESSION_ACTIONS actions. Like a browser, a user has 6 requests in flight at most.
+# The climbers job is a background callback: its request starts the job and the user polls it until the answer, the
+# job (start to answer) is reported on its own and its requests with the others
+#
+# the setups (--setup, environment variables of the server) compare the options of the app on the same sessions, e.g.
+#   python benchmarks/load_test.py --setup "" --setup "CLIMB_RESPONSE_CACHE=/tmp/responses.sqlite"
+# (warm the cache with `python response_cache.py` first)
+#
+# the load generator runs on the same machine as the server, its cpu time is taken from the server's
+#
+# usage: python benchmarks/load_test.py [--users 1 4 16] [--workers 1 4] [--worker-class sync gthread gevent]
+#                                        [--duration 20] [--think 1] [--setup "NAME=VALUE ..."] [--detail]
+import argparse
+import importlib.util
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+import requests
+from urllib3.util import Retry
+
+from dash_requests import charts, climbers, hover_callbacks, viewport
+from hover_storm import synthetic_trace
+from worker_memory import ROOT, children, free_port, memory
+
+# actions of a page load, then the page is loaded again
+SESSION_ACTIONS = 10
+
+# chance of each action
+ACTIONS = {'hover sweep': 0.4, 'year': 0.3, 'route': 0.3}
+
+# hovers of a sweep over the map, in how many seconds
+SWEEP_HOVERS = 20
+SWEEP_SECONDS = 1.0
+
+# requests a user has in flight at most, 6 for http/1.1 browsers
+CONNECTIONS = 6
+
+# seconds between two polls of a background job, the interval of the dash renderer
+POLL = 1.0
+
+# a request without an answer after this many seconds is an error
+TIMEOUT = 60
+
+
+class User:
+    """ A virtual user: a browser session against the server at url, recording its requests in outcomes """
+
+    def __init__(self, url, years, crags, outcomes, seed):
+        self.url = url
+        self.years = years
+        self.crags = crags
+        self.outcomes = outcomes
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        # like a browser, a request on a kept alive connection the server has just closed is sent again once
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=CONNECTIONS,
+                                                max_retries=Retry(total=1, allowed_methods=None, status=0))
+        self.session.mount('http://', adapter)
+        self.browser = ThreadPoolExecutor(max_workers=CONNECTIONS)
+        self.year, self.crag, self.total, self.rows = [2017, 2017], None, 'Overall', []
+
+    def request(self, kind, method, path, **kwargs):
+        """ Sends a request, records (kind, seconds, error) and returns the response, None on errors """
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url + path, timeout=TIMEOUT, **kwargs)
+            error = response.status_code >= 400
+        except requests.RequestException:
+            response, error = None, True
+        self.outcomes['requests'].append((kind, time.perf_counter() - start, error))
+        return None if error else response
+
+    def callback(self, kind, body):
+        response = self.request(kind, 'POST', '/_dash-update-component', json=body)
+        if kind == 'data_table' and response is not None and response.status_code == 200:
+            self.rows = [row['id'] for row in response.json()['response']['data_table']['data']]
+        return response
+
+    def background(self, body):
+        """ Starts the climbers job and polls it until its answer """
+        start = time.perf_counter()
+        response = self.callback('climbers', body)
+        job = None if response is None else response.json()
+        while job is not None:
+            time.sleep(POLL)
+            response = self.request('climbers (poll)', 'POST', '/_dash-update-component', json=body,
+                                    params={'cacheKey': job['cacheKey'], 'job': job['job']})
+            # an answer, no update (the job was cancelled) or an error
+            if response is None or response.status_code == 204 or 'response' in response.json():
+                break
+        self.outcomes['jobs'].append(('climbers (job)', time.perf_counter() - start, response is None))
+
+    def selection_callbacks(self):
+        """ The callbacks fired by a new selection, sent at once """
+        return [self.browser.submit(self.callback, name, request(self.year, self.crag, self.total))
+                for name, request in hover_callbacks.items()]
+
+    def load(self):
+        self.year, self.crag, self.total, self.rows = [2017, 2017], None, 'Overall', []
+        self.request('page', 'GET', '/')
+        layout = self.request('layout', 'GET', '/_dash-layout')
+        self.request('dependencies', 'GET', '/_dash-dependencies')
+        if layout is not None:
+            slider = find(layout.json(), 'year')
+            self.years = list(range(slider['min'], slider['max'] + 1)) if slider else self.years
+
+        futures = self.selection_callbacks()
+        futures.append(self.browser.submit(self.callback, 'map_chart', viewport(None)))
+        self.background(climbers(self.year, self.crag, self.total))
+        wait(futures)
+
+        # the map shows the crag hovered instead of the whole year
+        self.total = 'Map - Crag'
+        wait(self.selection_callbacks())
+
+    def hover_sweep(self):
+        start = self.random.randrange(len(self.crags))
+        trace = synthetic_trace(self.crags[start:] + self.crags[:start], SWEEP_HOVERS, SWEEP_SECONDS,
+                                self.random.random())
+        futures = []
+        begin = time.perf_counter()
+        for hover in trace:
+            time.sleep(max(0.0, hover['t'] - (time.perf_counter() - begin)))
+            self.crag = hover['crag']
+            futures += self.selection_callbacks()
+        self.background(climbers(self.year, self.crag, self.total))
+        wait(futures)
+
+    def change_year(self):
+        first = self.random.choice(self.years)
+        # a range of years once in three
+        last = self.random.choice([y for y in self.years if y >= first]) if self.random.random() < 1 / 3 else first
+        self.year = [first, last]
+        futures = self.selection_callbacks()
+        self.background(climbers(self.year, self.crag, self.total))
+        wait(futures)
+
+    def select_route(self):
+        if self.rows:
+            self.callback('style_pie_charts', charts(self.year, self.crag, self.total, self.random.choice(self.rows)))
+
+    def run(self, deadline, think):
+        actions = {'hover sweep': self.hover_sweep, 'year': self.change_year, 'route': self.select_route}
+        try:
+            while time.perf_counter() < deadline:
+                self.load()
+                for _ in range(SESSION_ACTIONS):
+                    if time.perf_counter() >= deadline:
+                        break
+                    time.sleep(self.random.expovariate(1 / think) if think else 0)
+                    actions[self.random.choices(list(ACTIONS), list(ACTIONS.values()))[0]]()
+        finally:
+            self.browser.shutdown()
+            self.session.close()
+
+
+def find(component, component_id):
+    """ Props of the component with this id in a dash layout (json), None when it isn't there """
+    if isinstance(component, list):
+        for child in component:
+            props = find(child, component_id)
+            if props is not None:
+                return props
+    elif isinstance(component, dict) and 'props' in component:
+        if component['props'].get('id') == component_id:
+            return component['props']
+        return find(component['props'].get('children'), component_id)
+    return None
+
+
+def process_tree(pid):
+    """ The process and all its descendants (the workers, the background jobs they start) """
+    try:
+        return [pid] + [descendant for child in children(pid) for descendant in process_tree(child)]
+    except FileNotFoundError:  # it ended while listing them
+        return []
+
+
+def readable_memory(pid):
+    """ (rss, pss) of a process, (0, 0) when it ended or is a zombie (a finished job not reaped yet) """
+    try:
+        return memory(pid)
+    except (FileNotFoundError, ProcessLookupError, KeyError):
+        return 0.0, 0.0
+
+
+def sample_memory(master, peaks, stop):
+    """ Keeps the peak RSS of each worker and the peak PSS of the whole deployment until stop is set """
+    while not stop.wait(0.5):
+        tree = process_tree(master)
+        for pid in children(master):
+            peaks['rss'][pid] = max(peaks['rss'].get(pid, 0.0), readable_memory(pid)[0])
+        peaks['pss'] = max(peaks['pss'], sum(readable_memory(pid)[1] for pid in tree))
+
+
+def run_users(url, users, duration, think, years, crags, seed):
+    """ Runs users virtual users for duration seconds, returns their outcomes and the seconds it took """
+    outcomes = {'requests': [], 'jobs': []}
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=User(url, years, crags, outcomes, seed + i).run, args=(deadline, think))
+               for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, time.perf_counter() - start
+
+
+def percentiles(latencies):
+    """ p50, p95 and p99 in milliseconds """
+    if len(latencies) == 0:
+        return [float('nan')] * 3
+    return list(np.percentile(np.asarray(latencies) * 1000, [50, 95, 99]))
+
+
+def serve(worker_class, workers, threads, environment):
+    """ Starts gunicorn, returns its process and url once it answers """
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', 'app:server', '-k', worker_class, '-w', str(workers),
+               '-b', '127.0.0.1:{}'.format(port), '--timeout', str(TIMEOUT * 2)]
+    if worker_class == 'gthread':
+        command += ['--threads', str(threads)]
+    process = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, **environment),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = 'http://127.0.0.1:{}'.format(port)
+    for _ in range(600):
+        try:
+            requests.get(url, timeout=10)
+            return process, url
+        except requests.RequestException:
+            if process.poll() is not None:
+                break
+            time.sleep(0.5)
+    process.send_signal(signal.SIGTERM)
+    process.wait()
+    raise RuntimeError('gunicorn did not start: {}'.format(' '.join(command)))
+
+
+def report(setup, worker_class, workers, users, outcomes, elapsed, peaks, detail):
+    latencies = [seconds for _, seconds, _ in outcomes['requests']]
+    errors = sum(error for _, _, error in outcomes['requests'])
+    rss = max(peaks['rss'].values()) if peaks['rss'] else float('nan')
+    print('{:<12}{:<10}{:>8}{:>7}{:>10}{:>10.1f}{:>10.0f}{:>10.0f}{:>10.0f}{:>9.2f}{:>12.1f}{:>12.1f}'.format(
+        setup, worker_class, workers, users, len(latencies), len(latencies) / elapsed, *percentiles(latencies),
+        100 * errors / max(len(latencies), 1), rss, peaks['pss']))
+
+    if detail:
+        frame = pd.DataFrame(outcomes['requests'] + outcomes['jobs'], columns=['kind', 'seconds', 'error'])
+        for kind, group in frame.groupby('kind', sort=False):
+            print('{:>24}{:>10}{:>10}{:>10.0f}{:>10.0f}{:>10.0f}{:>9.2f}'.format(
+                kind, len(group), '', *percentiles(group.seconds.values), 100 * group.error.mean()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 16], help='virtual users at once')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='gunicorn workers')
+    parser.add_argument('--worker-class', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--threads', type=int, default=4, help='threads of the gthread workers')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load for each number of users')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of load before measuring, not reported')
+    parser.add_argument('--think', type=float, default=1.0, help='mean pause of a user between two actions, seconds')
+    parser.add_argument('--setup', action='append',
+                        help='"NAME=VALUE ..." environment of the server, once per setup to compare (default: none)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--detail', action='store_true', help='latencies of each kind of request and of the jobs')
+    args = parser.parse_args()
+
+    crags = list(pd.read_csv(os.path.join(ROOT, 'crags_coord.csv')).crag)
+    setups = {setup or 'default': dict(variable.split('=', 1) for variable in setup.split())
+              for setup in (args.setup or [''])}
+
+    print('{:<12}{:<10}{:>8}{:>7}{:>10}{:>10}{:>10}{:>10}{:>10}{:>9}{:>12}{:>12}'.format(
+        'setup', 'class', 'workers', 'users', 'requests', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors%',
+        'RSS/worker', 'total PSS'))
+    for name, environment in setups.items():
+        for worker_class in args.worker_class:
+            # gevent is an optional dependency of gunicorn
+            if worker_class == 'gevent' and importlib.util.find_spec('gevent') is None:
+                print('{:<12}{:<10}skipped, gevent is not installed'.format(name, worker_class))
+                continue
+            for workers in args.workers:
+                process, url = serve(worker_class, workers, args.threads, environment)
+                try:
+                    years = list(range(2000, 2018))  # until a user reads the bounds of the slider in the layout
+                    run_users(url, max(args.users), args.warmup, args.think, years, crags, args.seed)
+                    for users in args.users:
+                        peaks, stop = {'rss': {}, 'pss': 0.0}, threading.Event()
+                        sampler = threading.Thread(target=sample_memory, args=(process.pid, peaks, stop))
+                        sampler.start()
+                        outcomes, elapsed = run_users(url, users, args.duration, args.think, years, crags, args.seed)
+                        stop.set()
+                        sampler.join()
+                        report(name, worker_class, workers, users, outcomes, elapsed, peaks, args.detail)
+                finally:
+                    process.send_signal(signal.SIGTERM)
+                    process.wait()
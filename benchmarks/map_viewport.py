@@ -0,0 +1,56 @@
+# size of the map data and server time of the viewport queries of crag_index.py, for synthetic sets of crags spread
+# over the world, against sending every crag to the map as app.py did before
+#
+# usage: python benchmarks/map_viewport.py [--crags 1000 10000 100000] [--queries 200]
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from crag_index import build_crag_index, center_bounds, viewport_markers  # noqa: E402
+
+
+def payload(lat, lon, names):
+    """ Bytes of the json of a crag trace, encoded as dash does """
+    return len(json.dumps({'lat': lat, 'lon': lon, 'text': names, 'customdata': names}, cls=PlotlyJSONEncoder))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--crags', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200, help='random viewports per set of crags')
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(0)
+    print('{:>8}{:>14}{:>18}{:>14}{:>10}{:>10}'.format('crags', 'all (bytes)', 'viewport (bytes)', 'max markers',
+                                                      'p50 ms', 'p99 ms'))
+    for n in args.crags:
+        # crags gathered around a few hundred climbing areas, as they are in the logbook
+        areas = generator.uniform([-50, -180], [65, 180], size=(300, 2))
+        positions = areas[generator.integers(0, len(areas), n)] + generator.normal(0, 0.3, size=(n, 2))
+        names = np.array(['crag {}'.format(i) for i in range(n)], dtype=object)
+        index = build_crag_index(names, positions[:, 0], positions[:, 1], generator.integers(0, 500, n))
+
+        sizes, markers, times = [], [], []
+        for _ in range(args.queries):
+            lat, lon = areas[generator.integers(0, len(areas))] + generator.normal(0, 1, 2)
+            bounds = center_bounds(lat, lon, generator.uniform(0, 14))
+
+            start = time.perf_counter()
+            shown, clusters = viewport_markers(index, *bounds)
+            times.append(time.perf_counter() - start)
+
+            markers.append(len(shown) + len(clusters['crags']))
+            sizes.append(payload(index['lat'][shown], index['lon'][shown], index['crags'][shown]) +
+                         payload(clusters['lat'], clusters['lon'], ['{} crags'.format(c) for c in clusters['crags']]))
+
+        print('{:>8}{:>14}{:>18.0f}{:>14}{:>10.2f}{:>10.2f}'.format(
+            n, payload(index['lat'], index['lon'], index['crags']), np.mean(sizes), max(markers),
+            1000 * np.percentile(times, 50), 1000 * np.percentile(times, 99)))
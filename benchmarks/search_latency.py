@@ -0,0 +1,89 @@
+# build time, size and query time of the route name index of route_search.py, on the routes of the extract and on
+# synthetic sets of routes (names made of the words of the extract, in made up sectors and crags). The queries are
+# what typing a route name sends: every prefix of its first words, as typed, and with one letter dropped (a typo)
+#
+# usage: python benchmarks/search_latency.py [--routes 10000 100000 1000000] [--queries 500]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from route_search import build_search_index, search_routes  # noqa: E402
+from snapshot import CSV_PATH, SNAPSHOT_PATH, load_climb  # noqa: E402
+from route_index import build_route_index, build_routes  # noqa: E402
+
+
+def synthetic_routes(words, n, generator):
+    """ n routes named with 1 to 4 words of the extract, 20 routes per sector and 15 sectors per crag """
+    lengths = generator.integers(1, 5, n)
+    picked = iter(words[generator.integers(0, len(words), lengths.sum())])
+    names = [' '.join(next(picked) for _ in range(length)) for length in lengths]
+    sectors = ['{} {}'.format(words[i % len(words)], i) for i in range(n // 20 + 1)]
+    crags = ['{} crag {}'.format(words[-1 - i % len(words)], i) for i in range(n // 300 + 1)]
+    positions = np.arange(n)
+    routes = pd.DataFrame({'crag': np.asarray(crags, dtype=object)[positions // 300],
+                           'sector': np.asarray(sectors, dtype=object)[positions // 20],
+                           'name': names}).astype('category')
+    routes.index = pd.Index(positions, name='route_id')
+    # one ascent of every route, and as many on random routes
+    route_ids = np.concatenate([positions, generator.integers(0, n, n)])
+    no_years = np.zeros(len(route_ids), dtype='int64')
+    return routes, build_route_index(route_ids, no_years, no_years)
+
+
+def typed(names, n, generator):
+    """ Queries of typing the names: a prefix of each (of its first 2 words at most), and the same with a typo """
+    prefixes, typos = [], []
+    for name in names[generator.integers(0, len(names), n)]:
+        text = ' '.join(name.split()[:2])
+        prefix = text[:generator.integers(1, len(text) + 1)]
+        prefixes.append(prefix)
+        drop = generator.integers(0, len(text))
+        typos.append(text[:drop] + text[drop + 1:])
+    return {'prefix': prefixes, 'typo': typos}
+
+
+def index_bytes(index):
+    return sum(value.nbytes + (sum(sys.getsizeof(item) for item in value) if value.dtype == object else 0)
+               for value in index.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--routes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=500, help='queries of each kind per set of routes')
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(0)
+    df_climb = load_climb(CSV_PATH, SNAPSHOT_PATH)
+    df_climb['route_id'], routes = build_routes(df_climb)
+    extract = (routes, build_route_index(df_climb.route_id.values, df_climb.year.values,
+                                                df_climb.rating.values))
+    names = np.asarray(routes.name.dropna().astype(str).unique(), dtype=object)
+    words = np.asarray(sorted({word for name in names for word in name.split()}), dtype=object)
+
+    print('{:>9}{:>10}{:>12}{:>8}{:>12}{:>12}{:>10}{:>12}'.format('routes', 'build s', 'index MiB', 'kind',
+                                                                  'p50 ms', 'p99 ms', 'max ms', 'matches'))
+    for n in [None] + args.routes:
+        routes, route_index = extract if n is None else synthetic_routes(words, n, generator)
+        start = time.perf_counter()
+        index = build_search_index(routes, route_index)
+        build = time.perf_counter() - start
+
+        for kind, queries in typed(np.asarray(routes.name.dropna().astype(str), dtype=object), args.queries,
+                                   generator).items():
+            times, found = [], 0
+            for query in queries:
+                start = time.perf_counter()
+                found += len(search_routes(index, query)) > 0
+                times.append(time.perf_counter() - start)
+            print('{:>9}{:>10.2f}{:>12.1f}{:>8}{:>12.2f}{:>12.2f}{:>10.2f}{:>11.0%}'.format(
+                len(routes), build, index_bytes(index) / 2 ** 20, kind, 1000 * np.percentile(times, 50),
+                1000 * np.percentile(times, 99), 1000 * max(times), found / len(queries)))
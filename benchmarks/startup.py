@@ -0,0 +1,61 @@
+# compares the time it takes to get df_climb ready at import time:
+# the original row-wise path, the vectorised csv path and the preprocessed snapshot
+#
+# usage: python benchmarks/startup.py [--scale 100] [--repeat 3]
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from snapshot import CSV_PATH, build_snapshot, load_climb  # noqa: E402
+
+
+def original_path(csv_path):
+    """ The preprocessing as it used to run in app.py """
+    df_climb = pd.read_csv(csv_path)
+    df_climb['date'] = df_climb['date'].apply(lambda x: dt.datetime.fromtimestamp(x))
+    df_climb['month'] = df_climb['date'].dt.month
+    df_climb['birth'] = df_climb['birth'].astype('datetime64[ns]')
+    df_climb['age'] = 2017 - df_climb.birth.dt.year
+    df_climb['sex'] = df_climb.sex.apply(lambda x: 'Male' if x == 0 else 'Female')
+    return df_climb
+
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=1, help='number of copies of the extract to load')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'sports_climb.csv')
+        snapshot_path = os.path.join(tmp, 'sports_climb.npz')
+
+        pd.concat([pd.read_csv(CSV_PATH)] * args.scale, ignore_index=True).to_csv(csv_path, index=False)
+        build_snapshot(csv_path, snapshot_path)
+
+        rows = len(pd.read_csv(csv_path, usecols=['user_id']))
+        missing = os.path.join(tmp, 'missing.npz')
+
+        results = [('original (row-wise apply)', best_of(args.repeat, original_path, csv_path)),
+                   ('csv (vectorised)', best_of(args.repeat, load_climb, csv_path, missing)),
+                   ('snapshot (.npz)', best_of(args.repeat, load_climb, csv_path, snapshot_path))]
+
+    print('{} rows, best of {}'.format(rows, args.repeat))
+    for name, seconds in results:
+        print('{:<28}{:>9.3f} s{:>8.1f}x'.format(name, seconds, results[0][1] / seconds))
@@ -0,0 +1,103 @@
+# bytes on the wire and encoding time of the callback responses, for every dashboard state (and a few hundred map
+# viewports), as they were (json lists, plotly's json encoder, no compression) and with payload.py: typed arrays,
+# orjson, gzip and brotli (when installed). Also the size of the layout response
+#
+# usage: python benchmarks/wire_payload.py [--crags 5000] [--repeat 5]
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from callbacks import call, calls  # also puts the repository on the path and imports app
+import app
+import dataset
+import regions
+import payload
+from crag_index import center_bounds
+
+# (label, json engine, typed arrays)
+variants = [('before (json, lists)', 'json', False), ('orjson, lists', 'orjson', False),
+            ('orjson, typed arrays', 'orjson', True)]
+
+
+def viewport_calls(version, n=200):
+    """ map_viewport calls around the crags, from the whole region down to a single crag """
+    generator = np.random.default_rng(0)
+    index = version.crag_index
+    for _ in range(n):
+        crag = generator.integers(0, len(index['crags']))
+        bounds = center_bounds(index['lat'][crag], index['lon'][crag], generator.uniform(3, 14))
+        relayout = {'mapbox.center': {'lat': index['lat'][crag], 'lon': index['lon'][crag]}, 'mapbox.zoom': bounds[-1],
+                    'mapbox._derived': {'coordinates': [[bounds[0], bounds[3]], [bounds[2], bounds[3]],
+                                                        [bounds[2], bounds[1]], [bounds[0], bounds[1]]]}}
+        yield 'map_viewport', (relayout,), 'map_chart.relayoutData'
+
+
+def with_crags(version, n):
+    """ The locations of the version with n made up crags around its own, so the map has more to send """
+    generator = np.random.default_rng(0)
+    locations = version.locations
+    around = locations.iloc[generator.integers(0, len(locations), n)]
+    made_up = pd.DataFrame({'crag': ['crag {}'.format(i) for i in range(n)],
+                            'lat': around.lat.values + generator.normal(0, 0.5, n),
+                            'lon': around.lon.values + generator.normal(0, 0.5, n)})
+    return pd.concat([locations, made_up], ignore_index=True)
+
+
+def best_time(repeat, function, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def compressed(data, encoding):
+    """ What the server sends, compressed only above the threshold of payload.install """
+    if encoding is None or len(data) < payload.COMPRESS_MIN_SIZE:
+        return data
+    return payload.compress(data, encoding)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bytes on the wire and encode time of the callback responses.')
+    parser.add_argument('--crags', type=int, default=5000, help='made up crags added to the map')
+    parser.add_argument('--repeat', type=int, default=5, help='encodings of each response, the fastest is kept')
+    args = parser.parse_args()
+
+    version = regions.current()
+    if args.crags:
+        version = regions.publish(dataset.first_version(version.df_climb, with_crags(version, args.crags)))
+    all_calls = list(calls(version)) + list(viewport_calls(version))
+    encodings = [None, 'gzip'] + (['br'] if payload.brotli is not None else [])
+
+    print('{:<24}{:<24}{:>8}'.format('callback', 'variant', 'calls') +
+          ''.join('{:>14}'.format('bytes ' + (e or 'plain')) for e in encodings) +
+          '{:>12}{:>14}'.format('encode ms', 'compress ms'))
+    for callback in dict.fromkeys(name for name, _, _ in all_calls):
+        selected = [c for c in all_calls if c[0] == callback]
+        for label, engine, typed in variants:
+            app.TYPED_ARRAYS = typed
+            sizes, encode, squeeze = {e: [] for e in encodings}, [], []
+            for selected_call in selected:
+                app.resolve_selection.cache_clear()
+                values = call(*selected_call)
+                encode.append(best_time(args.repeat, to_json_plotly, values, False, engine))
+                data = to_json_plotly(values, engine=engine).encode()
+                for encoding in encodings:
+                    sizes[encoding].append(len(compressed(data, encoding)))
+                squeeze.append(best_time(args.repeat, compressed, data, encodings[-1]))
+
+            print('{:<24}{:<24}{:>8}'.format(callback, label, len(selected)) +
+                  ''.join('{:>14.0f}'.format(np.mean(sizes[e])) for e in encodings) +
+                  '{:>12.3f}{:>14.3f}'.format(1000 * np.mean(encode), 1000 * np.mean(squeeze)))
+
+    app.TYPED_ARRAYS = True
+    layout = app.server.test_client().get('/_dash-layout').get_data()
+    print('layout: {} bytes plain, '.format(len(layout)) +
+          ', '.join('{} {}'.format(len(payload.compress(layout, e)), e) for e in encodings[1:]))
+    if payload.brotli is None:
+        print('brotli not installed, gzip only')
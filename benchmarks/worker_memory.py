@@ -0,0 +1,124 @@
+# measures the memory of the gunicorn workers serving the dashboard, with 1, 4 and 8 workers:
+# - before: every worker imports app.py and parses the csv on its own
+# - after: preloaded master (gunicorn.conf.py) with the memory mapped snapshot
+#
+# RSS counts shared pages in every worker, PSS splits them between the processes that share them,
+# so the total PSS is what the box actually pays for
+#
+# usage: python benchmarks/worker_memory.py [--scale 20] [--workers 1 4 8]
+import argparse
+import glob
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import requests
+
+from dash_requests import seasons
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def app_files():
+    """ Files needed to run the app in a scratch directory: its modules, the crag coordinates and the assets """
+    return sorted(glob.glob(os.path.join(ROOT, '*.py'))) + [os.path.join(ROOT, 'crags_coord.csv'),
+                                                           os.path.join(ROOT, 'assets')]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def memory(pid):
+    """ Returns (rss, pss) of a process in MiB """
+    values = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as smaps:
+        for line in smaps:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1]) / 1024
+    return values['Rss:'], values['Pss:']
+
+
+def children(pid):
+    with open('/proc/{0}/task/{0}/children'.format(pid)) as file:
+        return [int(x) for x in file.read().split()]
+
+
+def measure(directory, workers, preload, crags):
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', 'app:server', '-w', str(workers), '-b', '127.0.0.1:{}'.format(port)]
+    if not preload:
+        # an empty config file, so gunicorn.conf.py isn't picked up
+        command += ['-c', os.devnull]
+    # the csv setup parses the csv in every worker, without writing the snapshot the next start would read
+    env = dict(os.environ, CLIMB_WRITE_SNAPSHOT='1' if preload else '0')
+    process = subprocess.Popen(command, cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        url = 'http://127.0.0.1:{}'.format(port)
+        for _ in range(600):
+            try:
+                requests.get(url, timeout=10)
+                break
+            except requests.RequestException:
+                time.sleep(0.5)
+        else:
+            raise RuntimeError('gunicorn did not start in {}'.format(directory))
+
+        # every worker should have served a few callbacks before measuring
+        time.sleep(1)
+        session = requests.Session()
+        for i in range(20 * workers):
+            session.post(url + '/_dash-update-component', json=seasons(2010 + i % 8, crags[i % len(crags)], 'Map - Crag'))
+        time.sleep(1)
+
+        pids = children(process.pid)
+        stats = [memory(pid) for pid in pids]
+        master = memory(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+    rss = sum(s[0] for s in stats) / len(stats)
+    pss = sum(s[1] for s in stats) / len(stats)
+    return rss, pss, master[1] + sum(s[1] for s in stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=int, default=1, help='number of copies of the extract to load')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    df_climb = pd.read_csv(os.path.join(ROOT, 'sports_climb.csv'))
+    crags = list(df_climb.crag.unique())
+
+    with tempfile.TemporaryDirectory() as before, tempfile.TemporaryDirectory() as after:
+        for directory in (before, after):
+            # gunicorn.conf.py goes to both, the csv setup runs gunicorn without a config file
+            for source in app_files():
+                if os.path.isdir(source):
+                    shutil.copytree(source, os.path.join(directory, os.path.basename(source)))
+                else:
+                    shutil.copy(source, directory)
+            pd.concat([df_climb] * args.scale, ignore_index=True).to_csv(
+                os.path.join(directory, 'sports_climb.csv'), index=False)
+
+        subprocess.run([sys.executable, 'snapshot.py'], cwd=after, check=True, stdout=subprocess.DEVNULL)
+
+        print('{} ascents'.format(len(df_climb) * args.scale))
+        print('{:<8}{:<20}{:>18}{:>18}{:>16}'.format('workers', 'setup', 'RSS/worker (MiB)', 'PSS/worker (MiB)',
+                                                     'total PSS (MiB)'))
+        for workers in args.workers:
+            for name, directory, preload in [('csv', before, False), ('preload + mmap', after, True)]:
+                rss, pss, total = measure(directory, workers, preload, crags)
+                print('{:<8}{:<20}{:>18.1f}{:>18.1f}{:>16.1f}'.format(workers, name, rss, pss, total))
@@ -0,0 +1,123 @@
+# ascents by climber: the columns the climber view reads, reordered by (user_id, date), so the ascents of a climber are
+# one contiguous slice of each of them (views, nothing is gathered), and the offsets of each climber in that order
+import numpy as np
+import pandas as pd
+
+# favourite crags shown
+TOP_CRAGS = 5
+
+
+def build_climber_index(df_climb):
+    """
+    Columns of the ascents sorted by user id, then date (then position in the logbook): the ascents of users[i] are
+    rows offsets[i] to offsets[i + 1] of date, grade (codes of the ordered grades, easiest first, -1 for none) and
+    crag (codes of the crags, -1 for none)
+    """
+    user_ids = df_climb.user_id.values
+    order = np.lexsort((df_climb.date.values, user_ids))
+    users, starts = np.unique(user_ids[order], return_index=True)
+
+    return {'users': users,
+            'offsets': np.append(starts, len(order)).astype('int64'),
+            'date': df_climb.date.values[order],
+            'grade': df_climb.fra_routes.cat.codes.values[order],
+            'crag': df_climb.crag.cat.codes.values[order],
+            'grades': np.asarray(df_climb.fra_routes.cat.categories, dtype=object),
+            'crags': np.asarray(df_climb.crag.cat.categories, dtype=object)}
+
+
+def _date_keys(dates):
+    """ Dates as integers in the order np.lexsort gives them, the missing ones last """
+    keys = dates.astype('datetime64[ns]').view('int64').copy()
+    keys[np.isnat(dates)] = np.iinfo('int64').max
+    return keys
+
+
+def _recode(codes, categories, merged, dtype):
+    """ Codes of a categorical column in the categories of the merged ascents (-1 kept for none), as dtype """
+    if len(categories) == len(merged) and (categories == merged).all():
+        return codes.astype(dtype, copy=False)
+    positions = np.append(pd.Index(merged).get_indexer(categories), -1)  # code -1 reads the last one
+    return positions[codes].astype(dtype)
+
+
+def extend_climber_index(index, df_climb, first_row):
+    """
+    Index of the ascents with the ones of a batch (rows from first_row of df_climb) merged in without sorting them
+    all again: the batch is sorted on its own and each ascent inserted after the ones already indexed of the same
+    climber and date, where build_climber_index would put it
+    """
+    batch = df_climb.iloc[first_row:]
+    order = np.lexsort((batch.date.values, batch.user_id.values))
+    user_ids, dates = batch.user_id.values[order], batch.date.values[order]
+
+    # rows of the climber of each new ascent (none for a new climber, where it goes), then a binary search of its date
+    # in them, for all the new ascents at once
+    i = np.searchsorted(index['users'], user_ids)
+    inside = i < len(index['users'])
+    known = np.zeros(len(i), dtype=bool)
+    known[inside] = index['users'][i[inside]] == user_ids[inside]
+    lo, hi = index['offsets'][i], index['offsets'][i + known]
+    old_keys, new_keys = _date_keys(index['date']), _date_keys(dates)
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        searching = lo < hi
+        after = np.zeros(len(lo), dtype=bool)
+        after[searching] = old_keys[mid[searching]] <= new_keys[searching]
+        lo, hi = np.where(after, mid + 1, lo), np.where(searching & ~after, mid, hi)
+
+    users = np.union1d(index['users'], user_ids)
+    counts = np.zeros(len(users), dtype='int64')
+    counts[np.searchsorted(users, index['users'])] = np.diff(index['offsets'])
+    np.add.at(counts, np.searchsorted(users, user_ids), 1)
+
+    grades = np.asarray(df_climb.fra_routes.cat.categories, dtype=object)
+    crags = np.asarray(df_climb.crag.cat.categories, dtype=object)
+    grade = batch.fra_routes.cat.codes.values[order]
+    crag = batch.crag.cat.codes.values[order]
+    return {'users': users,
+            'offsets': np.append(0, np.cumsum(counts)),
+            'date': np.insert(index['date'], lo, dates),
+            'grade': np.insert(_recode(index['grade'], index['grades'], grades, grade.dtype), lo, grade),
+            'crag': np.insert(_recode(index['crag'], index['crags'], crags, crag.dtype), lo, crag),
+            'grades': grades,
+            'crags': crags}
+
+
+def climber_rows(index, user_id):
+    """ Slice of the ascents of a climber in the index, empty for unknown climbers """
+    i = np.searchsorted(index['users'], user_id)
+    if i == len(index['users']) or index['users'][i] != user_id:
+        return slice(0, 0)
+    return slice(index['offsets'][i], index['offsets'][i + 1])
+
+
+def climber_summary(index, user_id, top=TOP_CRAGS):
+    """
+    What the climber view shows of a climber: the number of ascents, the dates of the first and last one, the grade
+    pyramid (ascents per grade, easiest first), the progression of the hardest grade climbed (the dates it went up,
+    and the last ascent, with the grade reached) and the favourite crags (most ascents first)
+    """
+    rows = climber_rows(index, user_id)
+    dates, grades, crags = index['date'][rows], index['grade'][rows], index['crag'][rows]
+
+    counts = np.bincount(grades[grades >= 0], minlength=len(index['grades']))
+    pyramid = pd.Series(counts[counts > 0], index=index['grades'][counts > 0])
+
+    # hardest grade climbed up to each ascent, kept where it goes up
+    hardest = np.maximum.accumulate(grades) if len(grades) else grades
+    steps = np.flatnonzero((hardest >= 0) & (np.diff(hardest, prepend=-1) > 0))
+    if len(steps):
+        steps = np.append(steps, len(hardest) - 1)  # the line goes on to the last ascent
+    progression = pd.Series(index['grades'][hardest[steps]], index=dates[steps])
+
+    counts = np.bincount(crags[crags >= 0], minlength=len(index['crags']))
+    favourite = np.argsort(-counts, kind='stable')[:top]
+    favourite = favourite[counts[favourite] > 0]
+
+    return {'ascents': len(dates),
+            'first': dates[0] if len(dates) else None,
+            'last': dates[-1] if len(dates) else None,
+            'pyramid': pyramid,
+            'progression': progression,
+            'crags': pd.Series(counts[favourite], index=index['crags'][favourite])}
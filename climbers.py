@@ -0,0 +1,35 @@
+# climbers of a selection (years, crag or OVERALL): how many climbed there and the most active ones.
+# Climbers are not additive over the years or the crags like the counts of the cube, so every ascent of the selection
+# is read, which for OVERALL over all the years is the whole logbook. app.py runs it as a background job
+import numpy as np
+import pandas as pd
+
+from route_index import route_ascents
+
+# most active climbers shown
+TOP_CLIMBERS = 10
+
+# progress steps of a selection, its routes are read in this many chunks
+CHUNKS = 20
+
+
+def selection_climbers(version, first, last, crag, progress=None, top=TOP_CLIMBERS):
+    """
+    Number of climbers with ascents on the routes of the crag (all routes for OVERALL) in the years first to last, and
+    the ascents of the top most active ones (the lowest user id first on ties). progress(done, total) is called after
+    each chunk of routes
+    """
+    routes = version.year_index['crag_routes'].get(crag, np.empty(0, dtype='int64'))
+    chunks = np.array_split(routes, min(CHUNKS, max(len(routes), 1)))
+    user_ids = version.df_climb.user_id.values
+
+    users = []
+    for done, chunk in enumerate(chunks, 1):
+        rows = [route_ascents(version.route_index, route, first, last) for route in chunk]
+        users.append(user_ids[np.concatenate(rows)] if rows else user_ids[:0])
+        if progress is not None:
+            progress(done, len(chunks))
+
+    ids, counts = np.unique(np.concatenate(users), return_counts=True)
+    order = np.lexsort((ids, -counts))[:top]
+    return {'climbers': len(ids), 'ascents': int(counts.sum()), 'top': pd.Series(counts[order], index=ids[order])}
@@ -0,0 +1,129 @@
+# coalescing of the callback requests fired while sweeping the mouse over the map:
+# - identical requests that run at the same time share one computation (single flight)
+# - a request still waiting for the previous one of the same page and callback is dropped when a newer one arrives,
+#   the page only shows the newest answer anyway. The page is the PAGE_STORE state of the callback, an id each page
+#   gets when it is served, so two pages open in one browser never drop each other's requests. Requests without
+#   one fall back to the session of the browser
+import functools
+import itertools
+import json
+import threading
+import uuid
+
+import dash
+import flask
+from dash.exceptions import PreventUpdate
+
+# cookie that tells the requests of each browser apart
+SESSION_COOKIE = 'climb_session'
+
+# store of the page with its id, passed to the callbacks as a state
+PAGE_STORE = 'page_id'
+
+# how many requests were computed, shared with an identical one in flight, or dropped for a newer one
+stats = {'computed': 0, 'shared': 0, 'superseded': 0}
+
+_lock = threading.Lock()
+_in_flight = {}  # (callback, inputs) -> computation in progress
+_latest = {}  # (page, callback) -> ticket of the newest request
+_page_locks = {}  # (page, callback) -> lock that runs the requests of a page one at a time
+_tickets = itertools.count()
+
+
+def _count(outcome):
+    with _lock:
+        stats[outcome] += 1
+
+
+def install(server):
+    """ Gives every browser a session cookie """
+    @server.after_request
+    def set_session_cookie(response):
+        if SESSION_COOKIE not in flask.request.cookies:
+            response.set_cookie(SESSION_COOKIE, uuid.uuid4().hex, httponly=True, samesite='Lax')
+        return response
+
+
+def _page():
+    """ Id of the page of the running callback, else the session of the browser, None outside of a request """
+    try:
+        page = dash.ctx.states.get(PAGE_STORE + '.data')
+    except dash.exceptions.MissingCallbackContextException:
+        page = None
+    if page is None and flask.has_request_context():
+        page = flask.request.cookies.get(SESSION_COOKIE)
+    return page
+
+
+def _request_key(name, args, scope):
+    """
+    What makes two requests identical: the callback, its inputs, the inputs that triggered it and the scope of the
+    request
+    """
+    triggered = sorted(dash.ctx.triggered_prop_ids) if flask.has_request_context() else []
+    return name, json.dumps([args, triggered, scope], sort_keys=True, default=str)
+
+
+def _single_flight(name, function, args, scope):
+    key = _request_key(name, args, scope)
+    with _lock:
+        computation = _in_flight.get(key)
+        leader = computation is None
+        if leader:
+            computation = _in_flight[key] = {'done': threading.Event()}
+
+    # an identical request is already being computed, wait for its result
+    if not leader:
+        computation['done'].wait()
+        _count('shared')
+        if 'error' in computation:
+            raise computation['error']
+        return computation['result']
+
+    try:
+        computation['result'] = function(*args)
+        _count('computed')
+        return computation['result']
+    except Exception as error:  # PreventUpdate included, the waiting requests get the same answer
+        computation['error'] = error
+        raise
+    finally:
+        with _lock:
+            del _in_flight[key]
+        computation['done'].set()
+
+
+def coalesce(function, scope=None):
+    """
+    Decorator for the callbacks, see the top of the module. scope() is what the answer depends on besides the
+    inputs (the region of the request), requests of different scopes are never shared
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        request_scope = None if scope is None else scope()
+        page = _page()
+        if page is None:
+            return _single_flight(name, function, args, request_scope)
+
+        slot = (page, name)
+        with _lock:
+            ticket = next(_tickets)
+            _latest[slot] = ticket
+            page_lock = _page_locks.setdefault(slot, threading.Lock())
+
+        with page_lock:
+            try:
+                if _latest.get(slot) != ticket:
+                    _count('superseded')
+                    raise PreventUpdate
+                return _single_flight(name, function, args, request_scope)
+            finally:
+                # the newest request of the page cleans up after itself
+                with _lock:
+                    if _latest.get(slot) == ticket:
+                        del _latest[slot]
+                        del _page_locks[slot]
+
+    return wrapper
@@ -0,0 +1,131 @@
+# spatial index of the crags for the map: the crags are sorted by the morton code (z-order, the same idea as a
+# geohash) of their web mercator position, so the crags of any grid cell of any zoom level are one contiguous range
+# found with two binary searches. A viewport is answered with the crags inside it or, when there are too many,
+# with one cluster per grid cell, so what the map receives is bounded by its size and not by the number of crags
+import numpy as np
+
+# zoom level of the finest grid, the morton codes have 2 bits per level
+MAX_LEVEL = 24
+
+# the clusters are cells of the grid CLUSTER_DEPTH levels below the zoom of the map, 16 pixels wide
+CLUSTER_DEPTH = 4
+
+# crags drawn one by one at most, above that the viewport is clustered
+MAX_MARKERS = 500
+
+# grid cells looked at in a viewport at most, the grid gets coarser when a viewport would need more
+MAX_CELLS = 4096
+
+# size of the map assumed when only its center and zoom are known
+MAP_SIZE = (800, 600)
+
+
+def _spread(values):
+    """ Spreads the bits of 32 bit integers to the even bits of 64 bit integers """
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in [(16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)]:
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def _morton(x, y):
+    """ Morton code of grid cells, interleaving the bits of their column and row """
+    return _spread(x) | (_spread(y) << np.uint64(1))
+
+
+def _grid(lat, lon, level):
+    """ Column and row of the web mercator grid of a zoom level that hold each position """
+    size = 2 ** level
+    lat = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon, dtype=float) + 180) / 360 * size
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * size
+    return np.clip(x, 0, size - 1).astype(np.int64), np.clip(y, 0, size - 1).astype(np.int64)
+
+
+def build_crag_index(crags, lat, lon, ascents):
+    """
+    Index of the crags: their names, positions and ascents sorted by morton code, and the running sums used to
+    aggregate the crags of a cell without looking at them
+    """
+    crags, lat, lon = np.asarray(crags, dtype=object), np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    codes = _morton(*_grid(lat, lon, MAX_LEVEL))
+    order = np.argsort(codes, kind='stable')
+
+    def running_sum(values):
+        return np.concatenate([[0], np.cumsum(values[order])])
+
+    return {'codes': codes[order], 'crags': crags[order], 'lat': lat[order], 'lon': lon[order],
+            'ascents': np.asarray(ascents, dtype=np.int64)[order], 'lat_sum': running_sum(lat),
+            'lon_sum': running_sum(lon), 'ascents_sum': running_sum(np.asarray(ascents, dtype=np.int64))}
+
+
+def viewport_bounds(relayout, map_size=MAP_SIZE):
+    """
+    (west, south, east, north, zoom) of the map from its relayoutData, None when the relayout isn't a move of
+    the map. The corners plotly derives are used when present, otherwise they're estimated from the center and zoom
+    """
+    if not relayout or 'mapbox.zoom' not in relayout or 'mapbox.center' not in relayout:
+        return None
+    zoom, center = relayout['mapbox.zoom'], relayout['mapbox.center']
+
+    corners = (relayout.get('mapbox._derived') or {}).get('coordinates')
+    if corners:
+        lons, lats = [corner[0] for corner in corners], [corner[1] for corner in corners]
+        return min(lons), min(lats), max(lons), max(lats), zoom
+
+    return center_bounds(center['lat'], center['lon'], zoom, map_size)
+
+
+def center_bounds(lat, lon, zoom, map_size=MAP_SIZE):
+    """ (west, south, east, north, zoom) of a map of map_size pixels centered on (lat, lon) """
+    # plotly's mapbox zoom is the one of 512 pixel tiles
+    degrees = 360 / (512 * 2 ** zoom)
+    half_width, half_height = map_size[0] / 2 * degrees, map_size[1] / 2 * degrees * np.cos(np.radians(lat))
+    return lon - half_width, lat - half_height, lon + half_width, lat + half_height, zoom
+
+
+def viewport_markers(index, west, south, east, north, zoom, max_markers=MAX_MARKERS):
+    """
+    What the map shows in a viewport: the positions (in the index) of the crags to draw one by one and the
+    clusters {lat, lon, crags, ascents} of the cells with several crags, when the viewport has more than
+    max_markers crags. A viewport crossing the antimeridian is taken as the whole width of the map
+    """
+    if west > east or east - west >= 360:
+        west, east = -180, 180
+
+    level = int(min(max(np.floor(zoom) + CLUSTER_DEPTH, 0), MAX_LEVEL))
+    while True:
+        x0, y0 = _grid(north, west, level)  # rows grow to the south
+        x1, y1 = _grid(south, east, level)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_CELLS or level == 0:
+            break
+        level -= 1
+
+    # range of morton codes of every cell of the viewport
+    x, y = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    shift = np.uint64(2 * (MAX_LEVEL - level))
+    prefixes = _morton(x.ravel(), y.ravel())
+    first = np.searchsorted(index['codes'], prefixes << shift, 'left')
+    last = np.searchsorted(index['codes'], (prefixes + np.uint64(1)) << shift, 'left')
+
+    counts = last - first
+    cells = np.flatnonzero(counts)
+    first, last, counts = first[cells], last[cells], counts[cells]
+    no_clusters = {'lat': np.empty(0), 'lon': np.empty(0), 'crags': np.empty(0, dtype=np.int64),
+                   'ascents': np.empty(0, dtype=np.int64)}
+
+    if counts.sum() <= max_markers:
+        positions = np.concatenate([np.arange(a, b) for a, b in zip(first, last)]) if len(cells) else first
+        return np.sort(positions), no_clusters
+
+    # the cells with a single crag still show the crag itself
+    single = counts == 1
+    positions = first[single]
+    first, last, counts = first[~single], last[~single], counts[~single]
+    clusters = {'lat': (index['lat_sum'][last] - index['lat_sum'][first]) / counts,
+                'lon': (index['lon_sum'][last] - index['lon_sum'][first]) / counts,
+                'crags': counts,
+                'ascents': index['ascents_sum'][last] - index['ascents_sum'][first]}
+
+    return np.sort(positions), clusters
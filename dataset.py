@@ -0,0 +1,241 @@
+# the ascents and everything the callbacks derive from them (routes, route index, cube, running sums over the years,
+# ascents per crag for the map, ascents by climber, names of the routes for the search box)
+# as versions: a version is never modified once published, new ascents make a new version that is built on the side
+# and swapped in with one assignment, so a callback keeps the version it started with until it returns.
+# Each region has its own Dataset, the published version of its ascents (regions.py).
+#
+# New ascents arrive as batch files (csv in the layout of sports_climb.csv, or parquet) dropped in a directory that
+# watch() polls. A batch goes through the same derivations as the extract: only the years it touches are aggregated
+# again, and the indexes of the previous version (routes, running sums from its first year on, climbers, route names)
+# get its ascents merged in instead of being built again
+import functools
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import Cell, build_cube, table_columns
+from climber_index import build_climber_index, extend_climber_index
+from crag_index import build_crag_index
+from route_index import build_route_index, build_routes, extend_route_index, extend_routes, update_grades
+from route_search import build_search_index, extend_search_index
+from schema import apply_schema
+from snapshot import prepare_climb
+from year_index import build_year_index, extend_year_index
+
+logger = logging.getLogger(__name__)
+
+# file types read as batches of ascents
+batch_patterns = ['*.csv', '*.parquet']
+
+
+class Version:
+    """ One version of the dataset, read only """
+
+    def __init__(self, number, files, df_climb, routes, route_index, cube, crag_ascents, locations, search_index=None,
+                 year_index=None, climber_index=None):
+        self.number = number
+        self.files = files  # batch files merged so far
+        self.df_climb = df_climb
+        self.routes = routes
+        self.route_index = route_index
+        self.cube = cube
+        self.crag_ascents = crag_ascents
+        self.crag_index = build_crag_index(locations.crag, locations.lat, locations.lon,
+                                           crag_ascents.reindex(locations.crag, fill_value=0).values)
+        self.locations = locations
+
+        # running sums over the years, for the year ranges, and ascents sorted by climber, for the climber view
+        # (extended from the previous version's by merge_batch)
+        self.year_index = build_year_index(df_climb, routes) if year_index is None else year_index
+        self.climber_index = build_climber_index(df_climb) if climber_index is None else climber_index
+
+        # names of the routes, sectors and crags, for the route search (extended from the previous version's by
+        # merge_batch)
+        self.search_index = build_search_index(routes, route_index) if search_index is None else search_index
+
+        # years with ascents, the newest first
+        self.years = sorted({int(year) for year, _ in cube if year != 0}, reverse=True)
+
+    @functools.cached_property
+    def fingerprint(self):
+        """ Digest of the ascents and of the crag locations, the same in every process that has the same ones """
+        digest = hashlib.blake2b(digest_size=16)
+        for frame in [self.df_climb, self.locations]:
+            for column in frame.columns:
+                values = frame[column]
+                digest.update(str(column).encode() + b'\0')
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    digest.update(np.ascontiguousarray(values.cat.codes.values))
+                    values = values.cat.categories.to_series()
+                if values.dtype == object:
+                    values = pd.util.hash_pandas_object(values, index=False)
+                digest.update(np.ascontiguousarray(values.values).view('uint8'))
+        return digest.hexdigest()
+
+    @functools.cached_property
+    def nbytes(self):
+        """ Bytes of the ascents and of everything derived from them, what the region budget counts """
+        return sum(_nbytes(value) for value in vars(self).values())
+
+
+def _nbytes(value, deep=True):
+    """
+    Bytes of the arrays and pandas objects in a value, through dicts, lists and tuples. The pandas objects nested in
+    those (the route tables of the cube cells) are counted without the strings they point to, the ones of the route
+    table of the version, counted once with it. A cube cell counts its route table whether it was read yet or not, so
+    the size of a version doesn't change as its cells are shown
+    """
+    if isinstance(value, Cell):
+        aggregates = {key: item for key, item in value.items() if key not in ('routes', 'orders')}
+        # a pointer per value of the table and its index, and a position per row in each sort order
+        table = len(value.route_ids) * 8 * (2 * len(table_columns) + 1)
+        return _nbytes(aggregates, False) + value.route_ids.nbytes + value.ratings.nbytes + table
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=deep).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=deep))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(item, False) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(item, False) for item in value)
+    return 0
+
+
+class Dataset:
+    """ The published version of the ascents of a region """
+
+    def __init__(self, name, version=None):
+        self.name = name
+        self.version = version
+        self.swap_lock = threading.Lock()  # one swap at a time, readers never wait
+        self.failed = set()  # batch files that could not be merged, not tried again
+
+    def current(self):
+        """ The published version, callbacks read it once and use it for the whole request """
+        return self.version
+
+    def publish(self, version):
+        self.version = version
+        return version
+
+
+_watching = {}  # pid -> watcher thread, threads don't survive the fork of the gunicorn workers
+
+
+def first_version(df_climb, locations):
+    """ First version, from the whole extract """
+    df_climb['route_id'], routes = build_routes(df_climb)
+    route_index = build_route_index(df_climb.route_id.values, df_climb.year.values, df_climb.rating.values)
+    cube = build_cube(df_climb, routes)
+
+    return Version(0, (), df_climb, routes, route_index, cube, df_climb.crag.value_counts(), locations)
+
+
+def read_batch(path):
+    """ Raw ascents of a batch file """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)  # needs pyarrow or fastparquet
+    return pd.read_csv(path)
+
+
+def _concat(df_climb, batch):
+    """ Ascents of both frames in one, text columns dictionary encoded again over the values of both """
+    merged = pd.concat([df_climb, batch[df_climb.columns]], ignore_index=True)
+    for column in merged.columns[merged.dtypes == object]:
+        merged[column] = merged[column].astype('category')
+    return apply_schema(merged)
+
+
+def _route_years(index, route_ids):
+    """ Years with ascents of the given routes """
+    years = [index['years'][index['offsets'][route]:index['offsets'][route + 1]] for route in route_ids]
+    return np.unique(np.concatenate(years)) if years else np.empty(0, dtype=int)
+
+
+def merge_batch(version, batch, name):
+    """ New version with the raw ascents of a batch added """
+    batch = prepare_climb(batch)
+
+    # known routes keep their id, the index gets the new ascents inserted in place
+    batch['route_id'], routes = extend_routes(version.routes, batch)
+    df_climb = _concat(version.df_climb, batch)
+    route_index = extend_route_index(version.route_index, batch.route_id.values, batch.year.values,
+                                     len(version.df_climb), df_climb.rating.values)
+    touched = pd.unique(batch.route_id.values)
+    routes = update_grades(routes, df_climb, route_index, touched)
+
+    # only the (year, crag) cells of the years of the batch, and their rollups, are aggregated again, plus the years
+    # where a route whose grade changed shows up in the route tables
+    changed = [route for route in touched if route < len(version.routes)
+               and routes.fra_routes[route] != version.routes.fra_routes[route]]
+    years = np.union1d(batch.year.unique(), _route_years(route_index, changed))
+    cube = {key: cell for key, cell in version.cube.items() if key[0] not in years}
+    cube.update(build_cube(df_climb[df_climb.year.isin(years)], routes))
+
+    crag_ascents = version.crag_ascents.add(batch.crag.astype(object).value_counts(), fill_value=0).astype('int64')
+
+    # only the names of the new routes are indexed, the running sums are summed again from the first year of the
+    # batch on and its ascents are inserted among the ones of their climbers
+    search_index = extend_search_index(version.search_index, routes, route_index, len(version.routes))
+    year_index = extend_year_index(version.year_index, df_climb, routes, len(version.df_climb), len(version.routes))
+    climber_index = extend_climber_index(version.climber_index, df_climb, len(version.df_climb))
+
+    return Version(version.number + 1, version.files + (name,), df_climb, routes, route_index, cube, crag_ascents,
+                   version.locations, search_index, year_index, climber_index)
+
+
+def apply_batches(data, directory, on_swap=None):
+    """
+    Merges the batch files of the directory not merged yet into the dataset, in name order, and publishes the new
+    version
+    """
+    with data.swap_lock:
+        version = data.current()
+        paths = sorted(path for pattern in batch_patterns for path in glob.glob(os.path.join(directory, pattern)))
+        new = [path for path in paths if os.path.basename(path) not in version.files + tuple(data.failed)]
+        if not new:
+            return version
+
+        for path in new:
+            try:
+                version = merge_batch(version, read_batch(path), os.path.basename(path))
+            except Exception:
+                # a broken batch is skipped, the others still get merged
+                logger.exception('could not merge the ascents of %s', path)
+                data.failed.add(os.path.basename(path))
+
+        if version is data.current():
+            return version
+        data.publish(version)
+        logger.info('%s dataset version %s: %s ascents', data.name, version.number, len(version.df_climb))
+
+    if on_swap:
+        on_swap(version)
+    return version
+
+
+def watch(targets, interval=5.0):
+    """
+    Polls for new batch files in a daemon thread, once per process: targets() gives the (dataset, directory,
+    on_swap) to poll each time
+    """
+    if os.getpid() in _watching:
+        return _watching[os.getpid()]
+
+    def poll():
+        while True:
+            for data, directory, on_swap in targets():
+                apply_batches(data, directory, on_swap)
+            time.sleep(interval)
+
+    thread = _watching[os.getpid()] = threading.Thread(target=poll, name='dataset-watch', daemon=True)
+    thread.start()
+    return thread
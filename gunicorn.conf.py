@@ -0,0 +1,18 @@
+# gunicorn settings, read automatically by `gunicorn app:server` (see Procfile)
+import gc
+
+# the master imports app.py once and the workers are forked from it, so they share the loaded data
+# (and the memory mapped snapshot) instead of each one building its own copy
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # objects created by the master live as long as the workers, freezing them keeps the garbage collector
+    # from writing to (and so copying) the memory pages they are in
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # threads don't survive the fork either, each worker starts its own watcher of new ascents (CLIMB_DELTA_DIR)
+    import app
+    app.watch_deltas()
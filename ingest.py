@@ -0,0 +1,146 @@
+# streaming ingestion of the full 8a.nu logbook dump (kaggle dcohen21/8anu-climbing-logbook) into the snapshot loaded
+# by the dashboard, keeping only the ascents of one region.
+# The dump is read either from its sqlite database or from csv exports of its tables (ascent.csv, grade.csv and
+# user.csv in one directory), a chunk of ascents at a time, so the memory doesn't grow with the size of the dump
+#
+# usage: python ingest.py database.sqlite --crags Fenda Azoia Guia "Meio mango" --country PRT
+#        python ingest.py database.sqlite --coords crags_coord.csv --bbox 38.3 -9.6 38.9 -8.8 --country PRT
+import argparse
+import os
+import resource
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from snapshot import CSV_PATH, SNAPSHOT_PATH, prepare_climb, write_snapshot
+
+# columns of the extract, in the order of sports_climb.csv
+extract_columns = ['Unnamed: 0', 'user_id', 'user_country', 'sex', 'height', 'weight', 'started', 'birth', 'ascent_id',
+                   'grade_id', 'method_id', 'description', 'climb_type', 'date', 'year', 'name', 'crag', 'sector_id',
+                   'sector', 'country', 'rating', 'user_recommended', 'score', 'fra_routes']
+
+# columns read from each table of the dump
+ascent_columns = ['id', 'user_id', 'grade_id', 'method_id', 'description', 'climb_type', 'date', 'year', 'name',
+                  'crag', 'sector_id', 'sector', 'country', 'rating', 'user_recommended']
+user_columns = ['id', 'country', 'sex', 'height', 'weight', 'started', 'birth']
+grade_columns = ['id', 'score', 'fra_routes']
+
+# ascents read at a time
+CHUNK_SIZE = 200000
+
+
+def read_coords(path):
+    """ Coordinates of the crags, with the lat and lon columns of crags_coord.csv swapped back as app.py does """
+    coords = pd.read_csv(path).rename(columns={'lat': 'lon', 'lon': 'lat'})
+    return coords[['crag', 'lat', 'lon']]
+
+
+def crags_in_bbox(coords, min_lat, min_lon, max_lat, max_lon):
+    """ Names of the crags inside a lat/lon bounding box """
+    inside = coords.lat.between(min_lat, max_lat) & coords.lon.between(min_lon, max_lon)
+    return set(coords.crag[inside])
+
+
+def _read_table(source, table, columns):
+    """ One of the small tables of the dump (grades, users), indexed by id """
+    if os.path.isdir(source):
+        frame = pd.read_csv(os.path.join(source, table + '.csv'), usecols=columns)
+    else:
+        connection = sqlite3.connect(source)
+        try:
+            frame = pd.read_sql_query('SELECT {} FROM "{}"'.format(', '.join(columns), table), connection)
+        finally:
+            connection.close()
+    return frame.set_index('id')
+
+
+def _ascent_chunks(source, chunk_size):
+    """ The ascents of the dump, chunk_size rows at a time """
+    if os.path.isdir(source):
+        yield from pd.read_csv(os.path.join(source, 'ascent.csv'), usecols=ascent_columns, chunksize=chunk_size)
+    else:
+        connection = sqlite3.connect(source)
+        try:
+            yield from pd.read_sql_query('SELECT {} FROM ascent'.format(', '.join(ascent_columns)), connection,
+                                         chunksize=chunk_size)
+        finally:
+            connection.close()
+
+
+def extract_region(source, crags, countries=None, climb_type=0, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Streams the ascents of the dump and returns the ones of the region (crags, and countries when given) joined to
+    their grade and user, in the layout of sports_climb.csv. Only the kept ascents are held in memory
+    """
+    users = _read_table(source, 'user', user_columns).rename(columns={'country': 'user_country'})
+    grades = _read_table(source, 'grade', grade_columns)
+
+    kept, read = [], 0
+    for chunk in _ascent_chunks(source, chunk_size):
+        chunk.insert(0, 'Unnamed: 0', np.arange(read, read + len(chunk)))  # position of the ascent in the dump
+        read += len(chunk)
+
+        mask = chunk.crag.isin(crags) & (chunk.climb_type == climb_type)
+        if countries:
+            mask &= chunk.country.isin(countries)
+        chunk = chunk[mask].rename(columns={'id': 'ascent_id'})
+
+        # ascents of unknown users or grades are left out, the dashboard needs both
+        chunk = chunk.join(users, on='user_id', how='inner').join(grades, on='grade_id', how='inner')
+        kept.append(chunk[extract_columns])
+
+        if progress:
+            progress(read, sum(len(part) for part in kept))
+
+    return pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=extract_columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds the snapshot of one region from the full 8a.nu dump.')
+    parser.add_argument('source', help='database.sqlite of the dump, or a directory with its tables as csv')
+    parser.add_argument('--crags', nargs='+', default=[], help='crags of the region')
+    parser.add_argument('--coords', help='crag coordinates (layout of crags_coord.csv), needed by --bbox')
+    parser.add_argument('--bbox', nargs=4, type=float, metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'),
+                        help='adds the crags of --coords inside this box to the region')
+    parser.add_argument('--country', nargs='+', help='only the ascents logged in these countries (e.g. PRT)')
+    parser.add_argument('--climb-type', type=int, default=0, help='0 for routes, 1 for boulders')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='ascents read at a time')
+    parser.add_argument('--out', default=SNAPSHOT_PATH, help='snapshot file to write')
+    parser.add_argument('--csv-out', help='also writes the raw extract, e.g. ' + CSV_PATH)
+    parser.add_argument('--coords-out', help='also writes the coordinates of the crags of the region')
+    args = parser.parse_args()
+
+    crags = set(args.crags)
+    if args.bbox:
+        if not args.coords:
+            parser.error('--bbox needs --coords')
+        crags |= crags_in_bbox(read_coords(args.coords), *args.bbox)
+    if not crags:
+        parser.error('the region is empty, give --crags or --coords with --bbox')
+    if args.coords_out and not args.coords:
+        parser.error('--coords-out needs --coords')
+
+    start = time.perf_counter()
+
+    def progress(read, kept):
+        print('\r{} ascents read, {} kept, {:.0f} rows/s'.format(read, kept, read / (time.perf_counter() - start)),
+              end='', flush=True)
+
+    extract = extract_region(args.source, crags, args.country, args.climb_type, args.chunk_size, progress)
+    print()
+
+    # the csv goes first, so the snapshot is the newer of the two and load_climb picks it. A region directory
+    # (regions.py) can hold the snapshot alone
+    if args.csv_out:
+        extract.to_csv(args.csv_out, index=False)
+    if args.coords_out:
+        coords = pd.read_csv(args.coords)
+        coords[coords.crag.isin(extract.crag.unique())].to_csv(args.coords_out, index=False)
+    write_snapshot(prepare_climb(extract), args.out)
+
+    elapsed = time.perf_counter() - start
+    print('Wrote {} ascents of {} crags to {} in {:.1f} s, peak memory {:.0f} MiB'.format(
+        len(extract), extract.crag.nunique(), args.out, elapsed,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
@@ -0,0 +1,178 @@
+# opt-in instrumentation of the callbacks: the time of each callback request split in phases,
+# - filter: picking the ascents / routes / crags of the selection
+# - aggregate: summarising them (the selections that aren't in the cube)
+# - figure: building the patches of the figures and the records of the table
+# - serialise: the rest of the dash request, mostly the json encoding of the outputs
+# plus the bytes of the response and the misses of the selection cache. Each response gets a Server-Timing header
+# (shown by the network tab of the browser) and the totals per callback are served as prometheus text on /metrics,
+# to local requests only. The numbers are per process, each gunicorn worker has its own.
+#
+# When it isn't installed phase() is a shared null context and nothing else runs
+import contextlib
+import functools
+import threading
+import time
+
+import flask
+
+# phases of a callback request, in the order of the Server-Timing header
+PHASES = ['filter', 'aggregate', 'figure', 'serialise']
+
+# upper bounds (seconds) of the buckets of the latency histogram
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+
+# addresses allowed to read /metrics
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+_enabled = False
+_null = contextlib.nullcontext()
+_lock = threading.Lock()
+_totals = {}  # callback -> requests, seconds per phase, response bytes, cache misses, latency histogram
+_gauges = []  # functions returning (name, help, [(labels, value)]) read at each scrape
+
+
+class _Phase:
+    """ Adds the time spent inside the with block to a phase of the current request """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        phases = flask.g.metrics['phases']
+        phases[self.name] = phases.get(self.name, 0) + time.perf_counter() - self.start
+
+
+def phase(name):
+    """ Context manager timing a phase of the callback request being served """
+    if not _enabled or not flask.has_request_context() or 'metrics' not in flask.g:
+        return _null
+    return _Phase(name)
+
+
+def count(name):
+    """ Counts an event (e.g. 'cache_misses') of the callback request being served """
+    if _enabled and flask.has_request_context() and 'metrics' in flask.g:
+        flask.g.metrics[name] = flask.g.metrics.get(name, 0) + 1
+
+
+def gauge(function):
+    """ Registers a function returning (name, help, [(labels, value)]) shown on /metrics """
+    _gauges.append(function)
+    return function
+
+
+def instrument(function):
+    """ Decorator for the callbacks, records which callback the request runs and how long it takes """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        if not flask.has_request_context() or 'metrics' not in flask.g:
+            return function(*args)
+        flask.g.metrics['callback'] = name
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            flask.g.metrics['callback_seconds'] = time.perf_counter() - start
+
+    return wrapper
+
+
+def _record(callback, phases, total, size, misses):
+    with _lock:
+        totals = _totals.setdefault(callback, {'requests': 0, 'bytes': 0, 'cache_misses': 0,
+                                               'phases': dict.fromkeys(PHASES, 0.0), 'seconds': 0.0,
+                                               'buckets': [0] * len(BUCKETS)})
+        totals['requests'] += 1
+        totals['bytes'] += size
+        totals['cache_misses'] += misses
+        totals['seconds'] += total
+        for name, seconds in phases.items():
+            totals['phases'][name] = totals['phases'].get(name, 0.0) + seconds
+        for i, bound in enumerate(BUCKETS):
+            if total <= bound:
+                totals['buckets'][i] += 1
+
+
+def server_timing(phases, total, misses):
+    """ Server-Timing header of a request, durations in ms """
+    entries = ['{};dur={:.2f}'.format(name, 1000 * phases[name]) for name in PHASES if name in phases]
+    entries.append('total;dur={:.2f}'.format(1000 * total))
+    if misses:
+        entries.append('cache;desc="{} miss{}"'.format(misses, 'es' if misses > 1 else ''))
+    return ', '.join(entries)
+
+
+def exposition():
+    """ The totals in the prometheus text format """
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        """ A metric and its samples, (name suffix, labels, value) """
+        lines.extend(['# HELP {} {}'.format(name, help_text), '# TYPE {} {}'.format(name, kind)])
+        for suffix, labels, value in samples:
+            label_text = ','.join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in labels.items())
+            lines.append('{}{}{{{}}} {}'.format(name, suffix, label_text, value))
+
+    with _lock:
+        totals = {callback: dict(values, phases=dict(values['phases']), buckets=list(values['buckets']))
+                  for callback, values in _totals.items()}
+
+    family('climb_callback_requests_total', 'counter', 'Callback requests served.',
+           [('', {'callback': c}, t['requests']) for c, t in totals.items()])
+    family('climb_callback_phase_seconds_total', 'counter', 'Time spent in each phase of the callback requests.',
+           [('', {'callback': c, 'phase': p}, s) for c, t in totals.items() for p, s in t['phases'].items()])
+    family('climb_callback_response_bytes_total', 'counter', 'Bytes of the callback responses.',
+           [('', {'callback': c}, t['bytes']) for c, t in totals.items()])
+    family('climb_callback_cache_misses_total', 'counter', 'Selections computed by the callback requests.',
+           [('', {'callback': c}, t['cache_misses']) for c, t in totals.items()])
+
+    histogram = []
+    for c, t in totals.items():
+        histogram += [('_bucket', {'callback': c, 'le': bound}, n) for bound, n in zip(BUCKETS, t['buckets'])]
+        histogram += [('_bucket', {'callback': c, 'le': '+Inf'}, t['requests']),
+                      ('_sum', {'callback': c}, t['seconds']), ('_count', {'callback': c}, t['requests'])]
+    family('climb_callback_duration_seconds', 'histogram', 'Duration of the callback requests.', histogram)
+
+    for function in _gauges:
+        name, help_text, values = function()
+        family(name, 'gauge', help_text, [('', labels, value) for labels, value in values])
+
+    return '\n'.join(lines) + '\n'
+
+
+def install(server):
+    """ Times the callback requests of the server and adds the /metrics endpoint """
+    global _enabled
+    _enabled = True
+
+    @server.before_request
+    def start_timing():
+        if flask.request.path.endswith('/_dash-update-component'):
+            flask.g.metrics = {'start': time.perf_counter(), 'phases': {}}
+
+    @server.after_request
+    def add_server_timing(response):
+        metrics = flask.g.pop('metrics', None)
+        if metrics is None or 'callback' not in metrics:
+            return response
+
+        total = time.perf_counter() - metrics['start']
+        phases = metrics['phases']
+        # everything of the request outside the callback: reading the inputs and encoding the outputs
+        phases['serialise'] = max(total - metrics.get('callback_seconds', total), 0)
+        misses = metrics.get('cache_misses', 0)
+
+        _record(metrics['callback'], phases, total, response.calculate_content_length() or 0, misses)
+        response.headers['Server-Timing'] = server_timing(phases, total, misses)
+        return response
+
+    @server.route('/metrics')
+    def metrics_endpoint():
+        if flask.request.remote_addr not in LOCAL_ADDRESSES:
+            flask.abort(404)
+        return flask.Response(exposition(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,103 @@
+# compact callback responses:
+# - numeric trace data as plotly typed arrays ({dtype, bdata}, the base64 of the little endian values) instead of
+#   json lists, plotly.js (2.28 and later, in dash 2.17 and later) decodes them without parsing a number per value
+# - responses compressed with brotli (when the brotli package is installed) or gzip, as the browser asks for in its
+#   Accept-Encoding, for the json (callbacks, layout) and html responses above a size threshold
+# dash encodes the responses with plotly's json encoder, which uses orjson when it is installed (requirements.txt)
+import base64
+import gzip
+
+import flask
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# arrays shorter than this (by kind: float, int, unsigned) stay json lists, the typed array header costs more than
+# it saves on them. Small counts take 2 to 4 characters in json, hardly more than their base64, so the integers
+# only gain on long arrays
+TYPED_ARRAY_MIN = {'f': 8, 'i': 64, 'u': 64}
+
+# responses smaller than this (bytes) are sent as they are
+COMPRESS_MIN_SIZE = 1024
+
+# levels for responses compressed on every request: fast, and most of the gain already
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# responses worth compressing, the static files are served by dash as they are
+COMPRESSED_TYPES = {'application/json', 'text/html'}
+
+# plotly typed array dtype of each numpy type
+_dtypes = {'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2', 'int32': 'i4', 'uint32': 'u4',
+           'float32': 'f4', 'float64': 'f8'}
+
+
+def _smallest_int(values):
+    """ Integers in the smallest type plotly.js has a typed array for """
+    if len(values) == 0:
+        return values.astype('uint8')
+    low, high = values.min(), values.max()
+    for dtype in ['uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32']:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values.astype('float64')  # plotly.js has no 64 bit integers
+
+
+def trace_array(values):
+    """ Numeric trace data (x, y, values, lat, lon, marker sizes) as a plotly typed array, or as it is """
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    if values.ndim != 1 or kind not in TYPED_ARRAY_MIN or len(values) < TYPED_ARRAY_MIN[kind]:
+        return values
+    if kind in 'iu':
+        values = _smallest_int(values)
+    elif values.dtype != np.float32:
+        values = values.astype('float64')
+    values = values.astype(values.dtype.newbyteorder('<'), copy=False)
+    return {'dtype': _dtypes[values.dtype.name], 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def decode_trace_array(value):
+    """ The list a typed array stands for (what plotly.js decodes), other values as they are """
+    if isinstance(value, dict) and 'bdata' in value:
+        dtype = np.dtype({code: name for name, code in _dtypes.items()}[value['dtype']]).newbyteorder('<')
+        return np.frombuffer(base64.b64decode(value['bdata']), dtype=dtype).tolist()
+    return value
+
+
+def accepted_encoding(accept_encodings):
+    """ Encoding used for a request with these Accept-Encoding values (werkzeug Accept), None for none """
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def install(server, min_size=COMPRESS_MIN_SIZE):
+    """ Compresses the json and html responses of the server of at least min_size bytes """
+    @server.after_request
+    def compress_response(response):
+        if (response.mimetype not in COMPRESSED_TYPES or response.direct_passthrough or response.is_streamed
+                or response.status_code != 200 or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = accepted_encoding(flask.request.accept_encodings)
+        data = response.get_data()
+        if encoding is None or len(data) < min_size:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
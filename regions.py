@@ -0,0 +1,239 @@
+# the regions served by one deployment: each one is an extract of the ascents (sports_climb.csv and its snapshot, or
+# the snapshot alone) and the coordinates of its crags (crags_coord.csv), in a directory of its own, or the files of
+# the current directory for the default region
+# - a region is loaded the first time a request asks for it, in the process serving that request
+# - the loaded regions stay while their versions (Version.nbytes) fit in the budget, past it the least recently used
+#   ones are dropped. A callback keeps the version it read until it returns, so a region dropped in the middle of a
+#   request is only freed once that request is done
+# - the region of a callback is the one of the page it comes from, the REGION_STORE state the callbacks get. A page
+#   is served with the region of the REGION_COOKIE cookie of the browser, set by opening the page with ?region=<name>
+#   (what the region selector does), so the pages of two regions open in one browser each keep their own
+import collections
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+
+import dash
+import flask
+import pandas as pd
+
+import dataset
+from snapshot import CSV_PATH, SNAPSHOT_PATH, load_climb
+
+logger = logging.getLogger(__name__)
+
+# cookie with the region of the browser, the region of the pages it opens
+REGION_COOKIE = 'climb_region'
+
+# store of the page with its region, passed to the callbacks as a state
+REGION_STORE = 'page_region'
+
+# coordinates of the crags of a region
+LOCATIONS_PATH = 'crags_coord.csv'
+
+# bytes of the regions kept loaded at once, when not configured
+BUDGET = 1024 * 1024 * 1024
+
+# regions loaded and dropped by this process
+stats = {'loaded': 0, 'evicted': 0}
+
+_directories = {}  # name -> directory of the files of the region, in the order of the selector
+_default = None
+_budget = BUDGET
+_write_snapshots = True
+_lock = threading.Lock()
+_resident = collections.OrderedDict()  # name -> dataset.Dataset of the loaded regions, the least recently used first
+_loading = {}  # name -> lock held while the region loads, the requests asking for it meanwhile wait for it
+_evict_hooks = []
+_delta_dir = None
+_override = contextvars.ContextVar('region', default=None)
+
+
+def read_locations(path=LOCATIONS_PATH):
+    """ Coordinates of the crags, lat and lon as floats """
+    locations = pd.read_csv(path)
+
+    # fixing datatypes
+    locations['lat'] = locations['lat'].astype('float')
+    locations['lon'] = locations['lon'].astype('float')
+
+    # fixing columns, the file has them the other way around
+    return locations.rename(columns={'lat': 'lon', 'lon': 'lat'})
+
+
+def configure(default, directory=None, budget=BUDGET, write_snapshots=True):
+    """
+    Serves the files of the current directory as the default region, and each directory under directory that has an
+    extract as the region of its name, keeping at most budget bytes of them loaded. With write_snapshots, an extract
+    parsed from its csv is written as its snapshot
+    """
+    global _default, _budget, _write_snapshots
+    _directories.clear()
+    _directories[default] = os.curdir
+    if directory:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            # an extract is the csv, or only its snapshot (what ingest.py writes)
+            if name not in _directories and any(os.path.exists(os.path.join(path, extract))
+                                                for extract in [CSV_PATH, SNAPSHOT_PATH]):
+                _directories[name] = path
+    _default, _budget, _write_snapshots = default, budget, write_snapshots
+
+
+def names():
+    """ Names of the regions, the default one first """
+    return list(_directories)
+
+
+def on_evict(function):
+    """ Registers a function called with the name of every region dropped, to drop what was derived from it """
+    _evict_hooks.append(function)
+    return function
+
+
+def delta_directory(name):
+    """ Where the batches of new ascents of a region go: the delta directory for the default region, else its own """
+    return _delta_dir if name == _default else os.path.join(_delta_dir, name)
+
+
+def _load(name):
+    directory = _directories[name]
+    start = time.perf_counter()
+    # the first load of an extract without an up to date snapshot writes it (the gunicorn master, at the first start)
+    df_climb = load_climb(os.path.join(directory, CSV_PATH), os.path.join(directory, SNAPSHOT_PATH),
+                          write=_write_snapshots)
+    data = dataset.Dataset(name, dataset.first_version(df_climb, read_locations(os.path.join(directory,
+                                                                                              LOCATIONS_PATH))))
+    if _delta_dir:
+        # the batches merged before the region was dropped, or before it was loaded in this process
+        dataset.apply_batches(data, delta_directory(name))
+    logger.info('region %s loaded in %.1f s: %s ascents, %.0f MiB', name, time.perf_counter() - start,
+                len(data.current().df_climb), data.current().nbytes / 2 ** 20)
+    return data
+
+
+def _evict(keep):
+    """ Drops the least recently used regions, but keep, while the loaded ones take more than the budget """
+    with _lock:
+        resident = list(_resident.items())
+    sizes = {name: data.current().nbytes for name, data in resident}
+
+    evicted = []
+    with _lock:
+        while sum(sizes[name] for name in _resident if name in sizes) > _budget:
+            name = next((name for name in _resident if name != keep), None)
+            if name is None:
+                break
+            del _resident[name]
+            evicted.append(name)
+            stats['evicted'] += 1
+
+    for name in evicted:
+        logger.info('region %s dropped', name)
+        for hook in _evict_hooks:
+            hook(name)
+
+
+def get(name=None):
+    """ Dataset of a region (the default one for None or an unknown name), loaded if it isn't """
+    name = name if name in _directories else _default
+    with _lock:
+        data = _resident.get(name)
+        if data is not None:
+            _resident.move_to_end(name)
+            return data
+        loading = _loading.setdefault(name, threading.Lock())
+
+    with loading:
+        with _lock:
+            data = _resident.get(name)  # loaded by another request while this one waited
+        if data is None:
+            data = _load(name)
+            with _lock:
+                _resident[name] = data
+                stats['loaded'] += 1
+            _evict(keep=name)
+    return data
+
+
+def resident():
+    """ Bytes of each loaded region, the least recently used first """
+    with _lock:
+        loaded = list(_resident.items())
+    return {name: data.current().nbytes for name, data in loaded}
+
+
+def _from_callback(attribute):
+    """
+    Cookies or states of the running callback, empty outside of one. The background jobs run outside of any request
+    but keep the callback context
+    """
+    try:
+        return getattr(dash.ctx, attribute)
+    except dash.exceptions.MissingCallbackContextException:
+        return {}
+
+
+def active_name():
+    """
+    Region of the request: the one of using(), else the one of the page of the callback, else the one of the browser
+    (when the page itself is served), else the default one
+    """
+    name = _override.get()
+    if name is None:
+        name = _from_callback('states').get(REGION_STORE + '.data')
+    if name is None:
+        cookies = flask.request.cookies if flask.has_request_context() else _from_callback('cookies')
+        name = cookies.get(REGION_COOKIE)
+    return name if name in _directories else _default
+
+
+def current():
+    """ The published version of the region of the request, callbacks read it once for the whole request """
+    return get(active_name()).current()
+
+
+def publish(version):
+    """ Publishes a version of the region of the request """
+    return get(active_name()).publish(version)
+
+
+@contextlib.contextmanager
+def using(name):
+    """ Makes name the region of the code in the block, outside of any request (the warm-up, the benchmarks) """
+    token = _override.set(name)
+    try:
+        yield get(name)
+    finally:
+        _override.reset(token)
+
+
+def install(server):
+    """ Opening the page with ?region=<name> makes it the region of the browser """
+    @server.after_request
+    def set_region_cookie(response):
+        name = flask.request.args.get('region')
+        if name in _directories and flask.request.cookies.get(REGION_COOKIE) != name:
+            response.set_cookie(REGION_COOKIE, name, max_age=365 * 24 * 3600, samesite='Lax')
+        return response
+
+
+def watch(directory, interval=5.0, on_swap=None):
+    """
+    Merges the batches of new ascents dropped in the delta directory of each loaded region (dataset.watch),
+    on_swap(name, version) is called after each swap
+    """
+    global _delta_dir
+    _delta_dir = directory
+
+    def targets():
+        with _lock:
+            loaded = list(_resident.items())
+        return [(data, delta_directory(name), functools.partial(on_swap, name) if on_swap else None)
+                for name, data in loaded]
+
+    return dataset.watch(targets, interval)
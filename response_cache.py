@@ -0,0 +1,254 @@
+# rendered outputs of the chart callbacks on disk, shared by the gunicorn workers and kept across restarts:
+# - the outputs are stored as json, under their callback, the selection they show and a generation: the region, the
+#   fingerprint of its dataset version and of the code rendering them, so a new version of the ascents or of the app
+#   never gets the responses of an older one
+# - the single year states (years x crags x Overall/Map) are few and all kept. `python response_cache.py` renders them
+#   all ahead of time, with every row of their route tables, in a pool of processes
+# - the other states (a route selected, a range of years) are too many to keep: they are stored as they are asked for
+#   and the least recently used (to within TOUCH_INTERVAL) are evicted once they take more than EVICTABLE_BUDGET bytes
+# one sqlite file (WAL mode) holds everything, the workers read it concurrently
+import argparse
+import concurrent.futures
+import functools
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+from plotly.io.json import to_json_plotly
+
+# cache file used by the warm-up command without --path
+CACHE_PATH = 'responses.sqlite'
+
+# bytes of json kept for the evictable states (route selections, ranges of years)
+EVICTABLE_BUDGET = 256 * 1024 * 1024
+
+# evictable entries deleted at a time, the least recently used first, until they fit in the budget again
+EVICT_BATCH = 256
+
+# seconds a hit leaves the last use time of an evictable entry as it is, so the hits are mostly reads and don't wait
+# on the writer lock shared by the workers
+TOUCH_INTERVAL = 60
+
+# rendered outputs stored by the warm-up in one transaction
+WARM_BATCH = 512
+
+# hits, misses, stored and evicted responses, of this process
+stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, generation TEXT NOT NULL, callback TEXT NOT NULL,
+                                      evictable INTEGER NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL,
+                                      value TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS responses_lru ON responses (evictable, used);
+CREATE INDEX IF NOT EXISTS responses_generation ON responses (generation);
+-- bytes of the kept and of the evictable responses, kept up to date by the triggers
+CREATE TABLE IF NOT EXISTS sizes (evictable INTEGER PRIMARY KEY, bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO sizes VALUES (0, 0), (1, 0);
+CREATE TRIGGER IF NOT EXISTS responses_added AFTER INSERT ON responses BEGIN
+    UPDATE sizes SET bytes = bytes + new.size WHERE evictable = new.evictable;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_removed AFTER DELETE ON responses BEGIN
+    UPDATE sizes SET bytes = bytes - old.size WHERE evictable = old.evictable;
+END;
+'''
+
+_path = None
+_budget = EVICTABLE_BUDGET
+_lock = threading.Lock()
+_local = threading.local()  # one connection per thread (and per process, they don't survive the fork)
+_callbacks = {}  # callback name -> (callback without the cache, key function)
+
+
+def _count(outcome, n=1):
+    with _lock:
+        stats[outcome] += n
+
+
+def configure(path, budget=EVICTABLE_BUDGET):
+    """ Uses the cache file at path (created when missing), with budget bytes for the evictable responses """
+    global _path, _budget
+    _path, _budget = path, budget
+    _connection()
+
+
+def _connection():
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.pid != os.getpid() or _local.path != _path:
+        connection = sqlite3.connect(_path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')  # readers don't wait for the writer
+        connection.execute('PRAGMA synchronous=NORMAL')  # a lost response is computed again, no need to fsync each
+        with connection:
+            connection.executescript(SCHEMA)
+        _local.connection, _local.pid, _local.path = connection, os.getpid(), _path
+    return connection
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint(directory=os.path.dirname(os.path.abspath(__file__))):
+    """ Digest of the python files of the app, a change in any of them renders the responses again """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        with open(path, 'rb') as file:
+            digest.update(os.path.basename(path).encode() + b'\0' + file.read())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=16)
+def generation(scope, *parts):
+    """
+    Generation of the responses rendered from parts (the dataset fingerprint, rendering options) by this code, as
+    '<scope>/<digest>': the scope (the region) has its responses of older generations pruned on its own
+    """
+    digest = hashlib.blake2b(json.dumps([code_fingerprint(), *parts]).encode(), digest_size=16).hexdigest()
+    return '{}/{}'.format(scope, digest)
+
+
+def _entry_key(generation_, name, selection):
+    return hashlib.blake2b(json.dumps([generation_, name, selection]).encode(), digest_size=20).hexdigest()
+
+
+def _lookup(key, evictable):
+    connection = _connection()
+    row = connection.execute('SELECT value, used FROM responses WHERE key = ?', (key,)).fetchone()
+    now = time.time()
+    if row is not None and evictable and now - row[1] > TOUCH_INTERVAL:
+        with connection:
+            connection.execute('UPDATE responses SET used = ? WHERE key = ?', (now, key))
+    return None if row is None else row[0]
+
+
+def _store(entries):
+    """ Stores (key, generation, callback, evictable, value) entries, then evicts what goes over the budget """
+    connection = _connection()
+    now = time.time()
+    with connection:
+        stored = connection.executemany(
+            'INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO NOTHING',
+            [(key, generation_, name, int(evictable), len(value), now, value)
+             for key, generation_, name, evictable, value in entries]).rowcount
+    _count('stored', max(stored, 0))
+
+    if any(entry[3] for entry in entries):
+        evict()
+
+
+def evict(budget=None):
+    """ Deletes the least recently used evictable responses until they take at most budget bytes """
+    budget = _budget if budget is None else budget
+    connection = _connection()
+    while connection.execute('SELECT bytes FROM sizes WHERE evictable = 1').fetchone()[0] > budget:
+        with connection:
+            deleted = connection.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses WHERE evictable = 1 ORDER BY used LIMIT ?)', (EVICT_BATCH,)).rowcount
+        _count('evicted', deleted)
+        if deleted == 0:
+            break
+
+
+def prune(current_generation):
+    """ Deletes the responses of every other generation of its scope, and the ones of before the scopes """
+    scope = current_generation.rsplit('/', 1)[0] + '/'
+    connection = _connection()
+    with connection:
+        connection.execute('DELETE FROM responses WHERE generation != ? AND '
+                           '(substr(generation, 1, ?) = ? OR instr(generation, \'/\') = 0)',
+                           (current_generation, len(scope), scope))
+
+
+def sizes():
+    """ Entries and bytes of the kept and of the evictable responses """
+    rows = _connection().execute('SELECT evictable, COUNT(*), SUM(size) FROM responses GROUP BY evictable')
+    return {('evictable' if evictable else 'kept'): {'entries': n, 'bytes': size or 0} for evictable, n, size in rows}
+
+
+def cached(key, generation_of):
+    """
+    Decorator for the callbacks: key(*args) is (selection, evictable), the json selection the outputs depend on and
+    whether they can be evicted, generation_of() the generation of the responses the callback would render now
+    """
+    def decorate(function):
+        name = function.__name__
+        _callbacks[name] = (function, key)
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            if _path is None:
+                return function(*args)
+
+            selection, evictable = key(*args)
+            generation_ = generation_of()
+            entry = _entry_key(generation_, name, selection)
+            value = _lookup(entry, evictable)
+            if value is not None:
+                _count('hits')
+                return json.loads(value)
+
+            _count('misses')
+            outputs = function(*args)
+            # a swap of the dataset while rendering, the outputs may be of either version
+            if generation_of() == generation_:
+                _store([(entry, generation_, name, evictable, to_json_plotly(outputs))])
+            return outputs
+
+        return wrapper
+    return decorate
+
+
+def _render(generation_, name, args):
+    """ Renders a call in a process of the warm-up pool, returns its entry """
+    function, key = _callbacks[name]
+    selection, evictable = key(*args)
+    return _entry_key(generation_, name, selection), generation_, name, evictable, to_json_plotly(function(*args))
+
+
+def warm(calls, generation_, processes=None):
+    """
+    Renders the (callback name, args) calls not cached yet in a pool of processes, forked from this one so they
+    share the loaded dataset, and stores them. Returns the number of calls rendered
+    """
+    connection = _connection()
+    pending = {}  # the calls of the same selection once
+    for name, args in calls:
+        entry = _entry_key(generation_, name, _callbacks[name][1](*args)[0])
+        if entry not in pending and \
+                connection.execute('SELECT 1 FROM responses WHERE key = ?', (entry,)).fetchone() is None:
+            pending[entry] = (name, args)
+    if not pending:
+        return 0
+
+    names, args = zip(*pending.values())
+    context = multiprocessing.get_context('fork')
+    with concurrent.futures.ProcessPoolExecutor(processes, mp_context=context) as pool:
+        batch = []
+        for entry in pool.map(functools.partial(_render, generation_), names, args, chunksize=64):
+            batch.append(entry)
+            if len(batch) == WARM_BATCH:
+                _store(batch)
+                batch = []
+        _store(batch)
+
+    return len(pending)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Renders every single year state of the charts into the response '
+                                                 'cache, before the workers start.')
+    parser.add_argument('--path', default=os.environ.get('CLIMB_RESPONSE_CACHE') or CACHE_PATH,
+                        help='cache file (default $CLIMB_RESPONSE_CACHE or {})'.format(CACHE_PATH))
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='processes rendering the states')
+    args = parser.parse_args()
+
+    # app.py loads the dataset and registers its cached callbacks in the response_cache module it imports
+    os.environ['CLIMB_RESPONSE_CACHE'] = args.path
+    import app
+
+    start = time.perf_counter()
+    rendered = app.warm_response_cache(args.processes)
+    print('Rendered {} responses into {} in {:.1f} s: {}'.format(rendered, args.path, time.perf_counter() - start,
+                                                                  app.response_cache.sizes()))
@@ -0,0 +1,170 @@
+# identity of the routes: a route is a (crag, sector, name), numbered by an integer route id, and the inverted
+# index from each route id to the positions of its ascents in the logbook, with the running sums of their ratings
+# along the rows of each route, so the mean rating of a route over any range of years is the difference of two of them
+import numpy as np
+import pandas as pd
+
+# what tells two routes apart, two routes of different crags or sectors may have the same name
+route_key = ['crag', 'sector', 'name']
+
+
+def build_routes(df_climb):
+    """
+    Numbers the routes in (crag, sector, name) order and returns the route id of each ascent and the table of
+    the routes by route id: crag, sector, name and grade (the grade most logged by its ascents, the lowest on ties)
+    """
+    # ascents without a sector are a route of their own, not dropped
+    route_ids = df_climb.groupby(route_key, observed=True, dropna=False).ngroup().values.astype('int32')
+
+    first = ~pd.Series(route_ids).duplicated().values  # first ascent of each route
+    routes = df_climb[route_key].iloc[first]
+    routes.index = pd.Index(route_ids[first], name='route_id')
+
+    grades = pd.DataFrame({'route_id': route_ids, 'fra_routes': df_climb.fra_routes.values})
+    grades = grades.groupby(['route_id', 'fra_routes'], observed=True).size().sort_values(ascending=False, kind='stable')
+    routes['fra_routes'] = grades.reset_index().drop_duplicates('route_id').set_index('route_id').fra_routes
+
+    return route_ids, routes.sort_index()
+
+
+def _rating_sums(index, ratings, route_ids):
+    """
+    Positions in the index of the rows of the given routes, and the running rating sum and count of non zero ratings
+    along them, from the first row of each route
+    """
+    route_ids = route_ids[index['offsets'][route_ids + 1] > index['offsets'][route_ids]]
+    starts = index['offsets'][route_ids]
+    lengths = index['offsets'][route_ids + 1] - starts
+    firsts = np.cumsum(lengths) - lengths  # where each route starts among the positions
+    positions = np.repeat(starts - firsts, lengths) + np.arange(lengths.sum())
+    values = np.asarray(ratings)[index['rows'][positions]].astype('int64')
+
+    def running(values):
+        sums = np.cumsum(values)
+        return (sums - np.repeat(sums[firsts] - values[firsts], lengths)).astype('int32')
+
+    return positions, running(values), running(values != 0)
+
+
+def build_route_index(route_ids, years, ratings):
+    """
+    Inverted index of the ascents by route: the rows of route r are rows[offsets[r]:offsets[r + 1]], sorted by year
+    and then by position in the logbook, with the running sums of their ratings (route_ratings)
+    """
+    rows = np.lexsort((years, route_ids))
+    offsets = np.zeros(route_ids.max() + 2 if len(route_ids) else 1, dtype='int64')
+    np.cumsum(np.bincount(route_ids, minlength=len(offsets) - 1), out=offsets[1:])
+
+    index = {'rows': rows, 'offsets': offsets, 'years': np.asarray(years)[rows]}
+    _, index['rating_sum'], index['rating_count'] = _rating_sums(index, ratings, np.arange(len(offsets) - 1))
+    return index
+
+
+def route_ascents(index, route_id, year, last_year=None):
+    """
+    Positions of the ascents of a route in a year (or in the years year to last_year), sorted, without looking at
+    the ascents of other routes
+    """
+    if not 0 <= route_id < len(index['offsets']) - 1:
+        return index['rows'][:0]
+
+    first, last = index['offsets'][route_id], index['offsets'][route_id + 1]
+    years = index['years'][first:last]
+    last_year = year if last_year is None else last_year
+    return index['rows'][first + np.searchsorted(years, year, 'left'):
+                         first + np.searchsorted(years, last_year, 'right')]
+
+
+def _search_slices(values, starts, ends, value, side):
+    """
+    np.searchsorted of value in every sorted slice values[starts[i]:ends[i]] at once, as positions in values: one
+    binary search step over all the slices per halving of the longest
+    """
+    lo, hi = np.array(starts, dtype='int64'), np.array(ends, dtype='int64')
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        right = lo < hi
+        right[right] = values[mid[right]] <= value if side == 'right' else values[mid[right]] < value
+        lo, hi = np.where(right, mid + 1, lo), np.where(right, hi, mid)
+    return lo
+
+
+def route_ratings(index, route_ids, year, last_year):
+    """
+    Rating sum and count of non zero ratings of the ascents of each route in the years year to last_year, from the
+    running sums along their rows: the sums through the last row of the years minus the sums before the first
+    """
+    starts, ends = index['offsets'][route_ids], index['offsets'][route_ids + 1]
+    lo = _search_slices(index['years'], starts, ends, year, 'left')
+    hi = np.maximum(_search_slices(index['years'], starts, ends, last_year, 'right'), lo)
+
+    def between(sums):
+        if not len(sums):
+            return np.zeros(len(starts), dtype='int64')
+        through = np.where(hi > starts, sums[np.maximum(hi - 1, 0)], 0)
+        return through - np.where(lo > starts, sums[np.maximum(lo - 1, 0)], 0)
+
+    return between(index['rating_sum']), between(index['rating_count'])
+
+
+def _grade_modes(df_climb, index, route_ids):
+    """ Grade most logged by the ascents of each route, the lowest on ties """
+    rows = np.concatenate([index['rows'][index['offsets'][r]:index['offsets'][r + 1]] for r in route_ids])
+    grades = pd.DataFrame({'route_id': df_climb.route_id.values[rows], 'fra_routes': df_climb.fra_routes.values[rows]})
+    grades = grades.groupby(['route_id', 'fra_routes'], observed=True).size().sort_values(ascending=False, kind='stable')
+    return grades.reset_index().drop_duplicates('route_id').set_index('route_id').fra_routes
+
+
+def extend_routes(routes, batch):
+    """
+    Route ids of a batch of new ascents: the known routes keep their id, the new ones are numbered after the last
+    (in (crag, sector, name) order), so the ids already shown on the tables stay valid. Returns the ids and the
+    table of the routes with the new routes added, their grade still to be set by update_grades
+    """
+    known = routes.reset_index()[route_key + ['route_id']].astype({column: object for column in route_key})
+    keys = batch[route_key].astype(object).reset_index(drop=True)
+    route_ids = keys.merge(known, on=route_key, how='left').route_id
+
+    new = keys[route_ids.isna()].drop_duplicates().sort_values(route_key, na_position='first')
+    new.index = pd.Index(np.arange(len(routes), len(routes) + len(new)), name='route_id')
+    if len(new):
+        route_ids[route_ids.isna()] = keys[route_ids.isna()].merge(new.reset_index(), on=route_key,
+                                                                   how='left').route_id.values
+
+    routes = routes.astype({column: object for column in routes.columns})
+    if len(new):
+        routes = pd.concat([routes, new.assign(fra_routes=None)])
+    return route_ids.values.astype('int32'), routes
+
+
+def update_grades(routes, df_climb, index, route_ids):
+    """ Sets the grade of the given routes again from all their ascents """
+    routes.loc[route_ids, 'fra_routes'] = _grade_modes(df_climb, index, route_ids).reindex(route_ids).astype(object)
+    return routes.astype({column: 'category' for column in routes.columns})
+
+
+def extend_route_index(index, route_ids, years, first_row, ratings):
+    """
+    Adds the ascents of a batch (rows first_row, first_row + 1, ...) to the index without sorting it again: the batch
+    is sorted on its own and merged in, after the ascents already indexed of the same route and year. ratings are the
+    ratings of the whole logbook, the batch included: only the running sums of the routes of the batch are summed again
+    """
+    routes = max(len(index['offsets']) - 1, int(route_ids.max()) + 1 if len(route_ids) else 0)
+
+    # (route id, year) as one integer, the order of the index
+    old_keys = np.repeat(np.arange(len(index['offsets']) - 1, dtype=np.int64), np.diff(index['offsets'])) * 4096 + \
+        index['years']
+    order = np.lexsort((years, route_ids))
+    new_keys = route_ids[order].astype(np.int64) * 4096 + np.asarray(years)[order]
+    at = np.searchsorted(old_keys, new_keys, 'right')
+
+    rows = np.insert(index['rows'], at, first_row + order)
+    offsets = np.zeros(routes + 1, dtype='int64')
+    np.cumsum(np.bincount(np.insert(old_keys, at, new_keys) // 4096, minlength=routes), out=offsets[1:])
+
+    extended = {'rows': rows, 'offsets': offsets, 'years': np.insert(index['years'], at, np.asarray(years)[order]),
+                'rating_sum': np.insert(index['rating_sum'], at, 0),
+                'rating_count': np.insert(index['rating_count'], at, 0)}
+    positions, rating_sum, rating_count = _rating_sums(extended, ratings, np.unique(route_ids).astype('int64'))
+    extended['rating_sum'][positions], extended['rating_count'][positions] = rating_sum, rating_count
+    return extended
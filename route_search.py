@@ -0,0 +1,212 @@
+# name index of the routes for the route search box, built with each version of the dataset:
+# - the names of the routes, of their sectors and of their crags are folded (lower case, no accents, words of letters
+#   and digits) and cut into words. The distinct words are kept sorted with the routes of each one after the other, so
+#   the routes with a word starting with what was typed are one contiguous range found with two binary searches
+# - and cut into trigrams (of each word, padded by spaces), with the routes of each trigram (an inverted index), so a
+#   name typed with a typo or a letter missing still finds the routes sharing most of its trigrams
+# A query only reads the ranges of its words and the postings of its trigrams, never the names of every route
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# matches shown in the search box
+TOP_MATCHES = 10
+
+# share of the trigrams of the query a route must have to match without any word matching as a prefix
+MIN_SIMILARITY = 0.5
+
+# shortest query matched by trigrams too, shorter ones only match as prefixes
+MIN_FUZZY = 3
+
+# fields searched, a word matching in an earlier one ranks first
+search_fields = ['name', 'sector', 'crag']
+
+# after the last character of any word, for the end of the range of a prefix
+_LAST = chr(0x10FFFF)
+
+# what separates the words
+_separators = re.compile(r'[\W_]+')
+
+
+def fold(text):
+    """ Text as it is searched: lower case, no accents, words of letters and digits separated by one space """
+    text = str(text).lower()
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return _separators.sub(' ', text).strip()
+
+
+def trigrams(word):
+    """ Trigrams of a folded word, padded by two spaces before and one after """
+    padded = '  ' + word + ' '
+    return [padded[i:i + 3] for i in range(len(word) + 1)]
+
+
+def _folded(values):
+    """ Folded values of a column, each distinct value folded once (sectors and crags repeat over the routes) """
+    values = pd.Series(values, dtype=object).fillna('')
+    distinct = values.unique()
+    return values.map(dict(zip(distinct, [fold(value) for value in distinct])))
+
+
+def _offsets(keys, n_keys):
+    """ Offsets of the runs of each key in the sorted integer keys, key k is keys[offsets[k]:offsets[k + 1]] """
+    offsets = np.zeros(n_keys + 1, dtype='int64')
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return offsets
+
+
+def _postings(routes, first=0):
+    """
+    Words and trigrams of the routes (positions first, first + 1, ... in the route ids): the distinct words, sorted,
+    with the (word code, route, field) of every word of every route, sorted by word and then by route, and the
+    distinct trigrams, sorted, with the (trigram code, route) pairs the same way
+    """
+    texts = pd.DataFrame({'route': np.tile(np.arange(first, first + len(routes), dtype='int64'), len(search_fields)),
+                          'field': np.repeat(np.arange(len(search_fields), dtype='int8'), len(routes)),
+                          'word': pd.concat([_folded(routes[field].values) for field in search_fields],
+                                            ignore_index=True).str.split()})
+    texts = texts.explode('word').dropna()
+
+    # the words as codes of the sorted distinct words, everything else is sorted as integers
+    words = np.array(sorted(texts.word.unique()), dtype=object)
+    texts['word'] = pd.Categorical(texts.word, categories=words).codes.astype('int64')
+    texts = texts.drop_duplicates()
+    order = np.lexsort((texts.route.values, texts.word.values))
+
+    # trigrams of each distinct word, once: the trigram codes of words[i] are lengths[i] codes of word_grams from
+    # starts[i]
+    grams = [trigrams(word) for word in words]
+    vocabulary = np.array(sorted({gram for word_grams in grams for gram in word_grams}), dtype=object)
+    word_grams = pd.Categorical(np.array([gram for word_grams in grams for gram in word_grams], dtype=object),
+                                categories=vocabulary).codes.astype('int64')
+    lengths = np.array([len(word_grams) for word_grams in grams], dtype='int64')
+    starts = np.cumsum(lengths) - lengths
+
+    # (route, trigram) of every word of every route, each pair once
+    pairs = texts[['route', 'word']].drop_duplicates()
+    counts = lengths[pairs.word.values]
+    # positions in word_grams of the trigrams of each pair, one after the other
+    at = np.repeat(starts[pairs.word.values] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    n = max(len(routes), 1)
+    keys = np.unique(word_grams[at] * n + np.repeat(pairs.route.values - first, counts))  # by trigram, route
+
+    return {'words': words,
+            'word_codes': texts.word.values[order],
+            'word_routes': texts.route.values[order].astype('int32'),
+            'word_fields': texts.field.values[order],
+            'trigrams': vocabulary,
+            'trigram_codes': keys // n,
+            'trigram_routes': (keys % n + first).astype('int32')}
+
+
+def build_search_index(routes, route_index):
+    """
+    Name index of the routes (the route table of build_routes, by route id): the distinct words, sorted, with the
+    routes (positions in route_ids) of words[i] at word_routes[word_offsets[i]:word_offsets[i + 1]] and the field
+    (position in search_fields) where they have it in word_fields, the distinct trigrams, sorted, with their routes
+    the same way, and the ascents of each route, to rank the matches
+    """
+    postings = _postings(routes)
+    return {'route_ids': routes.index.values,
+            'words': postings['words'],
+            'word_offsets': _offsets(postings['word_codes'], len(postings['words'])),
+            'word_routes': postings['word_routes'],
+            'word_fields': postings['word_fields'],
+            'trigrams': postings['trigrams'],
+            'trigram_offsets': _offsets(postings['trigram_codes'], len(postings['trigrams'])),
+            'trigram_routes': postings['trigram_routes'],
+            'ascents': np.diff(route_index['offsets'])[routes.index.values]}
+
+
+def _merge(keys, offsets, postings, new_keys, new_codes, new_postings):
+    """
+    Sorted distinct keys (words or trigrams) and the offsets of their runs of postings with the postings of new
+    routes added: each new posting goes at the end of the run of its key, after the routes already there, and the keys
+    not known yet are inserted in order
+    """
+    at = offsets[np.searchsorted(keys, new_keys, 'right')[new_codes]]
+    postings = [np.insert(old, at, new) for old, new in zip(postings, new_postings)]
+
+    where = np.searchsorted(keys, new_keys)
+    known = where < len(keys)
+    known[known] = keys[where[known]] == new_keys[known]
+    merged = np.insert(keys, where[~known], new_keys[~known])
+
+    # runs of the known keys, moved by the keys inserted before them, plus the runs of the new postings
+    counts = np.zeros(len(merged), dtype='int64')
+    counts[np.arange(len(keys)) + np.searchsorted(where[~known], np.arange(len(keys)), 'right')] = np.diff(offsets)
+    counts[np.searchsorted(merged, new_keys)] += np.bincount(new_codes, minlength=len(new_keys))
+    offsets = np.zeros(len(merged) + 1, dtype='int64')
+    np.cumsum(counts, out=offsets[1:])
+    return merged, offsets, postings
+
+
+def extend_search_index(index, routes, route_index, first_new):
+    """
+    Name index of the routes after a batch of ascents, from the index before it: only the words and trigrams of the
+    new routes, the ones from position first_new of the route ids on (route_index.extend_routes numbers them after
+    the old ones), are added to the postings. The ascents of every route are counted again
+    """
+    extended = dict(index, route_ids=routes.index.values,
+                    ascents=np.diff(route_index['offsets'])[routes.index.values])
+    if first_new >= len(routes):
+        return extended
+
+    postings = _postings(routes.iloc[first_new:], first_new)
+    extended['words'], extended['word_offsets'], (extended['word_routes'], extended['word_fields']) = _merge(
+        index['words'], index['word_offsets'], [index['word_routes'], index['word_fields']],
+        postings['words'], postings['word_codes'], [postings['word_routes'], postings['word_fields']])
+    extended['trigrams'], extended['trigram_offsets'], (extended['trigram_routes'],) = _merge(
+        index['trigrams'], index['trigram_offsets'], [index['trigram_routes']],
+        postings['trigrams'], postings['trigram_codes'], [postings['trigram_routes']])
+    return extended
+
+
+def search_routes(index, query, top=TOP_MATCHES):
+    """
+    Route ids of the top routes matching a query: the routes where every word of the query starts a word of the route
+    name first, then of the route, sector or crag names, then the ones sharing most trigrams with it. Ties go to the
+    routes with most ascents, then to the lowest route id
+    """
+    query = fold(query)
+    n = len(index['route_ids'])
+    if not query or n == 0:
+        return index['route_ids'][:0]
+
+    # every word of the query starts a word of the route (in the name, or in any field)
+    in_name, in_any = np.ones(n, dtype=bool), np.ones(n, dtype=bool)
+    for word in query.split():
+        # the words starting with it are one range of the sorted words, and so are their routes
+        first, last = index['word_offsets'][np.searchsorted(index['words'], [word, word + _LAST])]
+        positions, fields = index['word_routes'][first:last], index['word_fields'][first:last]
+        found = np.zeros(n, dtype=bool)
+        found[positions] = True
+        in_any &= found
+        found[:] = False
+        found[positions[fields == 0]] = True
+        in_name &= found
+
+    # share of the trigrams of the query found in the route
+    similarity = np.zeros(n)
+    if len(query) >= MIN_FUZZY:
+        grams = np.array(sorted({gram for word in query.split() for gram in trigrams(word)}), dtype=object)
+        at = np.searchsorted(index['trigrams'], grams)
+        known = at < len(index['trigrams'])
+        at = at[known][index['trigrams'][at[known]] == grams[known]]
+        if len(at):
+            offsets = index['trigram_offsets']
+            similarity = np.bincount(np.concatenate([index['trigram_routes'][offsets[i]:offsets[i + 1]] for i in at]),
+                                     minlength=n) / len(grams)
+
+    matches = np.flatnonzero(in_any | (similarity >= MIN_SIMILARITY))
+    # only the first tier is sorted when it has enough matches (a letter or two typed match most routes)
+    for tier in [in_name, in_any]:
+        if np.count_nonzero(tier[matches]) >= top:
+            matches = matches[tier[matches]]
+            break
+    order = np.lexsort((matches, -index['ascents'][matches], -similarity[matches], ~in_any[matches],
+                        ~in_name[matches]))
+    return index['route_ids'][matches[order[:top]]]
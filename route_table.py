@@ -0,0 +1,97 @@
+# server side filtering, sorting and paging of the route table (page_action, sort_action and filter_action 'custom')
+import re
+
+import numpy as np
+import pandas as pd
+
+# one condition of the filter query written by the table, e.g. {Rating} >= 2 or {Route} icontains "fenda"
+filter_part = re.compile(r'^\s*\{(?P<column>[^}]+)\}\s+(?P<case>[is]?)(?P<operator>contains|datestartswith|<=|>=|!=|'
+                         r'=|<|>|eq|ne|lt|le|gt|ge)\s+(?P<value>.+?)\s*$')
+
+# aliases of the relational operators
+operators = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+
+
+def split_filter_part(part):
+    """ Returns (column, operator, case insensitive, value) of one condition of a filter query """
+    match = filter_part.match(part)
+    if match is None:
+        return None, None, False, None
+
+    value = match.group('value')
+    # quoted values are strings, the others are left for the column to interpret
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+        value = value[1:-1].replace('\\' + value[0], value[0])
+
+    operator = operators.get(match.group('operator'), match.group('operator'))
+    return match.group('column'), operator, match.group('case') == 'i', value
+
+
+def filter_mask(routes, filter_query):
+    """ Boolean mask of the routes that match every condition of the filter query """
+    mask = np.ones(len(routes), dtype=bool)
+
+    for part in (filter_query or '').split(' && '):
+        column, operator, insensitive, value = split_filter_part(part)
+        if column not in routes.columns:
+            continue
+
+        values = routes[column]
+        if operator in ('contains', 'datestartswith') or not pd.api.types.is_numeric_dtype(values):
+            values = values.fillna('').astype(str)
+            if insensitive:
+                values, value = values.str.lower(), value.lower()
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                return np.zeros(len(routes), dtype=bool)  # a text filter on a numeric column matches nothing
+
+        if operator == 'contains':
+            mask &= values.str.contains(value, regex=False).values
+        elif operator == 'datestartswith':
+            mask &= values.str.startswith(value).values
+        elif operator == '=':
+            mask &= (values == value).values
+        elif operator == '!=':
+            mask &= (values != value).values
+        elif operator == '<':
+            mask &= (values < value).values
+        elif operator == '<=':
+            mask &= (values <= value).values
+        elif operator == '>':
+            mask &= (values > value).values
+        elif operator == '>=':
+            mask &= (values >= value).values
+
+    return mask
+
+
+def query_routes(cell, sort_by, filter_query):
+    """ Positions of the routes of a cell that match the filter query, in the order given by sort_by """
+    routes = cell['routes']
+
+    # the table is already sorted by rating, any other order comes from the orders computed with the cube
+    if sort_by:
+        positions = cell['orders'][sort_by[0]['column_id']]
+        if sort_by[0]['direction'] == 'desc':
+            positions = positions[::-1]
+    else:
+        positions = np.arange(len(routes))
+
+    if filter_query:
+        positions = positions[filter_mask(routes, filter_query)[positions]]
+
+    return positions
+
+
+def page_records(cell, positions, page_current, page_size):
+    """ Records of one page of the table, the id of each row is the route id of its route """
+    positions = positions[page_current * page_size:(page_current + 1) * page_size]
+
+    page = cell['routes'].iloc[positions]
+    records = page.to_dict('records')
+    for record, route_id in zip(records, page.index):
+        record['id'] = int(route_id)
+
+    return records
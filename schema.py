@@ -0,0 +1,83 @@
+# schema of the prepared ascents: each column in the smallest type that holds it, text dictionary encoded and the
+# grades as an ordered categorical, so comparisons and groupbys run on small integer codes
+#
+# usage: python schema.py (memory per column of the raw csv and of the prepared ascents)
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# integer columns and the type they are kept in
+integer_types = {'Unnamed: 0': 'int32', 'user_id': 'int32', 'height': 'int16', 'weight': 'int16', 'started': 'int16',
+                 'ascent_id': 'int32', 'grade_id': 'int8', 'method_id': 'int8', 'climb_type': 'int8', 'year': 'int16',
+                 'sector_id': 'int32', 'rating': 'int8', 'user_recommended': 'int8', 'score': 'int16',
+                 'month': 'int8'}
+
+# float columns and the type they are kept in
+float_types = {'age': 'float32'}
+
+# text columns, each distinct value is kept once and the ascents keep its integer code
+category_columns = ['user_country', 'sex', 'name', 'crag', 'sector', 'country']
+
+
+def _downcast(values, dtype):
+    """ Integer column in a smaller type, refusing the values the type can't hold instead of wrapping them """
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        raise ValueError('{} has values outside of the {} range'.format(values.name, dtype))
+    return values.astype(dtype, copy=False)
+
+
+def grade_dtype(df_climb):
+    """ Ordered categorical of the french grades, from the easiest to the hardest (by grade_id) """
+    order = df_climb.groupby(df_climb.fra_routes.astype(object), sort=False).grade_id.min().sort_values(kind='stable')
+    return pd.CategoricalDtype(order.index, ordered=True)
+
+
+def apply_schema(df_climb):
+    """ Converts the prepared ascents to the schema, columns already in it are left as they are """
+    for column, dtype in integer_types.items():
+        if column in df_climb:
+            df_climb[column] = _downcast(df_climb[column], dtype)
+
+    for column, dtype in float_types.items():
+        if column in df_climb:
+            df_climb[column] = df_climb[column].astype(dtype, copy=False)
+
+    for column in category_columns:
+        if column in df_climb and not isinstance(df_climb[column].dtype, pd.CategoricalDtype):
+            df_climb[column] = df_climb[column].astype('category')
+
+    if 'fra_routes' in df_climb and not (isinstance(df_climb.fra_routes.dtype, pd.CategoricalDtype)
+                                        and df_climb.fra_routes.cat.ordered):
+        df_climb['fra_routes'] = df_climb.fra_routes.astype(object).astype(grade_dtype(df_climb))
+
+    return df_climb
+
+
+def memory_report(df_climb):
+    """ Type, bytes (strings included) and bytes per ascent of each column """
+    usage = df_climb.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df_climb.dtypes.astype(str), 'bytes': usage,
+                           'bytes/ascent': usage / max(len(df_climb), 1)})
+    report.loc['total'] = ['', usage.sum(), usage.sum() / max(len(df_climb), 1)]
+    return report
+
+
+if __name__ == '__main__':
+    from snapshot import CSV_PATH, load_climb
+
+    parser = argparse.ArgumentParser(description='Memory per column of the raw and of the prepared ascents.')
+    parser.add_argument('--csv', default=CSV_PATH, help='raw ascents extract')
+    args = parser.parse_args()
+
+    raw = memory_report(pd.read_csv(args.csv))
+    prepared = memory_report(load_climb(args.csv))
+    report = raw.join(prepared, how='outer', lsuffix=' (csv)', rsuffix=' (prepared)').reindex(
+        list(raw.index[:-1]) + [column for column in prepared.index[:-1] if column not in raw.index] + ['total'])
+
+    for column in ['bytes (csv)', 'bytes (prepared)']:
+        report[column] = report[column].map(lambda x: '-' if pd.isna(x) else '{:.0f}'.format(x))
+
+    pd.set_option('display.width', 200)
+    print(report.to_string(float_format='{:.1f}'.format, na_rep='-'))
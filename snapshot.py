@@ -0,0 +1,154 @@
+# necessary libraries
+import argparse
+import datetime as dt
+import mmap
+import os
+import struct
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema
+
+# raw logbook extract and the preprocessed snapshot built from it
+CSV_PATH = 'sports_climb.csv'
+SNAPSHOT_PATH = 'sports_climb.npz'
+
+
+def prepare_climb(df_climb):
+    """ Adds the derived columns (date, month, birth, age and sex labels) to the raw ascents, in the schema """
+    # fixing dates - ascents are logged per day, so only the distinct timestamps go through fromtimestamp
+    timestamps, positions = np.unique(df_climb['date'].values, return_inverse=True)
+    df_climb['date'] = pd.DatetimeIndex([dt.datetime.fromtimestamp(x) for x in timestamps])[positions.ravel()]
+    df_climb['month'] = df_climb['date'].dt.month
+    df_climb['birth'] = df_climb['birth'].astype('datetime64[ns]')
+    df_climb['age'] = 2017 - df_climb.birth.dt.year
+
+    # fixing sex
+    df_climb['sex'] = np.where(df_climb.sex == 0, 'Male', 'Female').astype(object)
+
+    # text columns keep each distinct value once and integer codes per ascent, which is also what lets the
+    # snapshot share them between workers
+    for column in df_climb.columns[df_climb.dtypes == object]:
+        df_climb[column] = df_climb[column].astype('category')
+
+    # small integer types and the ordered grades (schema.py)
+    return apply_schema(df_climb)
+
+
+def write_snapshot(df_climb, path=SNAPSHOT_PATH):
+    """ Writes the prepared ascents to a typed, columnar .npz file """
+    arrays = {'__columns__': np.array(df_climb.columns, dtype=str)}
+
+    for column in df_climb.columns:
+        values = df_climb[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # dates are kept as nanoseconds since epoch, NaT included
+            arrays[column + '__datetime'] = values.values.astype('datetime64[ns]').view('int64')
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            # strings are dictionary encoded, missing values get the code -1
+            arrays[column + '__codes'] = values.cat.codes.values
+            arrays[column + '__categories'] = np.array(values.cat.categories, dtype=str)
+            arrays[column + '__ordered'] = np.array(values.cat.ordered)
+        else:
+            arrays[column] = values.values
+
+    # written next to it and renamed, so a process loading the snapshot meanwhile never reads half of it
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temporary, path)
+
+
+def _map_arrays(path):
+    """ Maps every array of an uncompressed .npz file straight from disk, without reading it """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        # read only mapping of the whole file, the arrays below are views on it
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for member in archive.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('{} is compressed and can not be memory mapped'.format(path))
+
+            # the data of a member starts after its local header: 30 bytes, the file name and the extra field
+            file.seek(member.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', file.read(4))
+            file.seek(member.header_offset + 30 + name_length + extra_length)
+
+            # header of the .npy file itself
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+
+            array = np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)), offset=file.tell())
+            arrays[member.filename[:-len('.npy')]] = array.reshape(shape, order='F' if fortran_order else 'C')
+
+    return arrays
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """
+    Reads a snapshot written by write_snapshot back into a dataframe.
+    The columns are memory mapped, so every process that reads the same snapshot shares one copy of them
+    through the page cache
+    """
+    snapshot = _map_arrays(path)
+
+    columns = {}
+    for column in snapshot['__columns__']:
+        column = str(column)
+        if column + '__datetime' in snapshot:
+            columns[column] = snapshot[column + '__datetime'].view('datetime64[ns]')
+        elif column + '__codes' in snapshot:
+            ordered = column + '__ordered' in snapshot and bool(snapshot[column + '__ordered'])
+            columns[column] = pd.Categorical.from_codes(snapshot[column + '__codes'],
+                                                        categories=snapshot[column + '__categories'].astype(object),
+                                                        ordered=ordered)
+        else:
+            columns[column] = snapshot[column]
+
+    # copy=False keeps the columns on the mapped memory instead of consolidating them into new blocks
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_climb(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH, write=False):
+    """
+    Returns the prepared ascents, from the snapshot when there is an up to date one (or no csv at all), otherwise
+    from the csv. With write, the csv parsed is stored as the snapshot, so the next start reads that instead
+    """
+    if os.path.exists(snapshot_path) and (not os.path.exists(csv_path) or
+                                          os.path.getmtime(snapshot_path) >= os.path.getmtime(csv_path)):
+        # snapshots written before the schema are converted on load
+        return apply_schema(read_snapshot(snapshot_path))
+
+    df_climb = prepare_climb(pd.read_csv(csv_path))
+    if write:
+        try:
+            write_snapshot(df_climb, snapshot_path)
+        except OSError:  # a read only deployment keeps parsing the csv
+            return df_climb
+        # the mapped columns of the snapshot, shared by the workers, instead of the parsed ones
+        return apply_schema(read_snapshot(snapshot_path))
+    return df_climb
+
+
+def build_snapshot(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH):
+    """ Parses the csv, applies the derivations and stores the result as a snapshot """
+    df_climb = prepare_climb(pd.read_csv(csv_path))
+    write_snapshot(df_climb, snapshot_path)
+
+    return df_climb
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds the preprocessed snapshot loaded by the dashboard.')
+    parser.add_argument('--csv', default=CSV_PATH, help='raw ascents extract')
+    parser.add_argument('--out', default=SNAPSHOT_PATH, help='snapshot file to write')
+    args = parser.parse_args()
+
+    df = build_snapshot(args.csv, args.out)
+    print('Wrote {} ascents to {}'.format(len(df), args.out))
@@ -0,0 +1,119 @@
+# running sums of the aggregates over the years: for every crag (and OVERALL) the ascents, grade, month, method and
+# sex counts and the rating sum and count of all the years up to each year. The aggregates of any range of years are
+# the difference of two rows of these arrays, so a range costs the same as a single year whatever its length
+# (aggregates.range_cell). The ratings of each route are summed the same way along its ascents, in the route index
+import numpy as np
+import pandas as pd
+
+from aggregates import OVERALL
+
+# axis of the labels of each aggregate counted per label
+label_axes = {'grade_counts': 'grades', 'month_counts': 'months', 'method_counts': 'methods', 'sex_counts': 'sexes'}
+
+
+def _running(sums):
+    """ Running sums over the years (first axis), after a row of zeros: rows [lo, hi) are sums[hi] - sums[lo] """
+    return np.concatenate([np.zeros((1,) + sums.shape[1:], dtype=sums.dtype), np.cumsum(sums, axis=0)])
+
+
+def _axes(df_climb, index=None, first_row=0):
+    """
+    Labels of the axes of the index: years, crag columns (the last one is OVERALL), grades, methods and sexes. The
+    years and methods are the ones of the rows from first_row, and of the index when given
+    """
+    years = np.unique(df_climb.year.values[first_row:]).astype('int64')
+    methods = np.unique(df_climb.method_id.values[first_row:])
+    if index is not None:
+        years, methods = np.union1d(index['years'], years), np.union1d(index['methods'], methods)
+    return {'years': years,
+            'columns': {name: i for i, name in enumerate(list(df_climb.crag.cat.categories) + [OVERALL])},
+            'grades': np.asarray(df_climb.fra_routes.cat.categories, dtype=object),
+            'months': np.arange(1, 13),
+            'methods': methods,
+            'sexes': np.asarray(df_climb.sex.cat.categories, dtype=object)}
+
+
+def _year_sums(df_climb, axes, years, rows=None):
+    """
+    Sums per year of the aggregates of the ascents in rows (all when None), for the given years of the axes: arrays
+    (years, crags + 1) or (years, crags + 1, labels)
+    """
+    rows = slice(None) if rows is None else rows
+    year = np.searchsorted(years, df_climb.year.values[rows])
+    crag = df_climb.crag.cat.codes.values[rows].astype('int64')
+    crag[crag < 0] = len(axes['columns']) - 1  # the ascents without a crag only count in the rollup, the last column
+    shape = (len(years), len(axes['columns']))
+
+    def per_crag(codes=None, labels=1, weights=None, kept=None):
+        """ Sums (years, crags + 1, labels) of weights (or of ascents) per year, crag and code """
+        kept = np.ones(len(year), dtype=bool) if kept is None else kept
+        codes = np.zeros(len(year), dtype='int64') if codes is None else codes
+        cells = (year[kept] * shape[1] + crag[kept]) * labels + codes[kept]
+        sums = np.bincount(cells, weights=None if weights is None else weights[kept],
+                           minlength=shape[0] * shape[1] * labels).reshape(shape + (labels,)).astype('int64')
+        sums[:, -1] = sums.sum(axis=1)
+        return sums
+
+    grade = df_climb.fra_routes.cat.codes.values[rows].astype('int64')
+    sex = df_climb.sex.cat.codes.values[rows].astype('int64')
+    rating = df_climb.rating.values[rows]
+    rated = rating != 0
+
+    return {'ascents': per_crag()[..., 0],
+            'grade_counts': per_crag(grade, len(axes['grades']), kept=grade >= 0),
+            'month_counts': per_crag(df_climb.month.values[rows].astype('int64') - 1, 12),
+            'method_counts': per_crag(np.searchsorted(axes['methods'], df_climb.method_id.values[rows]),
+                                      len(axes['methods'])),
+            'sex_counts': per_crag(sex, len(axes['sexes']), kept=sex >= 0),
+            'rating_sum': per_crag(weights=rating, kept=rated)[..., 0],
+            'rating_count': per_crag(kept=rated)[..., 0]}
+
+
+def _crag_routes(routes, crag_routes=None, first_route=0):
+    """ Route ids of each crag (and of OVERALL), the ones of crag_routes extended with the routes from first_route """
+    new = routes.iloc[first_route:]
+    positions = new.groupby(new.crag.astype(object), sort=False).indices
+    crag_routes = dict(crag_routes or {})
+    for name, at in positions.items():
+        ids = new.index.values[at]
+        crag_routes[name] = np.concatenate([crag_routes[name], ids]) if name in crag_routes else ids
+    crag_routes[OVERALL] = routes.index.values
+    return crag_routes
+
+
+def build_year_index(df_climb, routes):
+    """
+    Running sums per year of the aggregates of the cube, for every crag (column of the crag in 'columns', the last
+    one is OVERALL), and the route ids of each crag
+    """
+    axes = _axes(df_climb)
+    sums = _year_sums(df_climb, axes, axes['years'])
+    return dict(axes, **{name: _running(values) for name, values in sums.items()}, crag_routes=_crag_routes(routes))
+
+
+def extend_year_index(index, df_climb, routes, first_row, first_route):
+    """
+    Running sums of the index with the ascents of a batch (rows from first_row of df_climb) and its new routes (from
+    first_route) added: the rows before the first year of the batch are kept, moved to the crags, grades, methods and
+    sexes of the merged ascents, and only the years from it on are summed again, from the ascents of those years
+    """
+    axes = _axes(df_climb, index, first_row)
+    first_year = df_climb.year.values[first_row:].min(initial=np.iinfo(df_climb.year.dtype).max)
+    kept = np.searchsorted(index['years'], first_year)  # old running rows 0 to kept sum the years before first_year
+
+    # where the crags and labels of the index are in the merged ones, the merged ones may have more
+    columns = np.array([axes['columns'][name] for name in index['columns']], dtype='int64')
+    labels = {name: pd.Index(axes[axis]).get_indexer(index[axis]) for name, axis in label_axes.items()}
+
+    tail = axes['years'][np.searchsorted(axes['years'], first_year):]
+    sums = _year_sums(df_climb, axes, tail, df_climb.year.values >= first_year)
+
+    extended = dict(axes, crag_routes=_crag_routes(routes, index['crag_routes'], first_route))
+    for name, values in sums.items():
+        before = np.zeros((kept + 1,) + values.shape[1:], dtype=values.dtype)
+        if name in labels:
+            before[:, columns[:, None], labels[name]] = index[name][:kept + 1]
+        else:
+            before[:, columns] = index[name][:kept + 1]
+        extended[name] = np.concatenate([before, before[-1] + np.cumsum(values, axis=0)])
+    return extended